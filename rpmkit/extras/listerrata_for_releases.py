@@ -148,14 +148,23 @@ def errata_add_details(errata, swopts=[]):
     return errata
 
 
-def errata_add_relevant_package_list(errata, ref_packages, swopts=[]):
+def _advisory(errata):
     """
     :param errata: A dict contains basic errata info
-    :param swopts: A list of extra options for swapi
     """
     adv = errata.get("advisory", errata.get("advisory_name", None))
     assert adv is not None, "Not a dict?: {}".format(errata)
 
+    return adv
+
+
+def errata_add_relevant_package_list(errata, ref_packages, swopts=[]):
+    """
+    :param errata: A dict contains basic errata info
+    :param swopts: A list of extra options for swapi
+    """
+    adv = _advisory(errata)
+
     logging.debug("Try to fetch packages relevant to {}".format(adv))
     ps = rpmkit.swapi.call("errata.listPackages", adv, swopts)
     ref_pids = [p["id"] for p in ref_packages]
@@ -183,13 +192,21 @@ def get_errata_list_from_rhns(channel, period, details=False, list_pkgs=False,
                                                    '..'.join(period)))
     if details:
         logging.info("Try to fetch errata details from RHNS...")
-        es = [errata_add_details(e) for e in es]
+        dss = rpmkit.swapi.gather([("errata.getDetails", e["advisory"])
+                                   for e in es], swopts)
+        for errata, ds in itertools.izip(es, dss):
+            if ds:
+                errata.update(ds[0])
 
     if list_pkgs:
         logging.info("Try to fetch errata packages info from RHNS...")
         rps = rpmkit.swapi.call("channel.software.listAllPackages",
                                 [channel], swopts)
-        es = [errata_add_relevant_package_list(e, rps, swopts) for e in es]
+        ref_pids = set(p["id"] for p in rps)
+        pss = rpmkit.swapi.gather([("errata.listPackages", _advisory(e))
+                                   for e in es], swopts)
+        for errata, ps in itertools.izip(es, pss):
+            errata["packages"] = [p for p in ps if p["id"] in ref_pids]
 
     return es
 
@@ -14,15 +14,19 @@ import rpmkit.swapi as SW
 import rpmkit.utils as RU
 
 import anyconfig
+import cPickle as pickle
 import datetime
 import itertools
 import logging
 import multiprocessing
 import operator
 import optparse
+import os
+import os.path
 import pprint
 import re
 import sys
+import time
 
 
 LOG = logging.getLogger('rpmkit.identrpm')
@@ -30,15 +34,29 @@ LOG.addHandler(logging.StreamHandler())
 
 _ARCHS = ('i[356]86', 'x86_64', 'ppc', 'ia64', 's390', 's390x', 'armv7hl',
           'noarch')
-_ARCH_REG = re.compile(r"(?:.|-)+(?P<arch>" + '|'.join(_ARCHS) + r")$")
 
 # NOTE: Version string consists of [0-9.]+ as usual, however it seems that
 # there are some special cases of which version strings are consist of
 # [a-zA-Z]+[0-9.]+ such like cdparanoia ('cdparanoia-alpha9.8-27.2'), rarpd and
 # kinput2 in older version of RHEL, RHL or Fedora.
-_NV_REG_BASE = r"^(?P<name>[^.]+)-(?P<version>[^-]+)"
-_NV_REG = re.compile(_NV_REG_BASE + r'$')
-_NVR_REG = re.compile(_NV_REG_BASE + r"-(?P<release>[^-]+)$")
+#
+# The grammar of RPM labels: [E:]N-[E:]V-R[(.|-)A]
+_LABEL_REG = re.compile(r"^(?:(?P<epoch>\d+):)?"
+                        r"(?P<name>[^.:]+?)-"
+                        r"(?:(?P<name_epoch>\d+):)?"
+                        r"(?P<version>[^-:]+)-"
+                        r"(?P<release>[^-:]+?)"
+                        r"(?:[.-](?P<arch>" + '|'.join(_ARCHS) + r"))?$")
+
+CACHE_DIR = os.path.join(SW.CACHE_DIR, "identrpm")
+CHANNEL_INDEX_DIR = CACHE_DIR
+_LIST_CHANNEL_RPMS_API = "channel.software.listAllPackages"
+
+# Results of labels are cached in swapi's caches and expire as same as the
+# details of RPMs in them.
+_LABELS_CACHE_KEY = "identrpm.labels"
+_LABELS_CACHE_EXPIRATION_API = "packages.getDetails"
+_NVRAE_KEYS = ('name', 'version', 'release', 'arch', 'epoch')
 
 
 def pkg_eq(pkg0, pkg1):
@@ -60,7 +78,41 @@ def pkg_eq(pkg0, pkg1):
                ('name', 'version', 'release', 'arch', 'epoch'))
 
 
-def parse_rpm_label(label, epoch=0, arch_reg=_ARCH_REG, nvr_reg=_NVR_REG):
+def parse_label(label, label_reg=_LABEL_REG):
+    """
+    Parse given RPM label with the grammar of RPM labels.
+
+    :param label: Maybe RPM's label
+    :param label_reg: Compiled regex pattern of the grammar of RPM labels
+
+    :return: A compact record of the RPM, a tuple of (name, version, release,
+        arch, epoch) or None (parse error). Arch and epoch are None if these
+        are not found in the label.
+
+    >>> parse_label('MySQL-python-3:1.2.1-1.i386')
+    ('MySQL-python', '1.2.1', '1', 'i386', 3)
+    >>> parse_label('cdparanoia-alpha9.8-27.2')
+    ('cdparanoia', 'alpha9.8', '27.2', None, None)
+    >>> parse_label('tzdata-2013g-1.el6-noarch')
+    ('tzdata', '2013g', '1.el6', 'noarch', None)
+    >>> parse_label('foo-1-1-x86_64')
+    ('foo', '1', '1', 'x86_64', None)
+    >>> parse_label('amanda-2.4.4p1.0.3E') is None
+    True
+    """
+    m = label_reg.match(label)
+    if m is None:
+        return None
+
+    (epoch, name, name_epoch, version, release, arch) = m.groups()
+    if epoch is None:
+        epoch = name_epoch
+
+    return (name, version, release, arch,
+            None if epoch is None else int(epoch))
+
+
+def parse_rpm_label(label, epoch=0, label_reg=_LABEL_REG):
     """
     Parse given maybe-rpm-label string ``label`` and return a dict contains
     RPM's basic information such as NVR[A] (name, version, release[, arch]) to
@@ -70,9 +122,7 @@ def parse_rpm_label(label, epoch=0, arch_reg=_ARCH_REG, nvr_reg=_NVR_REG):
         list gotten by running 'rpm -qa' or the list file found in sosreport
         archives typically.
     :param epoch: Default epoch value
-    :param arch_reg: Regex pattern of possible RPM build target archs
-    :param nvr_reg: Regex pattern of RPM's name, version and release
-    :param nv_reg: Regex pattern of RPM's name and version
+    :param label_reg: Compiled regex pattern of the grammar of RPM labels
 
     :return: A dict contains RPM's basic information or None (parse error). If
         it's a dict, the dict must have keys (name, version, release) and may
@@ -127,57 +177,20 @@ def parse_rpm_label(label, epoch=0, arch_reg=_ARCH_REG, nvr_reg=_NVR_REG):
     >>>
     """
     # ``label`` must not contain any white space chars.
-    assert re.match(r"^\S+$", label), "Invalid RPM label: " + label
+    assert label and len(label.split()) == 1, "Invalid RPM label: " + label
 
-    pkg = {'label': label}
+    rec = parse_label(label, label_reg)
+    if rec is None:
+        LOG.error("Failed to parse the RPM label: " + label)
+        return None
 
-    # 1. Try to find arch and strip it from this label string.
-    m = re.match(arch_reg, label)
-    if m:
-        arch = m.groupdict().get('arch')
+    (name, version, release, arch, lepoch) = rec
+    pkg = dict(label=label, name=name, version=version, release=release,
+               epoch=epoch if lepoch is None else lepoch)
+    if arch is not None:
         pkg['arch'] = arch
-        label = label[:label.rfind(arch) - 1]
 
-    # 2. Try to find epoch.
-    if ':' in label:
-        (maybe_epoch, label) = label.split(':')
-
-        if '-' in maybe_epoch:
-            (name, epoch) = maybe_epoch.rsplit('-', 1)
-            (version, release) = label.rsplit('-', 1)
-
-            try:
-                pkg['epoch'] = int(epoch)
-            except ValueError:
-                LOG.error("Failed to parse epoch '%s'; name=%s, version=%s, "
-                          "release=%s" % (epoch, name, version, release))
-                return None
-
-            pkg['name'] = name
-            pkg['version'] = version
-            pkg['release'] = release
-
-            return pkg
-        else:
-            try:
-                pkg['epoch'] = int(maybe_epoch)
-            except ValueError:
-                LOG.error("Failed to parse epoch '%s'; label=%s" %
-                          (maybe_epoch, label))
-                return None
-    else:
-        pkg['epoch'] = epoch
-
-    m = nvr_reg.match(label)
-    if m:
-        pkg.update(m.groupdict())
-        LOG.info("Succeed to parse %(label)s: n=%(name)s, v=%(version)s, "
-                 "r=%(release)s" % pkg)
-        return pkg
-
-    LOG.error("Failed to parse NVR string: label=%s, epoch=%d" %
-              (label, pkg['epoch']))
-    return None
+    return pkg
 
 
 def __validate_pkg(pkg, keys=[]):
@@ -220,6 +233,20 @@ def get_rpm_details(pkg, options=[]):
         return pkg
 
 
+def _nvrea_args(pkg):
+    """
+    :param pkg: A dict contains RPM basic information:
+        * Must: name, version, release and arch
+        * May: epoch
+    :return: A tuple of arguments for packages.findByNvrea
+
+    >>> _nvrea_args(dict(name='a', version='1', release='1', arch='i686'))
+    ('a', '1', '1', ' ', 'i686')
+    """
+    epoch = ' ' if pkg.get('epoch', 0) == 0 else pkg['epoch']
+    return (pkg['name'], pkg['version'], pkg['release'], epoch, pkg['arch'])
+
+
 def find_rpm_by_nvrea(pkg, options=[]):
     """
     :param pkg: A dict contains RPM basic information:
@@ -234,33 +261,224 @@ def find_rpm_by_nvrea(pkg, options=[]):
     """
     __validate_pkg(pkg, ['arch'])
 
-    epoch = ' ' if pkg.get('epoch', 0) == 0 else pkg['epoch']
-    api_args = [pkg['name'], pkg['version'], pkg['release'], epoch,
-                pkg['arch']]
     try:
         return [get_rpm_details(p, options) for p in
-                SW.call('packages.findByNvrea', api_args, options)]
+                SW.call('packages.findByNvrea', list(_nvrea_args(pkg)),
+                        options)]
     except (RuntimeError, IndexError):
         return []
 
 
-def maybe_same_rpm(p1, p2, keys=["name", "version", "release"]):
+def maybe_same_rpm(p1, p2, keys=("name", "version", "release")):
     """
     :param p1: A dict contains RPM basic information:
         * Must: name, version, release and arch
         * Should/May: epoch
     :param p2: Likewise
+
+    >>> p1 = dict(name='a', version='1', release='1', arch='i386', epoch=0)
+    >>> p2 = dict(p1, arch='i686')
+    >>> maybe_same_rpm(p1, p2), maybe_same_rpm(p1, dict(p2, epoch=1))
+    (True, False)
     """
     # These should be validated already.
     # __validate_pkg(p1, ['arch'])
     # __validate_pkg(p2, ['arch'])
 
     if 'epoch' in p1:
-        keys.append('epoch')
+        keys = list(keys) + ['epoch']
 
     return all(p1[k] == p2.get(k, None) for k in keys)
 
 
+def _nvrae(pkg):
+    """
+    :param pkg: A dict contains RPM basic information
+    :return: A tuple of (name, version, release, arch, epoch)
+
+    >>> _nvrae(dict(name='a', version='1', release='1', epoch=0))
+    ('a', '1', '1', None, 0)
+    """
+    return tuple(pkg.get(k) for k in _NVRAE_KEYS)
+
+
+def make_channel_index(rpms):
+    """
+    Make an index of RPMs in a software channel to find RPMs by hash lookups
+    instead of scanning the whole list of them.
+
+    :param rpms: A list of normalized pkg dicts in the software channel
+    :return: A dict of {"nvrae": {(name, version, release, arch, epoch):
+        [pkg]}, "name": {name: [pkg]}}; the later is the fallback buckets
+    """
+    index = dict(nvrae={}, name={})
+    for pkg in rpms:
+        index["nvrae"].setdefault(_nvrae(pkg), []).append(pkg)
+        index["name"].setdefault(pkg["name"], []).append(pkg)
+
+    return index
+
+
+def lookup_channel_index(pkg, index):
+    """
+    :param pkg: A dict contains RPM basic information:
+        * Must: name, version and release
+        * Should/May: arch and epoch
+    :param index: An index of RPMs made by :function:`make_channel_index`
+    :return: List of pkg dicts in the index matched
+
+    >>> ps = [dict(name='a', version='1', release='1', arch=a, epoch=0)
+    ...       for a in ('i686', 'x86_64')]
+    >>> idx = make_channel_index(ps)
+    >>> lookup_channel_index(ps[1], idx) == ps[1:]
+    True
+    >>> lookup_channel_index(dict(ps[1], arch='i386'), idx) == ps
+    True
+    >>> lookup_channel_index(dict(ps[1], epoch=1), idx)
+    []
+    """
+    ps = index["nvrae"].get(_nvrae(pkg))
+    if ps:
+        return ps
+
+    # Arch or epoch might be missing or different from the one in the index,
+    # e.g. i386 vs. i686.
+    return [p for p in index["name"].get(pkg["name"], [])
+            if maybe_same_rpm(pkg, p)]
+
+
+def channel_index_path(channel, domain, indexdir=CHANNEL_INDEX_DIR):
+    """
+    :param channel: Software channel label
+    :param domain: Cache domain of swapi, the ID of the server and the user
+    :param indexdir: Dir to save indexes
+
+    >>> channel_index_path("rhel-x86_64-server-6", "abc", "/tmp")
+    '/tmp/abc/rhel-x86_64-server-6.pkl'
+    """
+    return os.path.join(indexdir, domain, channel + ".pkl")
+
+
+def dump_pickle(obj, path):
+    """
+    Save the object into given path atomically so that other processes never
+    see any incomplete ones.
+
+    :param obj: An object to save, e.g. an index of RPMs made by
+        :function:`make_channel_index`
+    :param path: Path to save the object
+    """
+    outdir = os.path.dirname(path)
+    if not os.path.exists(outdir):
+        os.makedirs(outdir)
+
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp, 'wb') as out:
+        pickle.dump(obj, out, pickle.HIGHEST_PROTOCOL)
+
+    os.rename(tmp, path)
+
+
+def _is_index_fresh(path, expires):
+    """
+    :param path: Path to the index file
+    :param expires: Expiration period in days
+    """
+    try:
+        return time.time() - os.stat(path).st_mtime < expires * 86400
+    except OSError:
+        return False
+
+
+def build_channel_index(channel, options=[], path=None):
+    """
+    Fetch the list of RPMs in given software channel, make an index of them
+    and save it.
+
+    :param channel: Software channel label to list RPMs
+    :param options: List of option strings passed to
+        :function:`rpmkti.swapi.call`, e.g. ['--verbose', '--server ...']
+    :param path: Path to save the index or None (not saved)
+
+    :return: An index of RPMs or None if failed to list them
+    """
+    try:
+        rpms = [_normalize(p) for p in
+                SW.call(_LIST_CHANNEL_RPMS_API, [channel], options)]
+    except (RuntimeError, IndexError):
+        LOG.warn("Failed to list RPMs in the channel: " + channel)
+        return None
+
+    index = make_channel_index(rpms)
+    if path is None:
+        return index
+
+    try:
+        dump_pickle(index, path)
+        LOG.info("Saved the index of %d RPMs in %s: %s" % (len(rpms),
+                                                           channel, path))
+    except (IOError, OSError) as exc:
+        LOG.warn("Failed to save the index: %s, exc=%s" % (path, str(exc)))
+
+    return index
+
+
+def _load_channel_index(channel, options=[], indexdir=CHANNEL_INDEX_DIR,
+                        rapi=None):
+    """
+    Load the index of RPMs in given software channel saved or build it if it
+    is not found or expired. Indexes are saved for each server and user same
+    as swapi's caches, and swapi's options --no-cache and --force are
+    respected.
+
+    :param channel: Software channel label to list RPMs
+    :param options: List of option strings passed to
+        :function:`rpmkti.swapi.call`, e.g. ['--verbose', '--server ...']
+    :param indexdir: Dir to save indexes
+    :param rapi: An instance of :class:`rpmkit.swapi.RpcApi` or None (the
+        one of the swapi client shared among callers giving `options`)
+
+    :return: An index of RPMs or None if failed to list them
+    """
+    if rapi is None:
+        rapi = SW.get_client(options).rapi
+
+    if not rapi.caches:  # --no-cache
+        return build_channel_index(channel, options)
+
+    path = channel_index_path(channel, rapi.cache_domain, indexdir)
+    expires = SW.API_CACHE_EXPIRATIONS.get(_LIST_CHANNEL_RPMS_API, 1)
+
+    if not rapi.force and _is_index_fresh(path, expires):
+        try:
+            with open(path, 'rb') as inp:
+                return pickle.load(inp)
+        except (IOError, EOFError, pickle.UnpicklingError) as exc:
+            LOG.warn("Failed to load the index: %s, exc=%s" % (path,
+                                                               str(exc)))
+
+    return build_channel_index(channel, options, path)
+
+
+_CHANNEL_INDEXES = dict()
+
+
+def load_channel_index(channel, options=[]):
+    """
+    Same as :function:`_load_channel_index` but indexes are loaded only once
+    in each process. It will be tried again if failed.
+    """
+    key = (channel, tuple(options))
+    if key not in _CHANNEL_INDEXES:
+        index = _load_channel_index(channel, options)
+        if index is None:
+            return None
+
+        _CHANNEL_INDEXES[key] = index
+
+    return _CHANNEL_INDEXES[key]
+
+
 def list_rpms_in_channel(pkg, channel, options=[]):
     """
     :param pkg: A dict contains RPM basic information:
@@ -276,41 +494,26 @@ def list_rpms_in_channel(pkg, channel, options=[]):
     """
     __validate_pkg(pkg, ['arch'])
 
-    try:
-        all_rpms = [_normalize(p) for p in
-                    SW.call('channel.software.listAllPackages', [channel],
-                            options)]
-        assert all_rpms
-
-        def f(pkg, all_rpms):
-            for ref in all_rpms:
-                if maybe_same_rpm(pkg, ref):
-                    LOG.debug("matched: " + str(ref))
-                    yield get_rpm_details(ref, options)
-                else:
-                    if all(ref[k] == pkg[k] for k in ("name", "version")):
-                        LOG.debug("mismatch: ref=" + str(ref))
-
-        return list(f(pkg, all_rpms))
-
-    except (RuntimeError, IndexError):
+    index = load_channel_index(channel, options)
+    if not index:
         return []
 
+    ps = lookup_channel_index(pkg, index)
+    LOG.debug("%d RPMs matched in %s: %s" % (len(ps), channel, str(pkg)))
 
-def find_rpm_by_search(pkg, options=[]):
+    return [get_rpm_details(p, options) for p in ps]
+
+
+def _search_query(pkg):
     """
     :param pkg: A dict contains RPM basic information:
         * Must: name, version and release
         * Should/May: arch and epoch
-    :param options: List of option strings passed to
-        :function:`rpmkti.swapi.call`, e.g. ['--verbose', '--server ...']
-
-    :return: List of another pkg dicts
+    :return: A query string for packages.search.advanced
 
-    see also: http://red.ht/1dIs967
+    >>> _search_query(dict(name='a', version='1', release='1', epoch=2))
+    'name:a AND version:1 AND release:1 AND epoch:2'
     """
-    __validate_pkg(pkg)
-
     arg_fmt = "name:%(name)s AND version:%(version)s AND release:%(release)s"
 
     if pkg.get('epoch', 0) != 0:
@@ -319,9 +522,27 @@ def find_rpm_by_search(pkg, options=[]):
     if pkg.get('arch', False):
         arg_fmt += " AND arch:%(arch)s"
 
+    return arg_fmt % pkg
+
+
+def find_rpm_by_search(pkg, options=[]):
+    """
+    :param pkg: A dict contains RPM basic information:
+        * Must: name, version and release
+        * Should/May: arch and epoch
+    :param options: List of option strings passed to
+        :function:`rpmkti.swapi.call`, e.g. ['--verbose', '--server ...']
+
+    :return: List of another pkg dicts
+
+    see also: http://red.ht/1dIs967
+    """
+    __validate_pkg(pkg)
+
     try:
         return [get_rpm_details(p, options) for p in
-                SW.call('packages.search.advanced', [arg_fmt % pkg], options)]
+                SW.call('packages.search.advanced', [_search_query(pkg)],
+                        options)]
     except (RuntimeError, IndexError):
         return []
 
@@ -389,6 +610,11 @@ def complement_rpm_metadata_in_channels(pkg, channels=[], options=[]):
     return [pkg]
 
 
+def _unresolved(label):
+    return dict(label=label, name=None, version=None, release=None,
+                epoch=None, arch=None)
+
+
 def identify(label, details=False, channels=[], options=[]):
     """
     :param label: Maybe RPM's label, '%{n}-%{v}-%{r}.%{arch} ....' in the RPM
@@ -407,8 +633,7 @@ def identify(label, details=False, channels=[], options=[]):
 
     if not p:
         LOG.error("Failed to parse given RPM label: " + label)
-        return [dict(label=label, name=None, version=None, release=None,
-                     epoch=None, arch=None)]
+        return [_unresolved(label)]
 
     keys = ('name', 'version', 'release', 'epoch', 'arch')
     if not details and all(k in p for k in keys):
@@ -442,31 +667,64 @@ def identify_(ldo):
         return identify(ldo[0], ldo[1], ldo[2], ldo[3])
 
 
-def load_packages_g(pf):
+def _label_in_line(line):
     """
-    Load package info list from given file, generator version.
+    :param line: A line in RPM lists such as the output of 'rpm -qa' and
+        sosreport's installed-rpms
+    :return: RPM label in the line or None
+
+    >>> _label_in_line("bash-4.1.2-15.el6_4.x86_64   Wed Aug 14 2013\\n")
+    'bash-4.1.2-15.el6_4.x86_64'
+    >>> _label_in_line("# comment"), _label_in_line("  \\n")
+    (None, None)
+    """
+    if line.startswith('#'):
+        return None
+
+    tokens = line.split(None, 1)
+    return tokens[0] if tokens else None
+
 
-    :param pf: Packages list file.
+def uniq_g(xs):
     """
-    for l in open(pf).readlines():
-        if l.startswith('#'):
-            continue
+    Yield unique items in given iterable keeping the order. Items must be
+    hashable.
+
+    >>> list(uniq_g([2, 1, 2, 3, 1]))
+    [2, 1, 3]
+    """
+    seen = set()
+    for x in xs:
+        if x not in seen:
+            seen.add(x)
+            yield x
 
-        l = l.rstrip()
 
-        if not l:
-            continue
+def load_packages_g(pf):
+    """
+    Load package info list from given file, generator version. Lines are read
+    one by one and not kept in memory.
 
-        yield l.split(' ')[0] if ' ' in l else l
+    :param pf: Packages list file or '-' (stdin)
+    """
+    inp = sys.stdin if pf == '-' else open(pf)
+    try:
+        for line in inp:
+            label = _label_in_line(line)
+            if label:
+                yield label
+    finally:
+        if inp is not sys.stdin:
+            inp.close()
 
 
 def load_packages(pf):
     """
     Load package info list from given file.
 
-    :param pf: Packages list file.
+    :param pf: Packages list file or '-' (stdin)
     """
-    labels = RU.uniq(load_packages_g(pf))
+    labels = list(uniq_g(load_packages_g(pf)))
     LOG.info("Loaded %d RPM labels from %s" % (len(labels), pf))
 
     return labels
@@ -475,6 +733,29 @@ def load_packages(pf):
 _NCPUS = multiprocessing.cpu_count()
 
 
+def load_packages_from_files(pfs, nprocs=_NCPUS):
+    """
+    Load package info lists from given files in parallel.
+
+    :param pfs: A list of packages list files or '-' (stdin)
+    :param nprocs: Number of parallel processes to load files
+
+    :return: A list of unique RPM labels in the files
+    """
+    pfs = list(pfs)
+    if nprocs > 1 and len(pfs) > 1 and '-' not in pfs:
+        pool = multiprocessing.Pool(processes=min(nprocs, len(pfs)))
+        try:
+            lss = pool.map(load_packages, pfs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        lss = [load_packages(pf) for pf in pfs]
+
+    return list(uniq_g(l for ls in lss for l in ls))
+
+
 def filter_out_not_resolved_rpms_g(labels, pss, newer, return_failed=False):
     """
     :param labels: A list of RPM labels
@@ -496,9 +777,121 @@ def filter_out_not_resolved_rpms_g(labels, pss, newer, return_failed=False):
                              reverse=newer)
 
 
+def _label_key(label, details, channels):
+    """
+    :return: A key of the results of given label in swapi's caches
+    """
+    return (_LABELS_CACHE_KEY, (label, bool(details), tuple(channels)))
+
+
+def _label_key_to_expiration_key(_key):
+    return _LABELS_CACHE_EXPIRATION_API
+
+
+def load_cached_labels(rapi, keys):
+    """
+    :param rapi: An instance of :class:`rpmkit.swapi.RpcApi`
+    :param keys: A list of keys made by :function:`_label_key`
+
+    :return: A list of the cached results [pkg] or None for each of keys
+    """
+    rets = [None] * len(keys)
+    if rapi.force:
+        return rets
+
+    for cache in rapi.caches:
+        for idx, key in enumerate(keys):
+            if rets[idx] is not None:
+                continue
+
+            if rapi.cacheonly or not cache.needs_update(
+                    key, _label_key_to_expiration_key):
+                rets[idx] = cache.load(key)
+
+    return rets
+
+
+def save_cached_labels(rapi, pairs):
+    """
+    :param rapi: An instance of :class:`rpmkit.swapi.RpcApi`
+    :param pairs: A list of tuples of (key, [pkg]), where key is made by
+        :function:`_label_key`
+    """
+    for cache in rapi.caches:
+        for key, ps in pairs:
+            cache.save(key, ps)
+
+
+def find_rpms_in_batches(pkgs, channels=[], options=[]):
+    """
+    Find RPMs matched with each of given pkgs from RHN / RH Satellite in
+    batches: pkgs having arch are searched with packages.findByNvrea and the
+    rest or ones not found are searched with packages.search.advanced, or
+    RPMs are looked up in the indexes of the channels if given.
+
+    :param pkgs: A list of dicts contain RPM basic information:
+        * Must: name, version and release
+        * Should/May: arch and epoch
+    :param channels: List of software channels to search RPMs
+    :param options: List of option strings passed to
+        :function:`rpmkti.swapi.multicall`
+
+    :return: A list of list of pkg dicts found for each of pkgs
+    """
+    if channels:
+        indexes = [i for i in (load_channel_index(c, options) for c
+                               in channels) if i]
+        return [RU.concat(lookup_channel_index(p, i) for i in indexes) for p
+                in pkgs]
+
+    pss = [[] for _p in pkgs]
+
+    idxs = [i for i, p in enumerate(pkgs) if p.get('arch', False)]
+    LOG.info("Try fetching %d RPMs w/ the API, packages.findByNvrea in "
+             "batches" % len(idxs))
+    rets = SW.multicall('packages.findByNvrea',
+                        [_nvrea_args(pkgs[i]) for i in idxs], options)
+    for idx, ps in itertools.izip(idxs, rets):
+        pss[idx] = ps
+
+    idxs = [i for i, ps in enumerate(pss) if not ps]
+    LOG.info("Try fetching %d RPMs w/ the API, packages.search.advanced in "
+             "batches" % len(idxs))
+    rets = SW.multicall('packages.search.advanced',
+                        [_search_query(pkgs[i]) for i in idxs], options)
+    for idx, ps in itertools.izip(idxs, rets):
+        pss[idx] = ps
+
+    return pss
+
+
+def get_rpms_details(pss, options=[]):
+    """
+    Get the details of RPMs for the union of their IDs in batches.
+
+    :param pss: A list of list of pkg dicts. Each dict must have id.
+    :param options: List of option strings passed to
+        :function:`rpmkti.swapi.multicall`
+
+    :return: A list of list of pkg dicts of details
+    """
+    pids = list(uniq_g(p['id'] for ps in pss for p in ps))
+
+    LOG.info("Try fetching the details of %d RPMs w/ the API, "
+             "packages.getDetails in batches" % len(pids))
+    rets = SW.multicall('packages.getDetails', pids, options)
+    details = dict((pid, ret[0]) for pid, ret in itertools.izip(pids, rets)
+                   if ret)
+
+    return [[_normalize(details.get(p['id'], p)) for p in ps] for ps in pss]
+
+
 def identify_rpms(labels, details=False, newer=True, channels=[],
-                  options=[], nprocs=_NCPUS):
+                  options=[], nprocs=_NCPUS, cache=True):
     """
+    Identify RPMs in stages; parse all labels locally, skip ones resolved
+    already or having enough information, and resolve the rest in batches.
+
     :param labels: A list of RPM labels
     :param details: Get extra information other than RPM's N, V, R, E, A if
         True or get them from RHN / RH Satellite if not available
@@ -506,17 +899,59 @@ def identify_rpms(labels, details=False, newer=True, channels=[],
     :param channels: List of software channels to search RPMs
     :param options: List of option strings passed to
         :function:`rpmkti.swapi.call`, e.g. ['--verbose', '--server ...']
-    :param nprocs: Number of parallelized processes to identify each lables
+    :param nprocs: Not used any more as API calls are done in batches. It's
+        kept for backward compatibility.
+    :param cache: Cache the results of labels resolved in swapi's caches
+        and reuse them later if True
 
     :return: List of list of RPM info dicts :: [[p]]
     """
-    if nprocs > 1:
-        pool = multiprocessing.Pool(processes=nprocs)
-        pss = pool.map(identify_, ((l, details, channels, options) for l
-                                   in labels))
-    else:
-        pss = [identify(label, details, channels, options) for label in labels]
-
+    res = dict()
+    (todos, pkgs) = ([], [])  # Labels to resolve and pkgs parsed from them.
+
+    for label in uniq_g(labels):
+        pkg = parse_rpm_label(label)
+        if not pkg:
+            LOG.error("Failed to parse given RPM label: " + label)
+            res[label] = [_unresolved(label)]
+        elif not details and all(k in pkg for k in _NVRAE_KEYS):
+            res[label] = [pkg]  # We've got enough information of this RPM.
+        else:
+            todos.append(label)
+            pkgs.append(pkg)
+
+    if todos and cache:
+        rapi = SW.get_client(options).rapi
+        keys = [_label_key(label, details, channels) for label in todos]
+        rets = load_cached_labels(rapi, keys)
+
+        for label, ps in itertools.izip(todos, rets):
+            if ps is not None:
+                res[label] = ps
+
+        rest = [(label, pkg) for label, pkg in itertools.izip(todos, pkgs)
+                if label not in res]
+        todos = [label for label, _pkg in rest]
+        pkgs = [pkg for _label, pkg in rest]
+
+    LOG.info("%d RPMs to resolve, %d resolved already" % (len(todos),
+                                                          len(res)))
+    if todos:
+        pss = get_rpms_details(find_rpms_in_batches(pkgs, channels, options),
+                               options)
+        resolved = []
+        for label, pkg, ps in itertools.izip(todos, pkgs, pss):
+            if ps:
+                res[label] = ps
+                resolved.append((_label_key(label, details, channels), ps))
+            else:
+                LOG.warn("Failed to complement RPM metadata: " + label)
+                res[label] = [pkg]
+
+        if cache:
+            save_cached_labels(rapi, resolved)
+
+    pss = [res[label] for label in labels]
     resolved = list(filter_out_not_resolved_rpms_g(labels, pss, newer, False))
     failed = list(filter_out_not_resolved_rpms_g(labels, pss, newer, True))
     LOG.info("%d RPMs sets found in the list: resolved=%d, "
@@ -589,8 +1024,9 @@ autoconf: A GNU tool for automatically configuring source code.
     """)
     p.set_defaults(**defaults)
 
-    p.add_option("-i", "--input",
-                 help="Packages list file path (output of 'rpm -qa')")
+    p.add_option("-i", "--input", action="append",
+                 help="Packages list file path (output of 'rpm -qa') or "
+                      "'-' (stdin). It can be specified multiple times.")
     p.add_option("-o", "--output",
                  help="Output file path [stdout]. It must be ends w/ .json, "
                       "yaml, etc.")
@@ -609,7 +1045,8 @@ autoconf: A GNU tool for automatically configuring source code.
                  help="Options passed to swapi, can be specified multiple"
                       "times.")
     p.add_option("", "--nprocs", type="int",
-                 help="Number of parallel processes to find RPMs [%default]")
+                 help="Number of parallel processes to load packages list "
+                      "files [%default]")
     p.add_option("-v", "--verbose", action="count", help="Verbose mode")
     p.add_option("-D", "--debug", action="store_const", dest="verbose",
                  const=2, help="Debug mode")
@@ -619,7 +1056,7 @@ autoconf: A GNU tool for automatically configuring source code.
     init_log(options.verbose)
 
     if options.input:
-        packages = load_packages(options.input)
+        packages = load_packages_from_files(options.input, options.nprocs)
     else:
         if not packages:
             p.print_usage()
@@ -19,14 +19,20 @@ from operator import itemgetter
 
 import rpmkit.utils as RU
 import rpmkit.memoize as RM
+import array
+import collections
 import itertools
 import logging
 import operator
 import os
 import re
 import rpm
-import yum
-import yum.rpmsack
+
+try:
+    import yum
+    import yum.rpmsack
+except ImportError:  # yum is not needed for some functions.
+    yum = None
 
 
 RPM_BASIC_KEYS = ("name", "version", "release", "epoch", "arch")
@@ -272,13 +278,114 @@ def guess_rhel_version_simple(root):
     return osver
 
 
+# Ranks of segments in version strings, see :function:`version_key`.
+_VSEG_TILDE, _VSEG_END, _VSEG_CARET, _VSEG_ALPHA, _VSEG_NUM = range(5)
+_VSEG_RE = re.compile(r"(~|\^|\d+|[a-zA-Z]+)")
+
+
+def _version_key(vstr):
+    """
+    Make a key object from a version (or release) string to compare versions
+    same as rpmvercmp() in librpm does; a tuple of segments in the string,
+    ranked as (~) < (end of string) < (^) < alphabetic < numeric. Separators
+    (other characters) are ignored as rpmvercmp() does.
+
+    :param vstr: Version or release string
+
+    >>> _version_key("1.0~rc1")
+    ((4, 1), (4, 0), (0,), (3, 'rc'), (4, 1), (1,))
+    """
+    segs = []
+    for seg in _VSEG_RE.findall(vstr or ''):
+        if seg == '~':
+            segs.append((_VSEG_TILDE, ))
+        elif seg == '^':
+            segs.append((_VSEG_CARET, ))
+        elif seg.isdigit():
+            segs.append((_VSEG_NUM, int(seg)))
+        else:
+            segs.append((_VSEG_ALPHA, seg))
+
+    segs.append((_VSEG_END, ))
+    return tuple(segs)
+
+
+version_key = RM.memoize(_version_key)
+
+
+def rpmvercmp(ver1, ver2):
+    """
+    Compare version strings same as rpmvercmp() in librpm does.
+
+    >>> rpmvercmp("1.0", "1.0")
+    0
+    >>> rpmvercmp("1.0", "1.0.1")
+    -1
+    >>> rpmvercmp("2.0a", "2.0.1")
+    -1
+    >>> rpmvercmp("1.0~rc1", "1.0")
+    -1
+    >>> rpmvercmp("1.0^git1", "1.0")
+    1
+    >>> rpmvercmp("1.010", "1.9")
+    1
+    """
+    return cmp(version_key(ver1), version_key(ver2))
+
+
+def epoch_to_int(epoch):
+    """
+    >>> epoch_to_int(None), epoch_to_int("(none)"), epoch_to_int(" ")
+    (0, 0, 0)
+    >>> epoch_to_int("1"), epoch_to_int(2)
+    (1, 2)
+    """
+    if isinstance(epoch, int):
+        return epoch
+
+    epoch = (epoch or '').strip()
+    return int(epoch) if epoch.isdigit() else 0
+
+
+def evr_key(epoch, version, release):
+    """
+    Make a key object to sort packages by EVRs (epoch, version, release)
+    same as rpm does.
+
+    >>> evr_key(0, "1.0", "1") < evr_key(0, "1.0", "2")
+    True
+    >>> evr_key(1, "1.0", "1") > evr_key(0, "2.0", "1")
+    True
+    """
+    return (epoch_to_int(epoch), version_key(version), version_key(release))
+
+
+def pkg_evr_key(p):
+    """
+    :param p: dict(name, version, release, epoch, ...)
+    :return: A key object to sort packages by EVRs, see :function:`evr_key`
+    """
+    return evr_key(p["epoch"], p["version"], p["release"])
+
+
+def evrcmp(evr1, evr2):
+    """
+    Compare tuples of (epoch, version, release) as yum.compareEVR and
+    rpm.labelCompare do.
+
+    >>> evrcmp(('0', '1.0', '1'), ('0', '1.0', '2'))
+    -1
+    >>> evrcmp((None, '1.0', '1'), ('0', '1.0', '1'))
+    0
+    """
+    return cmp(evr_key(*evr1), evr_key(*evr2))
+
+
 def pcmp(p1, p2):
     """Compare packages by NVRAEs.
 
     :param p1, p2: dict(name, version, release, epoch, arch)
 
-    TODO: Make it fallback to rpm.versionCompare if yum is not available?
-
     >>> p1 = dict(name="gpg-pubkey", version="00a4d52b", release="4cb9dd70",
     ...           arch="noarch", epoch=0,
     ... )
@@ -305,13 +412,11 @@ def pcmp(p1, p2):
     >>> p6 = dict(name="rsync", version="3.0.6", release="4.el5",
     ...           arch="x86_64", epoch=0,
     ... )
-    >>> pcmp(p3, p4) < 0
+    >>> pcmp(p5, p6) < 0
     True
     """
-    p2evr = itemgetter("epoch", "version", "release")
-
     assert p1["name"] == p2["name"], "Trying to compare different packages!"
-    return yum.compareEVR(p2evr(p1), p2evr(p2))
+    return cmp(pkg_evr_key(p1), pkg_evr_key(p2))
 
 
 def find_latest(packages):
@@ -319,7 +424,10 @@ def find_latest(packages):
     different versions.
     """
     assert packages, "Empty list was given!"
-    return sorted(packages, cmp=pcmp)[-1]
+    assert len(set(p["name"] for p in packages)) == 1, \
+        "Trying to compare different packages!"
+
+    return sorted(packages, key=pkg_evr_key)[-1]
 
 
 def sort_by_names(xs):
@@ -379,8 +487,35 @@ def find_latests(packages, keys=("name", )):
     """Find the latest packages from given packages.
 
     It's similar to find_latest() but given packages may have different names.
+
+    >>> ps = [dict(name="a", version="1.0", release="1", epoch=0),
+    ...       dict(name="b", version="1.0", release="1", epoch=0),
+    ...       dict(name="a", version="1.0", release="2", epoch=0)]
+    >>> [(p["name"], p["release"]) for p in find_latests(ps)]
+    [('a', '2'), ('b', '1')]
+    """
+    latests = dict()
+    for p in packages:
+        k = itemgetter(*keys)(p)
+        if k not in latests or pkg_evr_key(p) >= pkg_evr_key(latests[k]):
+            latests[k] = p
+
+    return [latests[key] for key in sorted(latests)]
+
+
+def newer_packages_g(packages, ref):
+    """
+    :param packages: A list of dict(name, version, release, epoch, ...)
+    :param ref: Reference package, dict(name, version, release, epoch, ...)
+    :return: A generator yields packages in `packages` newer than `ref`
+
+    >>> ps = [dict(name="a", version="1.0", release=str(r), epoch=0)
+    ...       for r in range(3)]
+    >>> [p["release"] for p in newer_packages_g(ps, ps[1])]
+    ['2']
     """
-    return [find_latest(ps) for _n, ps in group_by_keys_g(packages, keys)]
+    rkey = pkg_evr_key(ref)
+    return (p for p in packages if pkg_evr_key(p) > rkey)
 
 
 def p2s(package):
@@ -436,9 +571,6 @@ def find_updates_g(all_packages, packages):
 
     Both types are same [dict(name, version, release, epoch, arch)].
     """
-    def is_newer(p1, p2):
-        return pcmp(p1, p2) > 0  # p1 is newer than p2.
-
     ref_packages = list_to_dict_keyed_by_names(all_packages)
 
     for p in find_latests(packages):  # filter out older ones.
@@ -450,7 +582,7 @@ def find_updates_g(all_packages, packages):
                 " update candidates for %s: %s" % (p2s(p), ps2s(cs))
             )
 
-            updates = [c for c in cs if is_newer(c, p)]
+            updates = list(newer_packages_g(cs, p))
 
             if updates:
                 logging.debug(
@@ -459,7 +591,87 @@ def find_updates_g(all_packages, packages):
                 yield sorted(updates)
 
 
-def _make_requires_dict(root=None, reversed=False, use_yum=True):
+def _deps_record(h):
+    """
+    :param h: RPM DB header object or a dict has same keys
+    :return: A tuple of (name, requires, provides, files)
+
+    >>> h = dict(name="a", requirename=["/bin/sh"], providename=["a"],
+    ...          basenames=["a", "b"], dirnames=["/usr/bin/", "/etc/"],
+    ...          dirindexes=[0, 1])
+    >>> _deps_record(h)
+    ('a', ['/bin/sh'], ['a'], ['/usr/bin/a', '/etc/b'])
+    """
+    dirnames = h["dirnames"] or []
+    files = [dirnames[idx] + base for idx, base
+             in itertools.izip(h["dirindexes"] or [], h["basenames"] or [])]
+
+    return (h["name"], h["requirename"] or [], h["providename"] or [], files)
+
+
+def make_requires_dicts_from_records(records):
+    """
+    Resolve requires of packages to the packages providing them, including
+    file dependencies, through hash tables.
+
+    :param records: An iterable yields tuples of (name, requires, provides,
+        files) of packages
+    :return: A tuple of requirements relation maps, ({p: [required]},
+        {required: [p]})
+
+    >>> recs = [("a", ["libb.so", "/bin/c"], ["a"], []),
+    ...         ("b", ["rpmlib(X)"], ["b", "libb.so"], []),
+    ...         ("c", ["libb.so"], ["c"], ["/bin/c"])]
+    >>> (reqs, rreqs) = make_requires_dicts_from_records(recs)
+    >>> reqs == dict(a=['b', 'c'], b=[], c=['b'])
+    True
+    >>> rreqs == dict(a=[], b=['a', 'c'], c=['a'])
+    True
+    """
+    recs = list(records)
+
+    # Only files required by some packages are indexed to save memory.
+    freqs = set(r for rec in recs for r in rec[1] if r.startswith('/'))
+    providers = dict()
+    for name, _requires, provides, files in recs:
+        for cap in itertools.chain(provides,
+                                   (f for f in files if f in freqs)):
+            providers.setdefault(cap, set()).add(name)
+
+    reqs = dict((rec[0], set()) for rec in recs)
+    rreqs = dict((rec[0], set()) for rec in recs)
+    for name, requires, _provides, _files in recs:
+        for req in requires:
+            for pname in providers.get(req, ()):
+                if pname != name:
+                    reqs[name].add(pname)
+                    rreqs[pname].add(name)
+
+    return (dict((k, sorted(v)) for k, v in reqs.iteritems()),
+            dict((k, sorted(v)) for k, v in rreqs.iteritems()))
+
+
+def _make_requires_dicts(root=None):
+    """
+    Make RPM dependency relations maps from the headers in RPM DB. RPM DB is
+    read only once and only tags needed to resolve dependencies are used.
+
+    :param root: RPM Database root dir or None (use /var/lib/rpm).
+    :return: A tuple of requirements relation maps, ({p: [required]},
+        {required: [p]})
+    """
+    ts = rpm_transactionset('/' if root is None else root)
+    recs = [_deps_record(h) for h in ts.dbMatch()
+            if h["name"] != "gpg-pubkey"]
+    del ts
+
+    return make_requires_dicts_from_records(recs)
+
+
+make_requires_dicts = RM.memoize(_make_requires_dicts)
+
+
+def _make_requires_dict(root=None, reversed=False, use_yum=False):
     """
     Returns RPM dependency relations map.
 
@@ -467,7 +679,8 @@ def _make_requires_dict(root=None, reversed=False, use_yum=True):
     :param reversed: Returns a dict such
         {required_RPM: [RPM_requires]} instead of a dict such
         {RPM: [RPM_required]} if True.
-    :param use_yum: Use yum to get the installed RPMs list
+    :param use_yum: Use yum to resolve dependencies instead of the headers
+        in RPM DB. It's much slower.
 
     :return: Requirements relation map, {p: [required]} or {required: [p]}
 
@@ -485,14 +698,14 @@ def _make_requires_dict(root=None, reversed=False, use_yum=True):
 
        (see also: http://fedoraproject.org/wiki/Features/DNF)
     """
+    if not use_yum:
+        return make_requires_dicts(root)[1 if reversed else 0]
+
     def list_reqs(p):
         fn = "requiring_packages" if reversed else "required_packages"
         return sorted(x.name for x in getattr(p, fn)())
 
-    assert use_yum, "Not implemented w/o yum yet!"
-
-    list_installed = yum_list_installed if use_yum else list_installed_rpms
-    return dict((p.name, list_reqs(p)) for p in list_installed(root))
+    return dict((p.name, list_reqs(p)) for p in yum_list_installed(root))
 
 
 make_requires_dict = RM.memoize(_make_requires_dict)
@@ -522,55 +735,210 @@ def make_adjacency_list_of_dependency_graph(root, reversed=False):
     return [dict(k=v) for k, v in make_requires_dict(root, reversed)]
 
 
-def _get_leaves(root=None):
+def _csr(nnodes, edges):
     """
-    Get leaves which is required by no other RPMs.
+    Make a compact form of adjacency lists, CSR (Compressed Sparse Row).
 
-    :param root: root dir of RPM Database
-    :return: List of RPM names which is not required by any other RPMs
+    :param nnodes: Number of nodes
+    :param edges: An iterable yields edges, tuples of (source, target) IDs
+    :return: A tuple of arrays (offsets, targets). The targets of the node
+        ``i`` are targets[offsets[i]:offsets[i + 1]] sorted by IDs.
+
+    >>> (offsets, targets) = _csr(3, [(2, 0), (0, 2), (0, 1)])
+    >>> list(offsets), list(targets)
+    ([0, 2, 2, 3], [1, 2, 0])
     """
-    rreqs = make_reversed_requires_dict(root)  # required -> [p]
-    return [r for r, ps in rreqs.iteritems() if not ps]
+    edges = sorted(edges)
+    offsets = array.array('l', [0] * (nnodes + 1))
+    for src, _dst in edges:
+        offsets[src + 1] += 1
 
+    for idx in range(nnodes):
+        offsets[idx + 1] += offsets[idx]
 
-get_leaves = RM.memoize(_get_leaves)
+    return (offsets, array.array('l', (dst for _src, dst in edges)))
 
 
-def _list_standalones_1_g(name, reqs, rreqs, nrpms=1, excludes=[]):
+class DepGraph(object):
+    """
+    Graph of RPM dependency relations. RPM names are mapped to integer IDs
+    and edges are kept in CSR form in both directions. Queries walk the graph
+    iteratively and accept multiple start nodes and excludes at once.
+
+    >>> g = DepGraph(dict(a=["b"], b=["c"], c=[], d=["c"]))
+    >>> g.closure(["a"]), g.closure(["c"], reverse=True, excludes=["b"])
+    (['a', 'b', 'c'], ['c', 'd'])
+    >>> g.leaves()
+    ['a', 'd']
     """
-    List the RPMs no other RPMs require nor no required by.
 
-    :param name: Name of the RPM to start to find RPMs
-    :param reqs: RPM Dependency relation map
-    :param rreqs: Reversed RPM Dependency relation map
-    :param nrpms: number of RPMs considered as standalones
-    :param excludes: RPMs which should be skipped and excluded from results
+    def __init__(self, reqs):
+        """
+        :param reqs: RPM dependency relation map, {p: [required]}, or the
+            reversed one, {required: [p]}, to walk in the reversed direction
+        """
+        names = set(reqs.keys())
+        for vs in reqs.itervalues():
+            names.update(vs)
+
+        self.names = sorted(names)
+        self.ids = dict((name, idx) for idx, name in enumerate(self.names))
+
+        edges = [(self.ids[k], self.ids[v]) for k, vs in reqs.iteritems()
+                 for v in vs if v != k]  # Self cyclic edges are ignored.
+        self._fwd = _csr(len(self.names), edges)
+        self._rev = _csr(len(self.names), ((d, s) for s, d in edges))
+
+    def _adjacents(self, idx, reverse=False):
+        (offsets, targets) = self._rev if reverse else self._fwd
+        return targets[offsets[idx]:offsets[idx + 1]]
+
+    def _to_ids(self, names):
+        return [self.ids[n] for n in names if n in self.ids]
+
+    def adjacents(self, name, reverse=False):
+        """
+        :param name: RPM name
+        :param reverse: Walk in the reversed direction if True
+        :return: List of RPM names the RPM requires (or is required by)
+        """
+        idx = self.ids.get(name)
+        if idx is None:
+            return []
+
+        return [self.names[i] for i in self._adjacents(idx, reverse)]
+
+    def closure(self, starts, reverse=False, excludes=()):
+        """
+        Breadth first search from given start nodes.
+
+        :param starts: RPM names to start
+        :param reverse: Walk in the reversed direction if True
+        :param excludes: RPM names neither included in the result nor walked
+            through. Start nodes are not excluded.
+
+        :return: List of RPM names; starts and the ones reached from them in
+            the order of search
+        """
+        excl = set(self._to_ids(excludes))
+        res = list(RU.unique_(starts, sort=False))
+        seen = set(self._to_ids(res))
+        queue = collections.deque(self._to_ids(res))
+
+        while queue:
+            for adj in self._adjacents(queue.popleft(), reverse):
+                if adj not in seen and adj not in excl:
+                    seen.add(adj)
+                    queue.append(adj)
+                    res.append(self.names[adj])
+
+        return res
+
+    def leaves(self):
+        """
+        :return: List of RPM names not required by any other RPMs
+        """
+        offsets = self._rev[0]
+        return [name for idx, name in enumerate(self.names)
+                if offsets[idx] == offsets[idx + 1]]
+
+    def standalones_g(self, starts, nrpms=1, excludes=()):
+        """
+        Find the RPMs no other RPMs require nor no required by, or required
+        by less than ``nrpms`` RPMs recursively, from given start nodes.
+
+        :param starts: RPM names to start
+        :param nrpms: number of RPMs considered as standalones
+        :param excludes: RPMs which should be skipped and excluded from
+            results
+        """
+        excl = set(excludes)
+        stack = [(name, nrpms) for name in reversed(starts)]
+
+        while stack:
+            (name, nrpms) = stack.pop()
+            if name in excl:
+                logging.info("%s is in the excluded list" % name)
+                continue
+
+            ps = self.adjacents(name, True)
+            if ps:
+                if any(p in excl for p in ps):
+                    logging.debug("%s is required by RPM[s] in the excluded "
+                                  "list" % name)
+                elif len(ps) >= nrpms:
+                    logging.debug("%s is required by more than %d RPMs" %
+                                  (name, len(ps)))
+                else:
+                    logging.debug("%s is required by %d RPMs: %s" %
+                                  (name, len(ps), ' '.join(ps)))
+                    stack.extend((p, nrpms - 1) for p in reversed(ps))
+            else:
+                ps = self.adjacents(name)
+                if not ps or len(ps) < nrpms:
+                    logging.debug("%s requires %d RPMs: %s" %
+                                  (name, len(ps), ' '.join(ps)))
+                    yield name
+
+    def orphans_closure(self, starts, excludes=()):
+        """
+        Find the RPMs required by given RPMs and not required by any other
+        RPMs except for given and found ones, like a safe but greedy version
+        of 'yum remove ``starts``'.
+
+        :param starts: RPM names to start
+        :param excludes: RPMs which should be excluded from results
+
+        :return: List of RPM names; starts and the ones found in each round,
+            or [] if any of starts is required by other RPMs
+        """
+        res = list(RU.unique_(starts, sort=False))
+        found = set(self._to_ids(res))
+        if any(adj not in found for idx in found for adj
+               in self._adjacents(idx, True)):
+            return []  # Given RPMs are not leaves.
+
+        excl = set(self._to_ids(excludes))
+        targets = sorted(found)
+        while targets:
+            cands = set(adj for idx in targets for adj in self._adjacents(idx)
+                        if adj not in found and adj not in excl)
+            targets = sorted(c for c in cands
+                             if all(r in found for r
+                                    in self._adjacents(c, True)))
+            logging.debug("targets=%s" % [self.names[i] for i in targets])
+
+            found.update(targets)
+            res.extend(self.names[i] for i in targets)
+
+        return res
+
+
+def _make_dep_graph(root=None, reversed=False):
     """
-    if name in excludes:
-        logging.info("%s is in the excluded list" % name)
-        return
-
-    ps = rreqs.get(name, [])
-    if ps:
-        if any(e in ps for e in excludes):
-            logging.debug("%s is required by RPM[s] in the excluded list"
-                          % name)
-        elif len(ps) >= nrpms:
-            logging.debug("%s is required by more than %d RPMs" %
-                          (name, len(ps)))
-        else:
-            logging.debug("%s is required by %d RPMs: %s" %
-                          (name, len(ps), ' '.join(ps)))
-            for p in ps:
-                for x in _list_standalones_1_g(p, reqs, rreqs, nrpms - 1,
-                                               excludes):
-                    yield x
-    else:
-        ps = reqs.get(name, [])
-        if not ps or len(ps) < nrpms:
-            logging.debug("%s requires %d RPMs: %s" %
-                          (name, len(ps), ' '.join(ps)))
-            yield name
+    :param root: RPM Database root dir or None (use /var/lib/rpm).
+    :param reversed: Make the graph walks from required RPMs to RPMs
+        requiring them if True
+
+    :return: An instance of :class:`DepGraph`
+    """
+    return DepGraph(make_requires_dict(root, reversed))
+
+
+make_dep_graph = RM.memoize(_make_dep_graph)
+
+
+def _get_leaves(root=None):
+    """
+    Get leaves which is required by no other RPMs.
+
+    :param root: root dir of RPM Database
+    :return: List of RPM names which is not required by any other RPMs
+    """
+    return make_dep_graph(root).leaves()
+
+
+get_leaves = RM.memoize(_get_leaves)
 
 
 def list_standalones_g(root=None, nrpms=1, excludes=[]):
@@ -582,12 +950,7 @@ def list_standalones_g(root=None, nrpms=1, excludes=[]):
     :param excludes: RPMs which should be skipped and excluded from results
     """
     all_rpms = [p["name"] for p in list_installed_rpms(root)]
-    reqs = make_requires_dict(root)
-    rreqs = make_reversed_requires_dict(root)
-
-    for r in all_rpms:
-        for x in _list_standalones_1_g(r, reqs, rreqs, nrpms, excludes):
-            yield x
+    return make_dep_graph(root).standalones_g(all_rpms, nrpms, excludes)
 
 
 def list_standalones(root=None, nrpms=1, excludes=[]):
@@ -621,63 +984,45 @@ def list_required_rpms_not_required_by_others(rpmname, root=None):
     :param root: RPM Database root dir
     :return: List of result RPMs
     """
-    result = [rpmname]
-    targets = [rpmname]
+    return make_dep_graph(root).orphans_closure([rpmname])
 
-    reqs = make_requires_dict(root)  # p -> [required]
-    rreqs = make_reversed_requires_dict(root)  # r -> [requires]
 
-    def get_cs(p, seen=[]):
-        if p not in seen:
-            seen.append(p)
-
-        return [r for r in reqs.get(p, []) if r not in seen and
-                all(x in seen for x in rreqs.get(r, []))]
-
-    if not all(y in result for y in rreqs.get(rpmname, [])):
-        return []  # Given RPM is not a leaf.
-
-    while targets:
-        targets = ucat(get_cs(p, result) for p in targets)
-        logging.debug("targets=%s, result=%s" % (str(targets), str(result)))
-
-        if targets:
-            result += targets
-
-    return result
+def _to_rdep_graph(rreqs):
+    """
+    :param rreqs: Reversed RPM Dependency relation map or an instance of
+        :class:`DepGraph` made from it
+    """
+    return rreqs if isinstance(rreqs, DepGraph) else DepGraph(rreqs)
 
 
-def _compute_removed_1(remove, rreqs, acc=[]):
+def compute_removed_1(remove, rreqs, acc=None):
     """
-    Recursively, it will traverse dependency tree and Return a list of RPMs if
-    given ``remove`` RPM was uninstalled such like yum does with 'remove
+    It will traverse dependency tree and Return a list of RPMs if given
+    ``remove`` RPM was uninstalled such like yum does with 'remove
     (uninstall)' sub command.
 
     :param remove: The name of RPM to remove (uninstall).
-    :param rreqs: Reversed RPM Dependency relation map
-    :param acc: Accumulator
+    :param rreqs: Reversed RPM Dependency relation map or an instance of
+        :class:`DepGraph` made from it
+    :param acc: Accumulator, RPMs to be removed already
 
     :return: [pname], a list of RPM names to be uninstalled along with
         ``removes`` RPMs.
+
+    >>> compute_removed_1("c", dict(a=[], b=["a"], c=["b"]), ["c"])
+    ['c', 'b', 'a']
     """
-    removes_next = sorted(p for p in rreqs.get(remove, []) if p not in acc)
+    acc = [] if acc is None else acc
+    seen = set(acc)
+    xs = [x for x in _to_rdep_graph(rreqs).closure([remove], excludes=seen)
+          if x not in seen]
     logging.debug("Resolved requires: "
-                  "%s -> %s" % (remove, ' '.join(removes_next) or 'none'))
-
-    if removes_next:
-        for r in removes_next:
-            acc.extend(x for x in _compute_removed_1(r, rreqs, acc + [r])
-                       if x not in acc)
-
-    return acc
-
+                  "%s -> %s" % (remove, ' '.join(xs) or 'none'))
 
-# :note: This function should not be memoized as argument ``acc`` may be
-# changed everytime it's called.
-compute_removed_1 = _compute_removed_1
+    return acc + xs
 
 
-def compute_removed_g(removes, rreqs, acc=[], excludes=[]):
+def compute_removed_g(removes, rreqs, acc=None, excludes=None):
     """
     This is a derived version of :function:``compute_removed_1`` which accepts
     multiple RPMs as ``removes`` parameter.
@@ -686,49 +1031,68 @@ def compute_removed_g(removes, rreqs, acc=[], excludes=[]):
     uninstalled such like yum does with 'remove (uninstall)' sub command.
 
     :param removes: The list of name of RPMs to remove (uninstall).
-    :param rreqs: Reversed RPM Dependency relation map
+    :param rreqs: Reversed RPM Dependency relation map or an instance of
+        :class:`DepGraph` made from it
     :param acc: Accumulator
     :param excludes: RPMs which should not be removed and excluded from the
-        RPMs to be removed
+        RPMs to be removed. RPMs excluded along with are appended to it.
 
     :yield: [pname], a list of RPM names to be uninstalled along with
         ``removes`` RPMs one by one.
     """
+    acc = [] if acc is None else acc
+    excludes = [] if excludes is None else excludes
+    (seen, excl) = (set(acc), set(excludes))
+    graph = _to_rdep_graph(rreqs)
+
     for r in removes:
-        if r in excludes:
+        if r in excl:
             logging.info("Excluded and not resolve requires: " + r)
             continue
 
-        xs = compute_removed_1(r, rreqs, acc + [r])
+        xs = [x for x in graph.closure([r], excludes=seen) if x not in seen]
 
-        if any(x in excludes for x in xs):
+        if any(x in excl for x in xs):
             logging.info("Excluded as some of requires are so: " + r)
-            excludes.extend([r] + xs)
+            excludes.extend(x for x in xs if x not in excl)
+            excl.update(xs)
             continue
 
-        acc.extend([r] + xs)
+        acc.extend(xs)
+        seen.update(xs)
         yield acc
 
 
-def compute_removed(removes, root=None, rreqs=None, acc=[], excludes=[]):
+def compute_removed(removes, root=None, rreqs=None, acc=None, excludes=None):
     """
     Returns a list of RPMs if given list of RPMs ``removes`` was uninstalled
     such like yum does with 'remove (uninstall)' sub command.
 
     :param removes: The list of name of RPMs to remove (uninstall).
     :param root: RPM Database root dir or None (use /var/lib/rpm).
-    :param rreqs: Reversed RPM Dependency relation map
+    :param rreqs: Reversed RPM Dependency relation map or an instance of
+        :class:`DepGraph` made from it
     :param acc: Accumulator
     :param excludes: RPMs which should not be removed and excluded from the
         RPMs to be removed
 
     :return: [pname], a list of RPM names to be uninstalled along with
         ``removes`` RPMs.
+
+    >>> rreqs = dict(a=[], b=["a"], c=["b"], d=[], e=["d"])
+    >>> compute_removed(["c", "e"], rreqs=rreqs)
+    ['a', 'b', 'c', 'd', 'e']
+    >>> excludes = ["a"]
+    >>> compute_removed(["c", "e"], rreqs=rreqs, excludes=excludes)
+    ['d', 'e']
+    >>> excludes
+    ['a', 'c', 'b']
     """
     if not rreqs:
-        rreqs = make_reversed_requires_dict(root)
+        rreqs = make_dep_graph(root, True)
 
-    return ucat(compute_removed_g(removes, rreqs, acc, excludes))
+    accs = list(compute_removed_g(removes, rreqs, acc, excludes))
+    return sorted(set(accs[-1])) if accs else []
 
 
 def guess_os_version_from_rpmfile(rpmfile):
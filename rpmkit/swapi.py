@@ -37,19 +37,30 @@ from itertools import takewhile, izip, groupby
 from operator import itemgetter
 
 import ConfigParser as configparser
+import atexit
+import bisect
+import contextlib
+import csv
 import cPickle as pickle
 import commands
 import datetime
+import fcntl
 import getpass
 import glob
+import httplib
+import itertools
 import logging
+import multiprocessing.pool
 import optparse
 import os
 import os.path
-import random
 import re
+import shutil
+import socket
+import sqlite3
 import subprocess
 import sys
+import threading
 import time
 import urllib2
 import xmlrpclib
@@ -253,6 +264,31 @@ CONFIG_FILES = glob.glob("/etc/swapi.d/*.conf") + [CONFIG]
 SYSTEM_CACHE_DIR = "/var/cache/swapi"
 CACHE_DIR = os.path.join(CONFIG_DIR, 'cache')
 CACHE_EXPIRING_DATES = 1  # [days]
+CACHE_BACKENDS = ("pickle", "sqlite")
+
+# Rate limits of accesses to servers: requests per second, burst size (max
+# number of requests sent at once) and max number of concurrent requests (0
+# means no limits). These can be configured per server in config files.
+RATE = 0.4
+BURST = 1
+CONCURRENCY = 0
+RATELIMIT_DIR = os.path.join(CONFIG_DIR, 'ratelimit')
+
+# Max number of calls in a batch of system.multicall.
+BATCH_SIZE = 100
+
+# Local copies of datasets on the web used by virtual APIs. These are
+# checked if modified on the web at intervals [sec].
+DATASETS_DIR = os.path.join(CONFIG_DIR, 'datasets')
+DATASET_CHECK_INTERVAL = 3600
+DATASET_FETCH_TIMEOUT = 60
+
+# Upper bounds of buckets of the histogram of server latencies [sec].
+LATENCY_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60)
+
+# Max number of calls run concurrently by :meth:`Client.gather`. Actual
+# requests to the server are limited by rate limits also.
+WORKERS = 4
 
 # Cache expiration dates for each APIs:
 API_CACHE_EXPIRATIONS = {
@@ -465,9 +501,13 @@ API_CACHE_EXPIRATIONS = {
     # Virtual (extended) RPC APIs:
     # "swapi.errata.getCvss": 100,  # TODO: Implement this.
     "swapi.cve.getCvss": 100,
+    "swapi.cve.getCvssFromWeb": 100,
     "swapi.cve.getAll": 1,
     "swapi.errata.getAll": 1,
     "swapi.bugzilla.getDetails": 1,
+    "swapi.bugzilla.listDetails": 1,  # Cached per bug.
+    # Not an API but the state of channels mirrored in sync mode:
+    "swapi.sync.state": -1,
 }
 
 VIRTUAL_APIS = dict()
@@ -761,7 +801,7 @@ def cvss_metrics(cvss, metrics_map=CVSSS_METRICS_MAP):
     return metrics
 
 
-def get_cvss_for_cve(cve):
+def get_cvss_for_cve_from_web(cve):
     """
     Get CVSS data for given cve from the Red Hat www site.
 
@@ -815,12 +855,369 @@ def get_cvss_for_cve(cve):
     return None
 
 
-def get_all_cve_g(raw=False):
+_CVE_REG = re.compile(r"^(?P<cve>CVE-\d+-\d+) .*")
+_CVE_CVSS_REG = re.compile(r"^(?P<cve>CVE-\d+-\d+) .*"
+                           r"cvss2=(?P<score>[^/]+)/"
+                           r"(?P<metrics>AV:[^,]+A:(?:N|P|C)).*")
+
+
+def parse_cve_line(line, cve_reg=_CVE_REG, cve_cvss_reg=_CVE_CVSS_REG,
+                   cvss_marker="cvss2="):
+    """
+    Parse a line in cve_dates.txt (see :function:`get_all_cve_g`).
+
+    :param line: A line in cve_dates.txt
+    :return: A dict contains CVE and CVSS data or None if it's not a valid line
+
+    >>> d = parse_cve_line("CVE-2009-1302 public=20090421,"
+    ...                    "cvss2=6.8/AV:N/AC:M/Au:N/C:P/I:P/A:P")
+    >>> (d["cve"], d["score"], d["metrics"])
+    ('CVE-2009-1302', '6.8', 'AV:N/AC:M/Au:N/C:P/I:P/A:P')
+    >>> d = parse_cve_line("CVE-2000-0909 public=20000922")
+    >>> (d["cve"], "score" in d)
+    ('CVE-2000-0909', False)
+    >>> parse_cve_line("Not a CVE line") is None
+    True
+    """
+    if cvss_marker in line:
+        m = cve_cvss_reg.match(line)
+    else:
+        m = cve_reg.match(line)
+
+    if not m:
+        return None
+
+    d = m.groupdict()
+    d["url"] = d["cve_url"] = cve2url(d["cve"])
+
+    return d
+
+
+def parse_errata_line(line, advisory_prefix="RH", cve_prefix="CVE-"):
+    """
+    Parse a line in rhsamapcpe.txt (see :function:`get_all_errata_g`).
+
+    :param line: A line in rhsamapcpe.txt
+    :return: A dict contains errata advisory and CVEs or None if it's not a
+        valid line
+
+    >>> d = parse_errata_line("RHSA-2012:1019 CVE-2012-0551,CVE-2012-1711 "
+    ...                       "cpe:/a:redhat:rhel_productivity:5")
+    >>> (d["advisory"], d["cves"])
+    ('RHSA-2012:1019', ['CVE-2012-0551', 'CVE-2012-1711'])
+    >>> parse_errata_line("# comment") is None
+    True
+    """
+    if not line.startswith(advisory_prefix):
+        return None
+
+    try:
+        (adv, cves, _cpe) = line.split()
+        assert cves.startswith(cve_prefix)
+
+        return dict(advisory=adv, cves=cves.split(','))
+
+    except (ValueError, AssertionError):
+        return None
+
+
+def cve_to_key(cve):
+    """
+    :param cve: A CVE ID string
+    :return: A tuple of (year, number) to sort CVEs
+
+    >>> cve_to_key("CVE-2014-10001") > cve_to_key("CVE-2014-9999")
+    True
+    """
+    (_prefix, year, num) = cve.split('-', 2)
+    return (int(year), int(num))
+
+
+class Dataset(object):
+    """Local copy of a text dataset on the web indexed in a SQLite database.
+
+    The copy is checked at intervals and downloaded again with conditional
+    GET requests (ETag and If-Modified-Since) only if it was modified on the
+    web, and then it's parsed and indexed only once so that point lookups
+    and range queries are done w/o loading the whole dataset.
+    """
+    name = None
+    url = None
+    schema = None
+
+    def __init__(self, topdir=DATASETS_DIR, url=None,
+                 interval=DATASET_CHECK_INTERVAL):
+        """
+        :param topdir: Dir to save the dataset and its index
+        :param url: URL of the dataset or None (use self.url)
+        :param interval: Interval in seconds to check the dataset on the web
+        """
+        if url is not None:
+            self.url = url
+
+        self.topdir = topdir
+        self.interval = interval
+        self.path = os.path.join(topdir, self.name + ".txt")
+        self.dbpath = os.path.join(topdir, self.name + ".sqlite")
+        self.metapath = os.path.join(topdir, self.name + ".json")
+
+    def meta(self):
+        """
+        :return: A dict of metadata of the local copy: etag, last_modified
+            and checked (time when it was checked)
+        """
+        try:
+            return json.load(open(self.metapath))
+        except (IOError, ValueError):
+            return dict()
+
+    def fetch(self, meta):
+        """
+        Download the dataset unless it's not modified since the last one.
+
+        :param meta: A dict of metadata of the local copy to update
+        :return: True if downloaded or False if not modified
+        """
+        headers = dict()
+        if os.path.exists(self.path):
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        req = urllib2.Request(url=self.url, headers=headers)
+        try:
+            resp = urllib2.urlopen(req, timeout=DATASET_FETCH_TIMEOUT)
+        except urllib2.HTTPError as exc:
+            if exc.code == 304:
+                LOG.debug("Not modified: " + self.url)
+                return False
+            raise
+
+        tmp = self.path + ".tmp"
+        with open(tmp, 'wb') as out:
+            shutil.copyfileobj(resp, out)
+        os.rename(tmp, self.path)
+
+        info = resp.info()
+        meta["etag"] = info.getheader("ETag")
+        meta["last_modified"] = info.getheader("Last-Modified")
+        LOG.info("Downloaded: " + self.url)
+
+        return True
+
+    def _index(self, conn, lines):
+        """
+        :param conn: A connection to the database to save the index in
+        :param lines: An iterable yields lines of the dataset
+        """
+        raise NotImplementedError("Inherited classes must implement this")
+
+    def index(self):
+        """
+        Parse the local copy and index it. The database is replaced
+        atomically so that readers are not disturbed.
+        """
+        tmp = self.dbpath + ".tmp"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+        conn = sqlite3.connect(tmp)
+        conn.text_factory = str
+        try:
+            conn.executescript(self.schema)
+            with open(self.path) as lines:
+                self._index(conn, lines)
+            conn.commit()
+        finally:
+            conn.close()
+
+        os.rename(tmp, self.dbpath)
+
+    def is_checked_recently(self, meta):
+        return os.path.exists(self.dbpath) and \
+            0 <= time.time() - meta.get("checked", 0) < self.interval
+
+    def refresh(self, force=False):
+        """
+        Download and index the dataset if it was modified on the web.
+
+        :param force: Check the dataset even if it was checked recently
+        :return: True if the dataset was updated
+        """
+        if not force and self.is_checked_recently(self.meta()):
+            return False
+
+        if not os.path.isdir(self.topdir):
+            os.makedirs(self.topdir, mode=0700)
+
+        with _flock(os.path.join(self.topdir, self.name + ".lock")):
+            meta = self.meta()  # It may be refreshed by others meanwhile.
+            if not force and self.is_checked_recently(meta):
+                return False
+
+            try:
+                updated = self.fetch(meta)
+            except Exception as exc:
+                LOG.warn("Could not get the dataset %s: %s" % (self.url, exc))
+                return False
+
+            if updated or not os.path.exists(self.dbpath):
+                self.index()
+
+            meta["checked"] = time.time()
+            json.dump(meta, open(self.metapath, 'w'))
+
+        return updated
+
+    def lines_g(self, offline=False):
+        """
+        :param offline: Do not check the dataset on the web if True
+        :return: A generator yields lines of the dataset
+        """
+        if not offline:
+            self.refresh()
+
+        if os.path.exists(self.path):
+            with open(self.path) as lines:
+                for line in lines:
+                    yield line.rstrip()
+
+    def query_g(self, sql, params=(), offline=False):
+        """
+        :param sql: SQL statement to query the index
+        :param params: Parameters of `sql`
+        :param offline: Do not check the dataset on the web if True
+        :return: A generator yields rows found
+        """
+        if not offline:
+            self.refresh()
+
+        if not os.path.exists(self.dbpath):
+            return
+
+        conn = sqlite3.connect(self.dbpath)
+        conn.text_factory = str
+        try:
+            for row in conn.execute(sql, params):
+                yield row
+        finally:
+            conn.close()
+
+
+class CveDataset(Dataset):
+    """CVE and CVSS data, cve_dates.txt. See :function:`get_all_cve_g`.
+    """
+    name = "cve_dates"
+    url = "https://www.redhat.com/security/data/metrics/cve_dates.txt"
+    schema = """\
+CREATE TABLE cve (cve TEXT PRIMARY KEY, year INTEGER, num INTEGER,
+                  score TEXT, metrics TEXT);
+CREATE INDEX cve_year_num ON cve (year, num);
+"""
+
+    def _index(self, conn, lines):
+        def rows_g():
+            for line in lines:
+                if not line.strip() or line.startswith("#"):
+                    continue
+
+                d = parse_cve_line(line)
+                if d is None:
+                    LOG.warn("Not look a valid CVE line: " + line)
+                    continue
+
+                yield ((d["cve"], ) + cve_to_key(d["cve"]) +
+                       (d.get("score"), d.get("metrics")))
+
+        conn.executemany("INSERT OR REPLACE INTO cve VALUES (?, ?, ?, ?, ?)",
+                         rows_g())
+
+
+class ErrataDataset(Dataset):
+    """Errata vs. CVEs data, rhsamapcpe.txt. See
+    :function:`get_all_errata_g`.
+    """
+    name = "rhsamapcpe"
+    url = "https://www.redhat.com/security/data/metrics/rhsamapcpe.txt"
+    schema = """\
+CREATE TABLE errata_cve (advisory TEXT, cve TEXT,
+                         PRIMARY KEY (advisory, cve));
+CREATE INDEX errata_cve_cve ON errata_cve (cve);
+"""
+
+    def _index(self, conn, lines):
+        def rows_g():
+            for line in lines:
+                d = parse_errata_line(line)
+                if d is None:
+                    if line.startswith("RH"):
+                        LOG.warn("Invalid line: " + line)
+                    continue
+
+                for cve in d["cves"]:
+                    yield (d["advisory"], cve)
+
+        conn.executemany("INSERT OR IGNORE INTO errata_cve VALUES (?, ?)",
+                         rows_g())
+
+
+CVE_DATASET = CveDataset()
+ERRATA_DATASET = ErrataDataset()
+
+
+def _cve_row_to_dict(row):
+    """
+    :param row: A tuple of (cve, score, metrics)
+    """
+    (cve, score, metrics) = row
+    d = dict(cve=cve, url=cve2url(cve), cve_url=cve2url(cve))
+    if score is not None:
+        d["score"] = score
+        d["metrics"] = metrics
+
+    return d
+
+
+def get_cvss_for_cve(cve, offline=False, dataset=None,
+                     fallback=get_cvss_for_cve_from_web):
+    """
+    Get CVSS data for given cve from CVE dataset, or the Red Hat www site if
+    the dataset is not available.
+
+    :param cve: CVE name, e.g. "CVE-2010-1585" :: str
+    :param offline: Do not access the web if True
+    :param dataset: An instance of :class:`CveDataset` or None (default)
+    :param fallback: Function to get CVSS data for given cve from the web
+    :return:  {"metrics": base_metric :: str, "score": base_score :: str}
+    """
+    dataset = CVE_DATASET if dataset is None else dataset
+    url_fmt = "http://nvd.nist.gov/cvss.cfm?version=2&name=%s&vector=(%s)"
+
+    rows = list(dataset.query_g("SELECT score, metrics FROM cve WHERE "
+                                "cve = ?", (cve, ), offline))
+    if rows:
+        (score, metrics) = rows[0]
+        if score is None:  # No CVSS
+            return None
+
+        return dict(cve=cve, metrics=metrics, metrics_v=cvss_metrics(metrics),
+                    score=score, url=url_fmt % (cve, metrics))
+
+    if offline or os.path.exists(dataset.dbpath):
+        return None
+
+    return fallback(cve)
+
+
+def get_all_cve_g(raw=False, offline=False, dataset=None):
     """
     Get CVE and CVSS data from Red Hat www site:
       https://www.redhat.com/security/data/metrics/cve_dates.txt
 
     :param raw: Get raw txt data if True [False]
+    :param offline: Do not access the web if True
+    :param dataset: An instance of :class:`CveDataset` or None (default)
 
     It yields {"cve", "metrics" (cvss2 base metric), "score" (cvss2 score),
     "url" (cve url), }.
@@ -836,54 +1233,53 @@ def get_all_cve_g(raw=False):
     CVE-2009-1302 ...,cvss2=6.8/AV:N/AC:M/Au:N/C:P/I:P/A:P
     CVE-2009-1303 ...,cvss2=6.8/AV:N/AC:M/Au:N/C:P/I:P/A:P,impact...
     """
-    cve_reg = r"^(?P<cve>CVE-\d+-\d+) .*"
-    cve_cvsss_reg = cve_reg + \
-        r"cvss2=(?P<score>[^/]+)/(?P<metrics>AV:[^,]+A:(?:N|P|C)).*"
-    cvss_marker = "cvss2="
-    url = "https://www.redhat.com/security/data/metrics/cve_dates.txt"
-
-    try:
-        data = urlread(url)
-        if raw:
-            for line in data.splitlines():
-                yield line
-        else:
-            for line in data.splitlines():
-                if not line or line.startswith("#"):
-                    continue
+    dataset = CVE_DATASET if dataset is None else dataset
 
-                if cvss_marker in line:
-                    m = re.match(cve_cvsss_reg, line)
-                else:
-                    m = re.match(cve_reg, line)
-
-                if m:
-                    d = m.groupdict()
-                    d["url"] = d["cve_url"] = cve2url(d["cve"])
-                else:
-                    LOG.warn("Not look a valid CVE line: " + line)
-                    d = None
+    if raw:
+        for line in dataset.lines_g(offline):
+            yield line
+    else:
+        for row in dataset.query_g("SELECT cve, score, metrics FROM cve "
+                                   "ORDER BY rowid", offline=offline):
+            yield _cve_row_to_dict(row)
 
-                yield d
 
-    except Exception as e:
-        LOG.warn("Could not get CVE and CVSS data: err=" + str(e))
-        yield  # None
+def get_all_cve(raw=False, offline=False, dataset=None):
+    """
+    :param raw: Get raw txt data if True [False]
+    """
+    return [r for r in get_all_cve_g(raw, offline, dataset) if r is not None]
 
 
-def get_all_cve(raw=False):
+def list_cves_in_range(first, last, offline=False, dataset=None):
     """
-    :param raw: Get raw txt data if True [False]
+    :param first: The first CVE ID in the range, e.g. "CVE-2014-0001"
+    :param last: The last CVE ID in the range, e.g. "CVE-2014-9999"
+    :param offline: Do not access the web if True
+    :param dataset: An instance of :class:`CveDataset` or None (default)
+
+    :return: A list of CVE and CVSS data same as :function:`get_all_cve`
+        returns in the range
     """
-    return [r for r in get_all_cve_g(raw) if r is not None]
+    dataset = CVE_DATASET if dataset is None else dataset
+    ((fyear, fnum), (lyear, lnum)) = (cve_to_key(first), cve_to_key(last))
+    sql = ("SELECT cve, score, metrics FROM cve WHERE year BETWEEN ? AND ? "
+           "AND (year > ? OR num >= ?) AND (year < ? OR num <= ?) "
+           "ORDER BY year, num")
+
+    return [_cve_row_to_dict(r) for r in
+            dataset.query_g(sql, (fyear, lyear, fyear, fnum, lyear, lnum),
+                            offline)]
 
 
-def get_all_errata_g(raw=False):
+def get_all_errata_g(raw=False, offline=False, dataset=None):
     """
     Get errata vs. CVEs data from Red Hat www site:
       https://www.redhat.com/security/data/metrics/rhsamapcpe.txt
 
     :param raw: Get raw txt data if True [False]
+    :param offline: Do not access the web if True
+    :param dataset: An instance of :class:`ErrataDataset` or None (default)
 
     It returns {errata_advisory: ["cve"]}
 
@@ -894,80 +1290,150 @@ def get_all_errata_g(raw=False):
     RHSA-2012:1019 CVE-2012-0551,CVE-2012-1711,...,CVE-2012-1726 cpe:/a:re:...
     RHSA-2012:1014 CVE-2012-1167 cpe:/a:redhat:jboss_enterprise_web_platfor...
     """
-    advisory_prefix = "RH"
-    cve_prefix = "CVE-"
-    url = "https://www.redhat.com/security/data/metrics/rhsamapcpe.txt"
+    dataset = ERRATA_DATASET if dataset is None else dataset
 
-    try:
-        data = urlread(url)
-        if raw:
-            for line in data.splitlines():
-                yield line
-        else:
-            for line in data.splitlines():
-                if not line.startswith(advisory_prefix):
-                    continue
+    if raw:
+        for line in dataset.lines_g(offline):
+            yield line
+    else:
+        rows = dataset.query_g("SELECT advisory, cve FROM errata_cve ORDER "
+                               "BY rowid", offline=offline)
+        for adv, advrows in groupby(rows, itemgetter(0)):
+            yield dict(advisory=adv, cves=[cve for _a, cve in advrows])
 
-                try:
-                    (adv, cves, cpe) = line.split()
-                    assert cves.startswith(cve_prefix)
 
-                    yield dict(advisory=adv, cves=cves.split(','))
+def get_all_errata(raw=False, offline=False, dataset=None):
+    return [r for r in get_all_errata_g(raw, offline, dataset)]
 
-                except (IndexError, AssertionError):
-                    LOG.warn("Invalid line: " + line)
-                    continue
 
-    except Exception as e:
-        LOG.warn("Could not get Errata vs. CVEs data: err=" + str(e))
+def get_cves_for_errata(advisory, offline=False, dataset=None):
+    """
+    :param advisory: Errata advisory, e.g. "RHSA-2012:1019"
+    :return: A list of CVE IDs of the errata
+    """
+    dataset = ERRATA_DATASET if dataset is None else dataset
+    return [r[0] for r in dataset.query_g("SELECT cve FROM errata_cve WHERE "
+                                          "advisory = ? ORDER BY rowid",
+                                          (advisory, ), offline)]
 
 
-def get_all_errata(raw=False):
-    return [r for r in get_all_errata_g(raw)]
+def list_errata_for_cve(cve, offline=False, dataset=None):
+    """
+    :param cve: CVE ID, e.g. "CVE-2012-0551"
+    :return: A list of advisories of errata for the CVE
+    """
+    dataset = ERRATA_DATASET if dataset is None else dataset
+    return [r[0] for r in dataset.query_g("SELECT advisory FROM errata_cve "
+                                          "WHERE cve = ? ORDER BY rowid",
+                                          (cve, ), offline)]
 
 
 _BZ_KEYS = ["bug_id", "summary", "priority", "severity"]
+_BZ_FIELD_SEP = "\x1f"
 
 
-def get_bugzilla_info(bzid, *keys):
+def _bugzilla_cmd():
     """
-    Get bugzilla info of given ID.
+    :return: A list of strings of the bugzilla command and its options
+    """
+    uri = os.environ.get("BUGZILLA_URI", '')
+    return ["bugzilla"] + (["--bugzilla=" + uri] if uri else [])
 
-    :param bzid: Bugzilla ID
-    :param keys: Bugzilla fields to get info
+
+def parse_bugzilla_output(output, keys=_BZ_KEYS, sep=_BZ_FIELD_SEP):
     """
-    default = dict()
-    if not keys:
-        keys = _BZ_KEYS
+    Parse the output of bugzilla query of which lines are fields of each bug
+    separated by `sep`. The first field must be bug_id.
 
-    try:
-        ofs = '\n'.join('%s %%{%s}' % (k, k) for k in keys)
+    :param output: The output string of bugzilla query
+    :param keys: Bugzilla fields in each line
+    :return: A dict of {bug_id: {field: value}}
+
+    >>> out = "1|bash crashes|high|medium\\n2|zsh|low|low\\n"
+    >>> out = out.replace('|', _BZ_FIELD_SEP)
+    >>> bzs = parse_bugzilla_output(out)
+    >>> sorted(bzs.keys()), bzs["1"]["summary"], bzs["2"]["severity"]
+    (['1', '2'], 'bash crashes', 'low')
+    """
+    res = dict()
+    for line in output.splitlines():
+        vals = line.split(sep)
+        if len(vals) != len(keys):
+            LOG.warn("Invalid line in bugzilla output: " + line)
+            continue
 
-        # wait a little to avoid DoS attack to the server if called
-        # multiple times.
-        time.sleep(random.random() * 5)
+        res[vals[0]] = dict(zip(keys, vals))
 
-        uri = os.environ.get("BUGZILLA_URI", '')
-        bzcmd = "bugzilla --bugzilla=" + uri if uri else "bugzilla"
+    return res
 
-        c = bzcmd + " query --bug_id=%s --outputformat='%s'" % (bzid, ofs)
-        LOG.debug(" bz: " + c[:c.rfind('\n')] + "...")
-        o = subprocess.check_output(c, shell=True)
 
-        if not o:
-            return default
+def get_bugzilla_info_many(bzids, keys=_BZ_KEYS):
+    """
+    Get bugzilla info of given IDs with a query.
+
+    :param bzids: A list of Bugzilla IDs
+    :param keys: Bugzilla fields to get info. bug_id is always added.
+
+    :return: A list of dicts of bugzilla info of each ID ({} if not found),
+        or a list of None if the query failed
+    """
+    keys = ["bug_id"] + [k for k in keys if k != "bug_id"]
+    ofs = _BZ_FIELD_SEP.join("%%{%s}" % k for k in keys)
+    cmd = _bugzilla_cmd() + ["query",
+                             "--bug_id=" + ','.join(str(i) for i in bzids),
+                             "--outputformat=" + ofs]
+
+    LOG.debug(" bz: %s ... (%d bugs)" % (' '.join(cmd[:-2]), len(bzids)))
+    try:
+        bzs = parse_bugzilla_output(subprocess.check_output(cmd), keys)
+    except (subprocess.CalledProcessError, OSError) as exc:
+        LOG.warn("Failed to query bugzilla: %s" % str(exc))
+        return [None] * len(bzids)
+
+    return [bzs.get(str(i), dict()) for i in bzids]
+
 
-        return dict(zip(keys, [l.split(' ', 1)[-1] for l in o.splitlines()]))
+def get_bugzilla_info(bzid, *keys):
+    """
+    Get bugzilla info of given ID.
+
+    :param bzid: Bugzilla ID
+    :param keys: Bugzilla fields to get info
 
-    except subprocess.CalledProcessError:
-        return default
+    :return: A dict of bugzilla info ({} if not found) or None if the query
+        failed
+    """
+    return get_bugzilla_info_many([bzid], keys or _BZ_KEYS)[0]
 
 
 VIRTUAL_APIS["swapi.cve.getCvss"] = get_cvss_for_cve
+VIRTUAL_APIS["swapi.cve.getCvssFromWeb"] = get_cvss_for_cve_from_web
 VIRTUAL_APIS["swapi.cve.getAll"] = get_all_cve
+VIRTUAL_APIS["swapi.cve.listInRange"] = list_cves_in_range
+VIRTUAL_APIS["swapi.cve.listErrata"] = list_errata_for_cve
 VIRTUAL_APIS["swapi.errata.getAll"] = get_all_errata
+VIRTUAL_APIS["swapi.errata.getCves"] = get_cves_for_errata
 VIRTUAL_APIS["swapi.bugzilla.getDetails"] = get_bugzilla_info
 
+# Virtual APIs can be called in batches w/ these functions take a list of
+# arguments and return a list of results for each of them.
+BATCH_VIRTUAL_APIS = {"swapi.bugzilla.getDetails": get_bugzilla_info_many}
+
+# Virtual APIs take arguments and return results of another API called w/
+# each of them in batches. Results are cached for each argument.
+MULTI_VIRTUAL_APIS = {"swapi.bugzilla.listDetails":
+                      "swapi.bugzilla.getDetails"}
+
+# Virtual APIs served from local datasets. Results of these are not cached
+# nor rate limited as datasets are cached and checked at intervals.
+DATASET_VIRTUAL_APIS = ("swapi.cve.getCvss", "swapi.cve.getAll",
+                        "swapi.cve.listInRange", "swapi.cve.listErrata",
+                        "swapi.errata.getAll", "swapi.errata.getCves")
+
+# Virtual APIs called if data are not found in datasets. These access the
+# web so that results of these are cached and rate limited.
+DATASET_FALLBACK_APIS = {"swapi.cve.getCvss": "swapi.cve.getCvssFromWeb"}
+
 
 def run(cmd_str):
     return commands.getstatusoutput(cmd_str)
@@ -987,9 +1453,40 @@ def is_iterable(xs):
     return isinstance(xs, (list, tuple)) or getattr(xs, "next", False)
 
 
+def to_args(arg):
+    """
+    :param arg: An argument or a tuple of arguments for an API call
+    :return: A tuple of arguments
+
+    >>> to_args(1), to_args((1, "a")), to_args([1])
+    ((1,), (1, 'a'), ([1],))
+    """
+    return arg if isinstance(arg, tuple) else (arg, )
+
+
+def chunks_g(xs, size):
+    """
+    :param xs: An iterable
+    :param size: Max size of each chunk
+
+    >>> list(chunks_g(range(5), 2))
+    [[0, 1], [2, 3], [4]]
+    >>> list(chunks_g([], 2))
+    []
+    """
+    xs = iter(xs)
+    while True:
+        chunk = list(itertools.islice(xs, size))
+        if not chunk:
+            break
+
+        yield chunk
+
+
 class Cache(object):
     """Pickle module based data caching backend.
     """
+    readonly = False
 
     def __init__(self, domain, topdir=CACHE_DIR,
                  expirations=API_CACHE_EXPIRATIONS):
@@ -1019,11 +1516,18 @@ class Cache(object):
         """
         return os.path.join(self.dir(obj), 'cache.pkl')
 
-    def load(self, obj):
+    def load_with_size(self, obj):
+        """
+        :return: A tuple of (cached data or None, size of it in bytes)
+        """
         try:
-            return pickle.load(open(self.path(obj), 'rb'))
+            data = open(self.path(obj), 'rb').read()
+            return (pickle.loads(data), len(data))
         except:
-            return None
+            return (None, 0)
+
+    def load(self, obj):
+        return self.load_with_size(obj)[0]
 
     def save(self, obj, data, protocol=pickle.HIGHEST_PROTOCOL):
         """
@@ -1045,6 +1549,19 @@ class Cache(object):
         except:
             return False
 
+    def load_many(self, objs):
+        """
+        :param objs: A list of objects of which obj_id are used as caching keys
+        :return: A list of cached data or None for each of `objs`
+        """
+        return [self.load(obj) for obj in objs]
+
+    def save_many(self, pairs):
+        """
+        :param pairs: An iterable yields tuples of (obj, data) to save
+        """
+        return all([self.save(obj, data) for obj, data in pairs])
+
     def needs_update(self, obj, obj2key=id_):
         """
         :param obj: Cache key object
@@ -1080,6 +1597,7 @@ class Cache(object):
 
 
 class ReadOnlyCache(Cache):
+    readonly = True
 
     def save(self, *args, **kwargs):
         LOG.debug("Not save as read-only cache: " + self.topdir)
@@ -1090,71 +1608,670 @@ class ReadOnlyCache(Cache):
         return False
 
 
-class RpcApi(object):
-    """Spacewalk / RHN XML-RPC API server object.
-    """
+_SESSION_FAULT_REG = re.compile(r"session", re.I)
 
-    def __init__(self, conn_params, enable_cache=True, cachedir=CACHE_DIR,
-                 debug=False, readonly=False, cacheonly=False, force=False,
-                 vapis=VIRTUAL_APIS):
-        """
-        :param conn_params: Connection parameters: server, userid, password,
-            timeout, protocol.
-        :param enable_cache: Whether to enable query result cache or not.
-        :param cachedir: Cache saving directory
-        :param debug: Debug mode
-        :param readonly: Use read only cache
-        :param cacheonly: Get results only from cache (w/o any access to RHNS)
-        :param force: Force update caches even if these cached data are new and
-            not need updates
-        :param vapis: Virtual APIs :: dict
-        """
-        self.url = "%(protocol)s://%(server)s/rpc/api" % conn_params
-        self.userid = conn_params.get("userid")
-        self.passwd = conn_params.get("password")
-        self.timeout = conn_params.get("timeout")
+# Special cases which do not need session_id parameter:
+# api.{getVersion, systemVersion} and auth.login.
+_NO_SID_METHOD_REG = re.compile(r"^(api.|proxy.|auth.login)")
 
-        self.sid = None
-        self.debug = debug
-        self.readonly = readonly
-        self.cacheonly = cacheonly
-        self.force = force
-        self.vapis = vapis
+# Errors in accessing the server, e.g. connection refused or timed out
+# (socket.timeout and ssl.SSLError are subclasses of socket.error).
+_TRANSPORT_ERRORS = (socket.error, xmlrpclib.ProtocolError,
+                     httplib.HTTPException)
 
-        if enable_cache:
-            cachecls = ReadOnlyCache if self.readonly else Cache
-            cdomain = str_to_id("%s:%s" % (self.url, self.userid))
 
-            self.caches = [ReadOnlyCache(cdomain, SYSTEM_CACHE_DIR),
-                           cachecls(cdomain, cachedir)]
-        else:
-            self.caches = []
+def is_session_fault(fault, reg=_SESSION_FAULT_REG):
+    """
+    :param fault: An instance of xmlrpclib.Fault
+    :return: True if the fault looks caused by invalid or expired session
 
-    def __del__(self):
-        self.logout()
+    >>> is_session_fault(xmlrpclib.Fault(-1, "Could not find session"))
+    True
+    >>> is_session_fault(xmlrpclib.Fault(-210, "No such package"))
+    False
+    """
+    return reg.search(str(fault.faultString)) is not None
 
-    def login(self):
-        try:
-            self.server = xmlrpclib.ServerProxy(self.url, verbose=self.debug,
-                                                use_datetime=True)
-        except:
-            LOG.error("Failed to connect: url=" + self.url)
-            raise
+
+_SQLITE_SCHEMA = """\
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    method TEXT,
+    mtime REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_method_mtime ON cache (method, mtime);
+"""
+_SQLITE_TIMEOUT = 60  # [sec]
+_SQLITE_MAX_PARAMS = 900
+
+
+class SqliteCache(Cache):
+    """SQLite based data caching backend. Cached data of a domain are kept in
+    a single database file instead of a file per data.
+
+    Database is opened in WAL mode so that readers in other threads and
+    processes are not blocked by a writer.
+    """
+    readonly = False
+
+    def __init__(self, domain, topdir=CACHE_DIR,
+                 expirations=API_CACHE_EXPIRATIONS):
+        """Initialize domain-local caching parameters.
+
+        :param domain: a str represents target domain
+        :param topdir: topdir to save the database file
+        :param expirations: Cache expiration dates map
+        """
+        self.domain = domain
+        self.topdir = topdir
+        self.expirations = expirations
+        self.path = os.path.join(topdir, domain + ".sqlite")
+        self._local = threading.local()
+
+    def conn(self):
+        """
+        :return: A connection to the database of the current thread and
+            process, or None if the database is not available
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        if self.readonly:
+            if not os.path.exists(self.path):
+                return None
+        elif not os.path.isdir(self.topdir):
+            os.makedirs(self.topdir, mode=0700)
+
+        conn = sqlite3.connect(self.path, timeout=_SQLITE_TIMEOUT)
+        conn.text_factory = str
+        if not self.readonly:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SQLITE_SCHEMA)
+
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _query(self, sql, params=()):
+        conn = self.conn()
+        if conn is None:
+            return []
 
         try:
-            self.sid = self.server.auth.login(self.userid, self.passwd,
-                                              self.timeout)
-        except:
-            LOG.error("Failed to auth: url=%s, userid=%s" %
-                      (self.url, self.userid))
-            raise
+            return conn.execute(sql, params).fetchall()
+        except sqlite3.Error as exc:
+            LOG.warn("Failed to query the cache %s: %s" % (self.path, exc))
+            return []
+
+    def _save_rows(self, rows):
+        """
+        :param rows: A list of tuples of (key, method, mtime, data)
+        """
+        try:
+            with self.conn() as conn:
+                conn.executemany("INSERT OR REPLACE INTO cache "
+                                 "VALUES (?, ?, ?, ?)", rows)
+            return True
+        except sqlite3.Error as exc:
+            LOG.warn("Failed to save in the cache %s: %s" % (self.path, exc))
+            return False
+
+    def mtime(self, obj):
+        """
+        :return: The time when the data of the object was cached or None
+        """
+        rows = self._query("SELECT mtime FROM cache WHERE key = ?",
+                           (object_to_id(obj), ))
+        return rows[0][0] if rows else None
+
+    def load_with_size(self, obj):
+        rows = self._query("SELECT data FROM cache WHERE key = ?",
+                           (object_to_id(obj), ))
+        if not rows:
+            return (None, 0)
+
+        data = str(rows[0][0])
+        return (pickle.loads(data), len(data))
+
+    def load_many(self, objs):
+        oids = [object_to_id(obj) for obj in objs]
+        found = dict()
+        for chunk in chunks_g(oids, _SQLITE_MAX_PARAMS):
+            sql = ("SELECT key, data FROM cache WHERE key IN (%s)" %
+                   ", ".join('?' * len(chunk)))
+            found.update(self._query(sql, chunk))
+
+        return [pickle.loads(str(found[oid])) if oid in found else None for
+                oid in oids]
+
+    def _row(self, obj, data, mtime, protocol=pickle.HIGHEST_PROTOCOL):
+        method = obj[0] if isinstance(obj, tuple) and obj else None
+        return (object_to_id(obj), method, mtime,
+                sqlite3.Binary(pickle.dumps(data, protocol)))
+
+    def save(self, obj, data):
+        """
+        :param obj:  object of which obj_id is used as caching key
+        :param data: data to saved in cache
+        """
+        return self._save_rows([self._row(obj, data, time.time())])
+
+    def save_many(self, pairs):
+        now = time.time()
+        return self._save_rows([self._row(obj, data, now) for obj, data
+                                in pairs])
+
+    def needs_update(self, obj, obj2key=id_):
+        """
+        :param obj: Cache key object
+        :param obj2key: Any callables convert obj to key for expirations map.
+        """
+        key = obj2key(obj)
+        expires = self.expirations.get(key, 0)  # Default: no cache
+
+        if expires == 0:  # it means never cache.
+            return True
+
+        if expires < 0:  # it meens cache never expire.
+            return False
+
+        mtime = self.mtime(obj)
+        if mtime is None:
+            LOG.debug("Cache not found for " + str(obj))
+            return True
+
+        now = time.time()
+        if now < mtime:  # Cached in the future. Update it later.
+            return True
+
+        return (now - mtime) >= expires * 86400
+
+    def evict(self):
+        """
+        Remove expired data. Data migrated from the old layout, of which API
+        methods are not known, are kept.
+
+        :return: Number of data removed
+        """
+        conn = self.conn()
+        if conn is None or self.readonly:
+            return 0
+
+        now = time.time()
+        methods = [m for m, in self._query("SELECT DISTINCT method FROM "
+                                           "cache WHERE method IS NOT NULL")]
+        nrows = 0
+        with conn:
+            for method in methods:
+                expires = self.expirations.get(method, 0)
+                if expires < 0:
+                    continue
+
+                cur = conn.execute("DELETE FROM cache WHERE method = ? AND "
+                                   "mtime < ?",
+                                   (method, now - expires * 86400))
+                nrows += cur.rowcount
+
+        return nrows
+
+    def compact(self):
+        """
+        Remove expired data and shrink the database file.
+
+        :return: Number of data removed
+        """
+        nrows = self.evict()
+        conn = self.conn()
+        if conn is not None and not self.readonly:
+            conn.execute("VACUUM")
+
+        return nrows
+
+    def migrate(self, topdir=None):
+        """
+        Import data cached by :class:`Cache` in `topdir`/`domain`/. Caching
+        keys in both backends are same so that migrated data are used as
+        they are.
+
+        :param topdir: topdir the data were cached in or None (self.topdir)
+        :return: Number of data migrated
+        """
+        srcdir = os.path.join(topdir or self.topdir, self.domain)
+        rows = []
+        for dirpath, _dirs, files in os.walk(srcdir):
+            if "cache.pkl" not in files:
+                continue
+
+            path = os.path.join(dirpath, "cache.pkl")
+            oid = os.path.relpath(dirpath, srcdir).replace(os.path.sep, '')
+            try:
+                data = open(path, 'rb').read()
+                rows.append((oid, None, os.stat(path).st_mtime,
+                             sqlite3.Binary(data)))
+            except (IOError, OSError):
+                LOG.warn("Failed to load: " + path)
+
+        if rows and not self.readonly:
+            with self.conn() as conn:
+                conn.executemany("INSERT OR IGNORE INTO cache "
+                                 "VALUES (?, ?, ?, ?)", rows)
+
+        return len(rows)
+
+
+class ReadOnlySqliteCache(SqliteCache):
+    readonly = True
+
+    def save(self, *args, **kwargs):
+        LOG.debug("Not save as read-only cache: " + self.path)
+        return True
+
+    def save_many(self, *args, **kwargs):
+        return self.save()
+
+    def needs_update(self, *args, **kwargs):
+        LOG.debug("No updates needed as read-only cache: " + self.path)
+        return False
+
+
+def mk_caches(domain, cachedir=CACHE_DIR, readonly=False, backend="pickle"):
+    """
+    :param domain: a str represents target domain
+    :param cachedir: Cache saving directory
+    :param readonly: Use read only cache
+    :param backend: Caching backend, pickle or sqlite
+
+    :return: A list of caches, the system cache and user's one
+    """
+    if backend == "sqlite":
+        (cachecls, rocachecls) = (SqliteCache, ReadOnlySqliteCache)
+    else:
+        (cachecls, rocachecls) = (Cache, ReadOnlyCache)
+
+    return [rocachecls(domain, SYSTEM_CACHE_DIR),
+            (rocachecls if readonly else cachecls)(domain, cachedir)]
+
+
+@contextlib.contextmanager
+def _flock(path, mode=fcntl.LOCK_EX):
+    """
+    :param path: Lock (and state) file path
+    :return: A file object of `path` locked
+    """
+    fobj = open(path, 'a+')
+    try:
+        fcntl.flock(fobj, mode)
+        yield fobj
+    finally:
+        fobj.close()  # It releases the lock also.
+
+
+class RateLimiter(object):
+    """Token bucket rate limiter.
+
+    The state of the bucket and slots for concurrent requests are kept in
+    small lock files so that the limits are shared among threads and worker
+    processes accessing the same server.
+    """
+
+    def __init__(self, key, rate=RATE, burst=BURST, concurrency=CONCURRENCY,
+                 statedir=RATELIMIT_DIR):
+        """
+        :param key: A str identifies the server to limit accesses to
+        :param rate: Requests per second. 0 or less means no limits.
+        :param burst: Burst size, max number of requests sent at once
+        :param concurrency: Max number of concurrent requests or 0 (no
+            limits)
+        :param statedir: Dir to save the state and lock files
+        """
+        self.rate = float(rate)
+        self.burst = max(int(burst), 1)
+        self.concurrency = int(concurrency)
+        self.path = os.path.join(statedir, str_to_id(key))
+
+        if (self.rate > 0 or self.concurrency > 0) and \
+                not os.path.exists(statedir):
+            try:
+                os.makedirs(statedir, mode=0700)
+            except OSError:  # Made by others in the meantime.
+                pass
+
+    def reserve(self):
+        """
+        Take a token from the bucket in advance.
+
+        :return: Seconds to wait until the token becomes available
+        """
+        if self.rate <= 0:
+            return 0
+
+        with _flock(self.path + ".bucket") as fobj:
+            now = time.time()
+            fobj.seek(0)
+            try:
+                (tokens, stamp) = [float(x) for x in fobj.read().split()]
+            except ValueError:  # Not initialized yet or broken.
+                (tokens, stamp) = (self.burst, now)
+
+            tokens = min(self.burst, tokens + (now - stamp) * self.rate) - 1
+
+            fobj.seek(0)
+            fobj.truncate()
+            fobj.write("%f %f" % (tokens, now))
+
+        return 0 if tokens >= 0 else -tokens / self.rate
+
+    def acquire_slot(self, block=True, interval=0.1):
+        """
+        :param block: Wait until any slot becomes free if True
+        :return: A file object of the slot locked, or None if no limits or no
+            slot available in non-blocking mode
+        """
+        while self.concurrency > 0:
+            for idx in range(self.concurrency):
+                fobj = open("%s.slot.%d" % (self.path, idx), 'a')
+                try:
+                    fcntl.flock(fobj, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fobj
+                except IOError:
+                    fobj.close()
+
+            if not block:
+                break
+
+            time.sleep(interval)
+
+        return None
+
+    @contextlib.contextmanager
+    def limit(self):
+        """
+        Wait for a token and a slot for a request and release the slot after
+        the request finished.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            LOG.debug("Wait %.2f sec for rate limits: %s" % (wait, self.path))
+            time.sleep(wait)
+
+        slot = self.acquire_slot()
+        try:
+            yield
+        finally:
+            if slot is not None:
+                slot.close()
+
+
+def _get_rate_limiter(key, rate=RATE, burst=BURST, concurrency=CONCURRENCY):
+    """
+    :return: An instance of :class:`RateLimiter` shared among callers giving
+        same parameters
+    """
+    return RateLimiter(key, rate, burst, concurrency)
+
+
+get_rate_limiter = memoize(_get_rate_limiter)
+
+
+class Stats(object):
+    """Counters and timers of caches, server calls, logins and rate limits.
+    It's safe to share among threads.
+
+    Counters of each cache tier (dir) and API method are:
+
+    - hits: Found in the cache
+    - misses: Not found in the cache
+    - stale: Not used as it needs update: expired, not cached yet or the API
+      is not cached
+    - bytes: Bytes of data loaded from the cache
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        :param buckets: Upper bounds of buckets of the latency histogram
+        """
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.caches = dict()
+            self.server = dict()
+            self.logins = dict(count=0, time=0.0)
+            self.throttle = dict(count=0, time=0.0)
+
+    def count_cache(self, tier, method, name, nbytes=0):
+        """
+        :param tier: Cache tier, the top dir of the cache
+        :param method: API method name
+        :param name: Counter name, hits, misses or stale
+        :param nbytes: Bytes of data loaded
+        """
+        with self._lock:
+            counters = self.caches.setdefault(tier, dict()).setdefault(
+                method, dict(hits=0, misses=0, stale=0, bytes=0))
+            counters[name] += 1
+            counters["bytes"] += nbytes
+
+    def observe_server(self, method, secs, error=False):
+        """
+        :param method: API method name
+        :param secs: Time of the request to the server. A batch of multicall
+            is a request.
+        :param error: The request failed if True
+        """
+        with self._lock:
+            stats = self.server.setdefault(
+                method, dict(calls=0, errors=0, time=0.0,
+                             histogram=[0] * (len(self.buckets) + 1)))
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["time"] += secs
+            stats["histogram"][bisect.bisect_left(self.buckets, secs)] += 1
+
+    def observe_login(self, secs):
+        with self._lock:
+            self.logins["count"] += 1
+            self.logins["time"] += secs
+
+    def observe_throttle(self, secs):
+        """
+        :param secs: Time waited for rate limits
+        """
+        with self._lock:
+            self.throttle["count"] += 1
+            self.throttle["time"] += secs
+
+    def dump(self):
+        """
+        :return: A dict of stats
+        """
+        labels = ["<=%s" % b for b in self.buckets] + \
+            [">%s" % self.buckets[-1]]
+
+        with self._lock:
+            caches = dict((t, dict((m, dict(cs)) for m, cs
+                                   in ms.iteritems())) for t, ms
+                          in self.caches.iteritems())
+            server = dict((m, dict(ss, histogram=dict(zip(labels,
+                                                          ss["histogram"]))))
+                          for m, ss in self.server.iteritems())
+
+            return dict(caches=caches, server=server,
+                        logins=dict(self.logins),
+                        throttle=dict(self.throttle))
+
+    def save(self, path):
+        """
+        :param path: Path to the file to dump stats in JSON
+        """
+        with open(path, 'w') as out:
+            json.dump(self.dump(), out, indent=2)
+
+
+class RpcApi(object):
+    """Spacewalk / RHN XML-RPC API server object.
+
+    It keeps an authenticated session and re-login when it expired, and it's
+    safe to share among threads.
+    """
+
+    def __init__(self, conn_params, enable_cache=True, cachedir=CACHE_DIR,
+                 debug=False, readonly=False, cacheonly=False, force=False,
+                 vapis=VIRTUAL_APIS, batch_size=BATCH_SIZE,
+                 cache_backend="pickle"):
+        """
+        :param conn_params: Connection parameters: server, userid, password,
+            timeout, protocol and optionally rate limits: rate, burst and
+            concurrency.
+        :param enable_cache: Whether to enable query result cache or not.
+        :param cachedir: Cache saving directory
+        :param debug: Debug mode
+        :param readonly: Use read only cache
+        :param cacheonly: Get results only from cache (w/o any access to RHNS)
+        :param force: Force update caches even if these cached data are new and
+            not need updates
+        :param vapis: Virtual APIs :: dict
+        :param batch_size: Max number of calls in a batch of multicall
+        :param cache_backend: Caching backend, pickle or sqlite
+        """
+        self.url = "%(protocol)s://%(server)s/rpc/api" % conn_params
+        self.userid = conn_params.get("userid")
+        self.passwd = conn_params.get("password")
+        self.timeout = conn_params.get("timeout")
+        self.limiter = get_rate_limiter(self.url,
+                                        conn_params.get("rate", RATE),
+                                        conn_params.get("burst", BURST),
+                                        conn_params.get("concurrency",
+                                                        CONCURRENCY))
+
+        self.sid = None
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self.debug = debug
+        self.readonly = readonly
+        self.cacheonly = cacheonly
+        self.force = force
+        self.vapis = vapis
+        self.batch_size = batch_size
+        self.multicall_supported = True
+        self.stats = Stats()
+
+        # Results are cached separately for each server and user.
+        self.cache_domain = str_to_id("%s:%s" % (self.url, self.userid))
+        if enable_cache:
+            self.caches = mk_caches(self.cache_domain, cachedir,
+                                    self.readonly, cache_backend)
+        else:
+            self.caches = []
+
+    def __del__(self):
+        self.logout()
+
+    def _server_proxy(self):
+        """
+        Make a XML-RPC server proxy. Its transport keeps the HTTP(S)
+        connection to the server alive and reuses it among calls.
+        """
+        return xmlrpclib.ServerProxy(self.url, verbose=self.debug,
+                                     use_datetime=True)
+
+    @property
+    def server(self):
+        """
+        XML-RPC server proxy of the current thread. Server proxies and their
+        transports are not thread safe so that each thread has its own one.
+        """
+        server = getattr(self._local, "server", None)
+        if server is None:
+            try:
+                server = self._local.server = self._server_proxy()
+            except:
+                LOG.error("Failed to connect: url=" + self.url)
+                raise
+
+        return server
+
+    def login(self, stale_sid=None):
+        """
+        Login unless logged in already. The session is shared among threads.
+
+        :param stale_sid: Expired session ID to login again if it's still
+            used, or None
+        :return: Session ID
+        """
+        with self._lock:
+            if self.sid is not None and self.sid != stale_sid:
+                return self.sid  # Logged in already (by other threads).
+
+            start = time.time()
+            try:
+                self.sid = self.server.auth.login(self.userid, self.passwd,
+                                                  self.timeout)
+                self.stats.observe_login(time.time() - start)
+            except:
+                LOG.error("Failed to auth: url=%s, userid=%s" %
+                          (self.url, self.userid))
+                raise
+
+            return self.sid
 
     def logout(self):
         if self.sid is None:
             return
 
-        self.server.auth.logout(self.sid)
-        self.sid = None
+        with self._lock:
+            if self.sid is not None:
+                self.server.auth.logout(self.sid)
+                self.sid = None
+
+    @contextlib.contextmanager
+    def request(self, method_name, limiter=None):
+        """
+        Wait for rate limits and record the time of the request.
+
+        :param method_name: API method name
+        :param limiter: An instance of RateLimiter or None (self.limiter)
+        """
+        start = time.time()
+        with (self.limiter if limiter is None else limiter).limit():
+            waited = time.time() - start
+            if waited > 0.001:
+                self.stats.observe_throttle(waited)
+
+            start = time.time()
+            try:
+                yield
+            except Exception:
+                self.stats.observe_server(method_name, time.time() - start,
+                                          True)
+                raise
+
+            self.stats.observe_server(method_name, time.time() - start)
+
+    def _call_server(self, method_name, *args):
+        """
+        Call the API on the server. Login again and retry once if the session
+        expired.
+        """
+        method = getattr(self.server, method_name)
+
+        if _NO_SID_METHOD_REG.match(method_name):
+            return method(*args)
+
+        sid = self.login()
+        try:
+            return method(sid, *args)
+        except xmlrpclib.Fault as exc:
+            if not is_session_fault(exc):
+                raise
+
+            LOG.info("Session expired. Login again: url=%s, userid=%s" %
+                     (self.url, self.userid))
+            return method(self.login(sid), *args)
 
     def get_result_from_caches(self, key):
         obj2key = lambda obj: obj[0]  # obj = (method, args)
@@ -1162,18 +2279,24 @@ class RpcApi(object):
         if self.force:
             return None
 
+        method = obj2key(key)
         for cache in self.caches:
             LOG.debug("Try the cache: " + cache.topdir)
             if not self.cacheonly and cache.needs_update(key, obj2key):
                 LOG.debug("Cached result is old and not used: " + str(key))
+                self.stats.count_cache(cache.topdir, method, "stale")
             else:
                 LOG.debug("Loading cache: " + str(key))
-                ret = cache.load(key)
+                (ret, nbytes) = cache.load_with_size(key)
 
                 if ret is not None:
                     LOG.debug("Found cached result for " + str(key))
+                    self.stats.count_cache(cache.topdir, method, "hits",
+                                           nbytes)
                     return ret
 
+                self.stats.count_cache(cache.topdir, method, "misses")
+
             LOG.debug("No cached results found: " + cache.topdir)
 
         return None
@@ -1182,7 +2305,13 @@ class RpcApi(object):
         return (method_name, args)
 
     def call_virtual_api(self, method_name, *args):
-        ret = self.vapis[method_name](*args)
+        # Virtual APIs access other servers than Spacewalk / RHN so that
+        # these are limited separately.
+        with self.request(method_name, get_rate_limiter(method_name)):
+            ret = self.vapis[method_name](*args)
+
+        if ret is None:  # Failed and should be tried again later.
+            return ret
 
         for cache in self.caches:
             key = self.ma_to_key(method_name, args)
@@ -1192,6 +2321,19 @@ class RpcApi(object):
 
     def call(self, method_name, *args):
         LOG.debug("Call: api=%s, args=%s" % (method_name, str(args)))
+        if method_name in DATASET_VIRTUAL_APIS and method_name in self.vapis:
+            kwargs = dict(offline=self.cacheonly)
+            if method_name in DATASET_FALLBACK_APIS:
+                fallback = DATASET_FALLBACK_APIS[method_name]
+                kwargs["fallback"] = lambda *fargs: self.call(fallback,
+                                                              *fargs)
+
+            return self.vapis[method_name](*args, **kwargs)
+
+        if method_name in MULTI_VIRTUAL_APIS:
+            return list(self.multicall(MULTI_VIRTUAL_APIS[method_name],
+                                       args))
+
         key = self.ma_to_key(method_name, args)
 
         if self.caches:
@@ -1204,26 +2346,13 @@ class RpcApi(object):
             else:
                 return ret
 
-        # wait a little to avoid DoS attack to the server if called
-        # multiple times.
-        time.sleep(random.random() * 5)
-
         if method_name in self.vapis:
             return self.call_virtual_api(method_name, *args)
 
         try:
             LOG.debug("Try accessing the server to get results")
-            if self.sid is None:
-                self.login()
-
-            method = getattr(self.server, method_name)
-
-            # Special cases which do not need session_id parameter:
-            # api.{getVersion, systemVersion} and auth.login.
-            if re.match(r"^(api.|proxy.|auth.login)", method_name):
-                ret = method(*args)
-            else:
-                ret = method(self.sid, *args)
+            with self.request(method_name):
+                ret = self._call_server(method_name, *args)
 
             for cache in self.caches:
                 cache.save(key, ret)
@@ -1234,15 +2363,154 @@ class RpcApi(object):
             raise RuntimeError("rpc: method '%s', args '%s'\nError message: "
                                "%s" % (method_name, str(args), m))
 
-    def multicall(self, method_name, argsets):
-        """Quick hack to implement XML-RPC's multicall like function.
+    def _call_or_none(self, method_name, *args):
+        try:
+            return self.call(method_name, *args)
+        except RuntimeError as exc:
+            LOG.warn(str(exc))
+            return None
+        except _TRANSPORT_ERRORS as exc:
+            LOG.warn("rpc: method '%s', args '%s'\nTransport error: %s" %
+                     (method_name, str(args), exc))
+            return None
+
+    def _multicall_server_once(self, method_name, argsets, sid=None):
+        """
+        :return: A list of results or instances of xmlrpclib.Fault
+        """
+        mcall = xmlrpclib.MultiCall(self.server)
+        method = getattr(mcall, method_name)
+
+        for arg in argsets:
+            if sid is None:
+                method(*to_args(arg))
+            else:
+                method(sid, *to_args(arg))
+
+        results = mcall()
+        rets = []
+        for idx in range(len(argsets)):
+            try:
+                rets.append(results[idx])
+            except xmlrpclib.Fault as exc:
+                rets.append(exc)
+
+        return rets
+
+    def _multicall_server(self, method_name, argsets):
+        """
+        Call the API with each of argsets in a batch with system.multicall.
+        Login again and retry once if the session expired.
+
+        :return: A list of results or instances of xmlrpclib.Fault
+        """
+        if _NO_SID_METHOD_REG.match(method_name):
+            return self._multicall_server_once(method_name, argsets)
+
+        sid = self.login()
+        rets = self._multicall_server_once(method_name, argsets, sid)
+
+        if any(isinstance(r, xmlrpclib.Fault) and is_session_fault(r) for r
+               in rets):
+            LOG.info("Session expired. Login again: url=%s, userid=%s" %
+                     (self.url, self.userid))
+            rets = self._multicall_server_once(method_name, argsets,
+                                               self.login(sid))
+        return rets
+
+    def _multicall_batch(self, method_name, argsets):
+        """
+        :return: A list of results for each of argsets or None if failed
+        """
+        keys = [self.ma_to_key(method_name, to_args(arg)) for arg
+                in argsets]
+        if self.caches:
+            rets = [self.get_result_from_caches(k) for k in keys]
+        else:
+            rets = [None] * len(argsets)
+
+        misses = [idx for idx, ret in enumerate(rets) if ret is None]
+        if not misses or self.cacheonly:
+            return rets
+
+        LOG.debug("Call %s in a batch: %d/%d calls" % (method_name,
+                                                       len(misses),
+                                                       len(argsets)))
+        if method_name in self.vapis:
+            with self.request(method_name, get_rate_limiter(method_name)):
+                mrets = BATCH_VIRTUAL_APIS[method_name]([argsets[i] for i
+                                                         in misses])
+        else:
+            try:
+                with self.request(method_name):
+                    mrets = self._multicall_server(method_name,
+                                                   [argsets[i] for i
+                                                    in misses])
+            except xmlrpclib.Fault as exc:
+                LOG.warn("Looks multicall is not supported. Fallback to "
+                         "sequential calls: %s" % str(exc))
+                self.multicall_supported = False
+                mrets = [self._call_or_none(method_name, *to_args(argsets[i]))
+                         for i in misses]
+            except _TRANSPORT_ERRORS as exc:
+                LOG.warn("rpc: method '%s', %d calls in a batch\n"
+                         "Transport error: %s" % (method_name, len(misses),
+                                                  exc))
+                mrets = [None] * len(misses)
+
+        for idx, ret in itertools.izip(misses, mrets):
+            if isinstance(ret, xmlrpclib.Fault):
+                LOG.warn("rpc: method '%s', args '%s'\nError message: %s" %
+                         (method_name, str(argsets[idx]), ret))
+                continue
+
+            rets[idx] = ret
+
+        pairs = [(keys[i], rets[i]) for i in misses if rets[i] is not None]
+        for cache in self.caches:
+            cache.save_many(pairs)
+
+        return rets
+
+    def multicall(self, method_name, argsets, batch_size=None):
+        """Call the API with each of argsets in batches with XML-RPC's
+        system.multicall. Cached results are returned without accessing the
+        server, and failures of each call are logged and returned as None.
+        Calls are done one by one if the server does not support multicall.
+        Virtual APIs are called in batches only if these are in
+        BATCH_VIRTUAL_APIS.
+
+        An argument may be a tuple of arguments to call the API needs more
+        than one arguments, e.g. ("foo", "1.0", "1", " ", "x86_64") for
+        packages.findByNvrea.
 
         Please note that it returns a generator not a list.
 
         @see xmlrpclib.MultiCall
+
+        :param method_name: API name
+        :param argsets: An iterable yields an argument or a tuple of
+            arguments for each call
+        :param batch_size: Max number of calls in a batch or None (use
+            self.batch_size)
         """
-        for arg in argsets:
-            yield self.call(method_name, arg)
+        if batch_size is None:
+            batch_size = self.batch_size
+
+        for chunk in chunks_g(argsets, batch_size):
+            if method_name in self.vapis:
+                batchable = method_name in BATCH_VIRTUAL_APIS
+            else:
+                batchable = self.multicall_supported
+
+            if batchable and batch_size > 1:
+                rets = self._multicall_batch(method_name, chunk)
+            else:
+                rets = [self._call_or_none(method_name, *to_args(a)) for a
+                        in chunk]
+
+            for ret in rets:
+                yield ret
 
 
 def __parse(arg):
@@ -1411,6 +2679,7 @@ def deselect_by(ds, key, values):
 
 CONN_DEFAULTS = dict(
     server='', userid='', password='', timeout=TIMEOUT, protocol=PROTO,
+    rate=RATE, burst=BURST, concurrency=CONCURRENCY,
 )
 
 
@@ -1426,6 +2695,9 @@ def configure_with_configfile(config_file, profile="", defaults=CONN_DEFAULTS):
     password = defaults["password"]
     timeout = defaults["timeout"]
     protocol = defaults["protocol"]
+    rate = defaults["rate"]
+    burst = defaults["burst"]
+    concurrency = defaults["concurrency"]
 
     # expand "~/"
     if config_file:
@@ -1461,9 +2733,13 @@ def configure_with_configfile(config_file, profile="", defaults=CONN_DEFAULTS):
         password = opts.get("password", password)
         timeout = int(opts.get("timeout", timeout))
         protocol = opts.get("protocol", protocol)
+        rate = float(opts.get("rate", rate))
+        burst = int(opts.get("burst", burst))
+        concurrency = int(opts.get("concurrency", concurrency))
 
     return dict(server=server, userid=userid, password=password,
-                timeout=timeout, protocol=protocol)
+                timeout=timeout, protocol=protocol, rate=rate, burst=burst,
+                concurrency=concurrency)
 
 
 def _typecheck(obj, _type):
@@ -1549,7 +2825,8 @@ def configure_with_options(config, options):
     protocol = get_option_value("protocol", config, options,
                                 ask_fun=lambda *args: PROTO)
 
-    return dict(server=server, userid=userid, password=password,
+    # Rate limits are only configurable in config files.
+    return dict(config, server=server, userid=userid, password=password,
                 timeout=timeout, protocol=protocol)
 
 
@@ -1568,6 +2845,7 @@ def configure(options):
 
 
 HELP_PRE = """%%prog [OPTION ...] RPC_API_STRING
+       %%prog [OPTION ...] sync CHANNEL_LABEL ...
 
 Examples:
   %%prog --args=10821 packages.listDependencies
@@ -1586,6 +2864,8 @@ Examples:
     system.getDetails
   %%prog -A '[1017068053,{"city": "tokyo", "rack": "rack-A-1"}]' \\
     system.setDetails
+  %%prog sync rhel-x86_64-server-6 rhel-x86_64-server-optional-6
+  %%prog --cacheonly -A rhel-x86_64-server-6 channel.software.listErrata
 
 
 Config file example (%s):
@@ -1602,24 +2882,32 @@ protocol = https
 server = my-spacewalk.example.com
 userid = rpcusr
 password = secretpasswd
+# Rate limits: requests per second, burst size and max number of concurrent
+# requests (0: no limits). Defaults: rate = %s, burst = %d, concurrency = %d
+rate = 10
+burst = 20
+concurrency = 8
 
 --------------------------------------------------------------
-""" % CONFIG
+""" % (CONFIG, RATE, BURST, CONCURRENCY)
 
 
 _DEFAULTS = dict(config=None, verbose=0, timeout=TIMEOUT, protocol=PROTO,
-                 rpcdebug=False, no_cache=False, cachedir=CACHE_DIR,
-                 readonly=False, cacheonly=False, force=False,
-                 format=False, indent=2, sort="", group="", select="",
-                 deselect="", short_keys=True,
+                 rpcdebug=False, batch_size=BATCH_SIZE, no_cache=False,
+                 cachedir=CACHE_DIR, cache_backend="pickle",
+                 cache_migrate=False, cache_compact=False, readonly=False,
+                 cacheonly=False, force=False, format=False, indent=2,
+                 sort="", group="", select="", deselect="", short_keys=True,
                  profile=os.environ.get("SWAPI_PROFILE", ""),
-                 list=False, output="stdout")
+                 list=False, output="stdout", stream=None, headers=None,
+                 stats=None)
+
+STREAM_FORMATS = ("jsonl", "csv")
 
 
 def option_parser(prog="swapi", defaults=_DEFAULTS):
     if TABLIB_FOUND:
         defaults["output_format"] = None
-        defaults["headers"] = None
 
     p = optparse.OptionParser(HELP_PRE, prog=prog)
     p.set_defaults(**defaults)
@@ -1639,6 +2927,9 @@ def option_parser(prog="swapi", defaults=_DEFAULTS):
                  dest="verbose", help='Silent mode')
     p.add_option('-q', '--quiet', action="store_const", const=0,
                  dest="verbose", help='Same as --silent')
+    p.add_option('', '--stats',
+                 help="Dump stats of caches, server calls, logins and rate "
+                      "limits in JSON to given file at exit")
 
     cog = optparse.OptionGroup(p, "Connect options")
     cog.add_option('-s', '--server', help='Spacewalk/RHN server hostname.')
@@ -1651,12 +2942,25 @@ def option_parser(prog="swapi", defaults=_DEFAULTS):
     xog = optparse.OptionGroup(p, "XML-RPC options")
     xog.add_option('',   '--rpcdebug', action="store_true",
                    help="XML-RPC Debug mode")
+    xog.add_option('', '--batch-size', type="int",
+                   help="Max number of calls in a batch of XML-RPC "
+                        "multicall for --list-args. 1 means no batching. "
+                        "[%default]")
     p.add_option_group(xog)
 
     caog = optparse.OptionGroup(p, "Cache options")
     caog.add_option('',   '--no-cache', action="store_true",
                     help='Do not use query result cache')
     caog.add_option('', '--cachedir', help="Caching directory [%default]")
+    caog.add_option('', '--cache-backend', choices=CACHE_BACKENDS,
+                    help="Caching backend: pickle (a file per result) or "
+                         "sqlite (a database file) [%default]")
+    caog.add_option('', '--cache-migrate', action="store_true",
+                    help="Import results cached by pickle backend into "
+                         "sqlite backend's database")
+    caog.add_option('', '--cache-compact', action="store_true",
+                    help="Remove expired results from sqlite backend's "
+                         "database and shrink it")
     caog.add_option('', '--readonly', action="store_true",
                     help="Use read-only cache")
     caog.add_option('', '--cacheonly', action="store_true",
@@ -1677,8 +2981,14 @@ def option_parser(prog="swapi", defaults=_DEFAULTS):
         formats = ("json", "xls", "yaml", "csv", "tsv", "xlsx", "ods")
         oog.add_option('-O', '--output-format', choices=formats,
                        help="Select output format from: " + ", ".join(formats))
-        oog.add_option('-H', '--headers',
-                       help="Comma separated output headers, e.g. 'aaa,bbb'")
+
+    oog.add_option('-H', '--headers',
+                   help="Comma separated output headers, e.g. 'aaa,bbb'")
+    oog.add_option('', '--stream', choices=STREAM_FORMATS,
+                   help="Output results one by one as they are processed in "
+                        "JSON Lines or CSV format, instead of a JSON "
+                        "document. Results are kept in memory only if "
+                        "--sort or --group is given.")
 
     oog.add_option('-I', '--indent', type="int",
                    help="Indent for JSON output. 0 means no indent. "
@@ -1734,9 +3044,463 @@ def init_rpcapi(options):
     params = configure(options)
     init_log(options.verbose)
 
-    return RpcApi(params, not options.no_cache, options.cachedir,
+    rapi = RpcApi(params, not options.no_cache, options.cachedir,
                   options.rpcdebug, options.readonly, options.cacheonly,
-                  options.force)
+                  options.force, batch_size=options.batch_size,
+                  cache_backend=options.cache_backend)
+
+    if options.stats:
+        atexit.register(rapi.stats.save, options.stats)
+
+    return rapi
+
+
+def maintain_caches(rapi, options):
+    """
+    Migrate and/or compact caches of sqlite backend.
+
+    :param rapi: An instance of RpcApi class
+    :param options: An instance of optparse.Options
+    :return: A list of dicts of stats of each cache
+    """
+    res = []
+    for cache in rapi.caches:
+        if cache.readonly:
+            continue
+
+        stat = dict(path=cache.path)
+        if options.cache_migrate:
+            stat["migrated"] = cache.migrate()
+
+        if options.cache_compact:
+            stat["evicted"] = cache.compact()
+
+        res.append(stat)
+
+    return res
+
+
+SYNC_CMD = "sync"
+SYNC_STATE_KEY = "swapi.sync.state"
+
+# Packages and errata modified within this period before the last sync are
+# fetched again in the next sync not to miss ones modified around then,
+# e.g. because of skew between clocks of the client and the server.
+SYNC_OVERLAP = datetime.timedelta(hours=1)
+
+
+def _load_from_writable_caches(rapi, key):
+    """
+    :return: Data cached in writable caches regardless of expiration dates
+        or None if not found
+    """
+    for cache in rapi.caches:
+        if not cache.readonly:
+            ret = cache.load(key)
+            if ret is not None:
+                return ret
+
+    return None
+
+
+def _merge_by_id(olds, news):
+    """
+    :param olds: A list of dicts having 'id' key
+    :param news: A list of dicts having 'id' key to replace or add
+
+    >>> xs = _merge_by_id([dict(id=1, a=0), dict(id=2, a=0)],
+    ...                   [dict(id=3, a=1), dict(id=2, a=1)])
+    >>> [(x["id"], x["a"]) for x in xs]
+    [(1, 0), (2, 1), (3, 1)]
+    """
+    idx = dict((x["id"], x) for x in news)
+    res = [idx.pop(x["id"], x) for x in olds]
+
+    return res + [x for x in news if x["id"] in idx]
+
+
+def _sync_list(rapi, api, channel, since=None):
+    """
+    Update the cached list of packages or errata in the channel with ones
+    modified since the last sync.
+
+    :param rapi: An instance of RpcApi class
+    :param api: channel.software.listAllPackages or listErrata
+    :param channel: Software channel label
+    :param since: A datetime.datetime object of the last sync or None
+
+    :return: A tuple of (the whole list, a list of modified ones)
+    """
+    key = rapi.ma_to_key(api, (channel, ))
+    olds = None if since is None else _load_from_writable_caches(rapi, key)
+
+    # Fetch the whole list if the list cached in the last sync is missing.
+    args = (channel, ) if olds is None else (channel, since)
+    with rapi.request(api):
+        news = rapi._call_server(api, *args)
+
+    res = news if olds is None else _merge_by_id(olds, news)
+    for cache in rapi.caches:
+        cache.save(key, res)
+
+    return (res, news)
+
+
+def sync_channel(rapi, channel, batch_size=None):
+    """
+    Mirror data of the channel into caches: lists of packages and errata in
+    the channel, details of these and packages of each errata. Only
+    packages and errata modified since the last sync are fetched from the
+    server, and the whole lists are fetched only in the first sync.
+
+    NOTE: Packages removed from the channel are kept in the cached list
+    until the list is fetched again as a whole, e.g. w/o caches.
+
+    :param rapi: An instance of RpcApi class
+    :param channel: Software channel label
+    :param batch_size: Max number of calls in a batch of multicall or None
+
+    :return: A dict of the stats of the sync
+    """
+    skey = rapi.ma_to_key(SYNC_STATE_KEY, (channel, ))
+    state = _load_from_writable_caches(rapi, skey) or dict()
+    since = state.get("last_synced")
+    if since is not None:
+        since -= SYNC_OVERLAP  # Modified ones are merged idempotently.
+
+    started = datetime.datetime.now()
+
+    LOG.info("Sync %s modified since %s" % (channel, since or "the start"))
+    (ps, mps) = _sync_list(rapi, "channel.software.listAllPackages",
+                           channel, since)
+    (es, mes) = _sync_list(rapi, "channel.software.listErrata", channel,
+                           since)
+
+    pids = [p["id"] for p in mps]
+    advs = [e.get("advisory_name", e.get("advisory")) for e in mes]
+
+    # Cached data of modified ones must be updated regardless of expiration
+    # dates of them.
+    (force, rapi.force) = (rapi.force, True)
+    try:
+        rets = itertools.chain(rapi.multicall("packages.getDetails", pids,
+                                              batch_size),
+                               rapi.multicall("errata.getDetails", advs,
+                                              batch_size),
+                               rapi.multicall("errata.listPackages", advs,
+                                              batch_size))
+        nfailures = len([r for r in rets if r is None])
+    finally:
+        rapi.force = force
+
+    if nfailures:
+        LOG.warn("Failed to fetch %d data of %s. These will be fetched in "
+                 "the next sync" % (nfailures, channel))
+    else:
+        state = dict(last_synced=started, packages=len(ps), errata=len(es))
+        for cache in rapi.caches:
+            cache.save(skey, state)
+
+    return dict(channel=channel, packages=len(ps), errata=len(es),
+                modified_packages=len(mps), modified_errata=len(mes),
+                failures=nfailures, last_synced=state.get("last_synced"))
+
+
+def sync(rapi, channels, batch_size=None):
+    """
+    Mirror data of channels into caches so that tools can run w/ --cacheonly
+    option later w/o any access to the server.
+
+    :param rapi: An instance of RpcApi class
+    :param channels: A list of software channel labels
+    :param batch_size: Max number of calls in a batch of multicall or None
+
+    :return: A list of dicts of the stats of each channel's sync
+    """
+    return [sync_channel(rapi, c, batch_size) for c in channels]
+
+
+def _parse_kvs(kvs_s, option):
+    """
+    :param kvs_s: A string of key and values, "key:value0,value1,..."
+    :param option: Option name given `kvs_s`
+    :return: A tuple of (key, [value])
+    """
+    kvs = parse_list_str(kvs_s, ":")
+
+    if len(kvs) < 2:
+        sys.stderr.write("Invalid value given for %s: %s\n" % (option,
+                                                               kvs_s))
+        sys.exit(1)
+
+    (key, values) = kvs
+    return (key, parse_list_str(values, ","))
+
+
+def process_results_g(res, options):
+    """
+    Post-process results of API calls as specified in options one by one:
+    shorten key names, select, deselect and sort. Results are kept in memory
+    only if sorting is needed.
+
+    :param res: Results of API calls or None
+    :param options: An instance of optparse.Options
+    :return: A generator yields results processed
+    """
+    if res is None:
+        return
+
+    if not is_iterable(res):
+        res = [res]
+
+    if options.short_keys:
+        res = (shorten_dict_keynames(r) for r in res)
+
+    if options.select:
+        (key, values) = _parse_kvs(options.select, "--select")
+        res = (r for r in res if r.get(key, False) in values)
+
+    if options.deselect:
+        (key, values) = _parse_kvs(options.deselect, "--deselect")
+        res = (r for r in res if r.get(key, False) not in values)
+
+    if options.sort:
+        res = sorted_by(res, options.sort)
+
+    for r in res:
+        yield r
+
+
+def process_results(res, options):
+    """
+    Post-process results of API calls as specified in options: shorten key
+    names, select, deselect, sort and group.
+
+    :param res: Results of API calls or None
+    :param options: An instance of optparse.Options
+    :return: A list of results processed or a dict if grouped
+    """
+    res = process_results_g(res, options)
+
+    if options.group:
+        return group_by(res, options.group)
+
+    return list(res)
+
+
+def _to_csv_value(val, encoding="utf-8"):
+    """
+    >>> _to_csv_value(u"a"), _to_csv_value(1)
+    ('a', 1)
+    >>> _to_csv_value(datetime.datetime(2015, 1, 1))
+    '2015-01-01T00:00:00'
+    """
+    if isinstance(val, unicode):
+        return val.encode(encoding)
+
+    if isinstance(val, datetime.datetime):
+        return val.strftime("%Y-%m-%dT%H:%M:%S")
+
+    return val
+
+
+def dump_results_jsonl(res, out):
+    """
+    Write results as JSON Lines one by one.
+
+    :param res: An iterable yields results
+    :param out: A file object to write results to
+    """
+    for r in res:
+        out.write(json.dumps(r, cls=JSONEncoder) + "\n")
+
+
+def dump_results_csv(res, out, headers=None):
+    """
+    Write results as CSV one by one.
+
+    :param res: An iterable yields results, dicts or other objects
+    :param out: A file object to write results to
+    :param headers: A list of keys of results to write or None (keys of the
+        first result)
+    """
+    writer = csv.writer(out)
+    for r in res:
+        if not hasattr(r, "keys"):  # Not a dict.
+            writer.writerow([_to_csv_value(r)])
+            continue
+
+        if headers is None:
+            headers = r.keys()
+            writer.writerow(headers)
+
+        writer.writerow([_to_csv_value(r.get(h)) for h in headers])
+
+
+class Client(object):
+    """swapi client for other programs.
+
+    Options are parsed and config files are read only once, and an instance
+    of :class:`RpcApi` keeps the session and the connection to the server
+    among calls.
+    """
+
+    def __init__(self, options=[], workers=WORKERS):
+        """
+        :param options: List of options for swapi
+        :param workers: Max number of calls run concurrently in
+            :meth:`gather` and :meth:`map`
+        """
+        (self.options, _args) = option_parser().parse_args(list(options))
+
+        if self.options.no_cache and self.options.cacheonly:
+            raise ValueError("Conflicted options were given: --no-cache and "
+                             "--cacheonly")
+
+        self.rapi = init_rpcapi(self.options)
+        self.workers = max(int(workers), 1)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def call(self, api, args=[]):
+        """
+        :param api: String represents RHN or swapi's virtual API,
+            e.g. "packages.listProvidingErrata", "swapi.errata.getAll"
+        :param args: An argument or list of arguments passed to API call.
+
+        :return: [Result]
+        """
+        args = list(str(a) for a in args) if is_iterable(args) else [str(args)]
+        res = self.rapi.call(api, *parse_api_args(",".join(args)))
+
+        return process_results(res, self.options)
+
+    def multicall(self, api, argsets):
+        """
+        Call the API with each of argsets in batches.
+
+        :param api: String represents RHN or swapi's virtual API
+        :param argsets: An iterable yields an argument or a tuple of
+            arguments for each call
+
+        :return: A list of results of each call same as :meth:`call`
+            returns, or None if the call failed
+        """
+        return [None if r is None else process_results(r, self.options)
+                for r in self.rapi.multicall(api, argsets)]
+
+    def stats(self):
+        """
+        :return: A dict of stats of caches, server calls, logins and rate
+            limits, see :class:`Stats`
+        """
+        return self.rapi.stats.dump()
+
+    def pool(self):
+        """
+        :return: A pool of worker threads to run calls concurrently. It's
+            made on demand and shared among calls.
+        """
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = multiprocessing.pool.ThreadPool(self.workers)
+
+            return self._pool
+
+    def call_async(self, api, args=[]):
+        """
+        Call the API in a worker thread. Calls share the session, caches and
+        rate limits with the others.
+
+        :param api: String represents RHN or swapi's virtual API
+        :param args: An argument or list of arguments passed to API call.
+
+        :return: An instance of multiprocessing.pool.AsyncResult, and its
+            .get() returns the result same as :meth:`call` returns
+        """
+        return self.pool().apply_async(self.call, (api, args))
+
+    def gather(self, calls, return_exceptions=False):
+        """
+        Run calls concurrently and wait for all of them to finish. Calls of
+        which results are cached and not expired are not sent to the server.
+
+        NOTE: Do not call this in calls run in the pool, or it may deadlock.
+
+        :param calls: An iterable yields tuples of (api, args)
+        :param return_exceptions: Exceptions raised in calls are returned as
+            results instead of raised if True
+
+        :return: A list of results of calls in the same order as `calls`
+        """
+        ares = [self.call_async(api, args) for api, args in calls]
+        res = []
+        for ar in ares:
+            try:
+                res.append(ar.get())
+            except Exception as exc:
+                if not return_exceptions:
+                    raise
+                res.append(exc)
+
+        return res
+
+    def map(self, api, argsets, return_exceptions=False):
+        """
+        Call the API concurrently with each of argsets.
+
+        :param api: String represents RHN or swapi's virtual API
+        :param argsets: An iterable yields an argument for each call
+        :param return_exceptions: See :meth:`gather`
+
+        :return: A list of results of each call same as :meth:`call` returns
+        """
+        return self.gather(((api, args) for args in argsets),
+                           return_exceptions)
+
+    def close(self):
+        """Stop worker threads and logout the session.
+        """
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+
+        self.rapi.logout()
+
+
+_CLIENTS = dict()
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(options=[]):
+    """
+    :param options: List of options for swapi
+    :return: An instance of :class:`Client` shared among callers giving same
+        options
+    """
+    key = tuple(options)
+    with _CLIENTS_LOCK:
+        if key not in _CLIENTS:
+            _CLIENTS[key] = Client(options)
+
+        return _CLIENTS[key]
+
+
+def _logout_clients():
+    """Logout sessions of clients shared at exit.
+    """
+    for client in _CLIENTS.values():
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    _CLIENTS.clear()
+
+
+atexit.register(_logout_clients)
 
 
 # wrapper functions to utilize this from other programs:
@@ -1751,9 +3515,8 @@ def _call(api, args=[], options=[]):
 
     :return: [Reult]
     """
-    args = list(str(a) for a in args) if is_iterable(args) else [args]
     try:
-        return main(options + ["-A", ",".join(args)] + [api])[0]
+        return get_client(options).call(api, args)
     except:
         return []
 
@@ -1761,6 +3524,57 @@ def _call(api, args=[], options=[]):
 call = memoize(_call)
 
 
+def gather(calls, options=[]):
+    """
+    Run API calls concurrently with the client shared.
+
+    :param calls: An iterable yields tuples of (api, args), e.g.
+        [("errata.listPackages", "RHSA-2015:0001"), ...]
+    :param options: List of options options for swapi
+
+    :return: A list of results of calls, [[Result]], in the same order as
+        `calls`. The result of a failed call is [] same as :func:`call`.
+    """
+    calls = list(calls)
+    try:
+        res = get_client(options).gather(calls, return_exceptions=True)
+    except Exception as exc:
+        LOG.warn("Failed to gather calls: %s" % exc)
+        return [[] for _c in calls]
+
+    for idx, exc in enumerate(res):
+        if isinstance(exc, Exception):
+            LOG.warn("Failed to call: %s, %s" % (calls[idx], exc))
+            res[idx] = []
+
+    return res
+
+
+def multicall(api, argsets, options=[]):
+    """
+    Call the API with each of argsets in batches with the client shared.
+
+    :param api: String represents RHN or swapi's virtual API
+    :param argsets: An iterable yields an argument or a tuple of arguments
+        for each call, e.g. [1234, 1235, ...] for packages.getDetails
+    :param options: List of options options for swapi
+
+    :return: A list of results of each call, [[Result]]. The result of a
+        failed call is [] same as :func:`call`.
+    """
+    argsets = list(argsets)
+    if not argsets:
+        return []
+
+    try:
+        res = get_client(options).multicall(api, argsets)
+    except Exception as exc:
+        LOG.warn("Failed to call %s in batches: %s" % (api, exc))
+        return [[] for _a in argsets]
+
+    return [[] if r is None else r for r in res]
+
+
 def main(argv):
     """
     :param argv: A list of argument strings including options and API args.
@@ -1772,7 +3586,8 @@ def main(argv):
 
     if options.list:
         options.format = "%s"
-        return (sorted(API_CACHE_EXPIRATIONS.keys()), options)
+        apis = set(API_CACHE_EXPIRATIONS.keys()) | set(VIRTUAL_APIS.keys())
+        return (sorted(k for k in apis if k != SYNC_STATE_KEY), options)
 
     if options.no_cache and options.cacheonly:
         LOG.error("Conflicted options were given: --no-cache and --cacheonly")
@@ -1786,10 +3601,31 @@ def main(argv):
                       "w/ --output option" % options.output_format)
             return None
 
+    if options.cache_migrate or options.cache_compact:
+        if options.cache_backend != "sqlite":
+            LOG.error("--cache-migrate and --cache-compact require "
+                      "--cache-backend=sqlite")
+            return None
+
+        return (maintain_caches(init_rpcapi(options), options), options)
+
     if len(args) == 0:
         parser.print_usage()
         return None
 
+    if args[0] == SYNC_CMD:
+        if options.no_cache or options.readonly or options.cacheonly:
+            LOG.error("sync requires writable caches but --no-cache, "
+                      "--readonly or --cacheonly was given")
+            return None
+
+        if len(args) < 2:
+            LOG.error("No channels to sync were given")
+            return None
+
+        rapi = init_rpcapi(options)
+        return (sync(rapi, args[1:], options.batch_size), options)
+
     api = args[0]
     rapi = init_rpcapi(options)
 
@@ -1798,7 +3634,7 @@ def main(argv):
 
     if options.list_args:
         list_args = parse_api_args(options.list_args)
-        res = rapi.multicall(api, list_args)
+        res = (r for r in rapi.multicall(api, list_args) if r is not None)
     else:
         args = parse_api_args(options.args)
         res = rapi.call(api, *args)
@@ -1806,43 +3642,37 @@ def main(argv):
     if res is None:
         return []
 
-    if not is_iterable(res):
-        res = [res]
-
-    if options.short_keys:
-        res = [shorten_dict_keynames(r) for r in res]
-
-    if options.sort:
-        res = sorted_by(res, options.sort)
+    if options.group or not (options.stream or options.format):
+        res = process_results(res, options)
 
-    if options.group:
-        res = group_by(res, options.group)
+        # Grouped results, a dict, are streamed as a result.
+        return ([res] if options.group and options.stream else res, options)
 
-    if options.select:
-        kvs = parse_list_str(options.select, ":")
+    return (process_results_g(res, options), options)
 
-        if len(kvs) < 2:
-            sys.stderr.write("Invalid value given for --select: "
-                             "%s\n" % options.select)
-            sys.exit(1)
 
-        (key, values) = kvs
-        values = parse_list_str(values, ",")
-        res = select_by(res, key, values)
+def print_results(res, options, out):
+    """
+    :param res: Results or an iterable yields results
+    :param options: An instance of optparse.Options
+    :param out: A file object to print results to
+    """
+    if options.format:
+        for r in res:
+            print >> out, options.format % r
 
-    if options.deselect:
-        kvs = parse_list_str(options.deselect, ":")
+    elif options.stream == "jsonl":
+        dump_results_jsonl(res, out)
 
-        if len(kvs) < 2:
-            sys.stderr.write("Invalid value given for --deselect: "
-                             "%s\n" % options.deselect)
-            sys.exit(1)
+    elif options.stream == "csv":
+        headers = parse_list_str(options.headers or "") or None
+        dump_results_csv(res, out, headers)
 
-        (key, values) = kvs
-        values = parse_list_str(values, ",")
-        res = deselect_by(res, key, values)
+    else:
+        if not isinstance(res, list) and not hasattr(res, "keys"):
+            res = list(res)
 
-    return (res, options)
+        print >> out, results_to_json_str(res, options.indent)
 
 
 def realmain(argv):
@@ -1857,38 +3687,30 @@ def realmain(argv):
 
     (res, options) = result
 
-    if options.format:
-        if options.output == 'stdout':
+    if TABLIB_FOUND and options.output_format and \
+            not (options.format or options.stream):
+        data = tablib.Dataset()
+
+        if options.headers:
+            data.headers = options.headers.split(",")
             for r in res:
-                print options.format % r
+                data.append([r.get(h) for h in data.headers])
         else:
-            with open(options.output, 'w') as f:
-                for r in res:
-                    print >> f, options.format % r
-    else:
-        if TABLIB_FOUND and options.output_format:
-            data = tablib.Dataset()
+            for r in res:
+                data.append(r.values())
 
-            if options.headers:
-                data.headers = options.headers.split(",")
-                for r in res:
-                    data.append([r.get(h) for h in data.headers])
-            else:
-                for r in res:
-                    data.append(r.values())
+        ofs = ("xls", "xlsx", "ods")
+        flg = 'wb' if options.output_format in ofs else 'w'
 
-            ofs = ("xls", "xlsx", "ods")
-            flg = 'wb' if options.output_format in ofs else 'w'
+        with open(options.output, flg) as f:
+            content = getattr(data, options.output_format)
+            f.write(content)
 
-            with open(options.output, flg) as f:
-                content = getattr(data, options.output_format)
-                f.write(content)
-        else:
-            if options.output == 'stdout':
-                print results_to_json_str(res, options.indent)
-            else:
-                with open(options.output, 'w') as f:
-                    print >> f, results_to_json_str(res, options.indent)
+    elif options.output == 'stdout':
+        print_results(res, options, sys.stdout)
+    else:
+        with open(options.output, 'w') as f:
+            print_results(res, options, f)
 
     return 0
 
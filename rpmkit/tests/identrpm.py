@@ -0,0 +1,160 @@
+#
+# Copyright (C) 2015 Red Hat, Inc.
+# Red Hat Author(s): Satoru SATOH <ssato at redhat.com>
+# License: GPLv3+
+#
+import rpmkit.identrpm as TT
+import rpmkit.tests.common as C
+
+import os.path
+import unittest
+
+
+def _mk_rpm(name, version, arch="x86_64", epoch=0):
+    return dict(name=name, version=version, release="1", arch=arch,
+                epoch=epoch)
+
+
+class _FakeRpcApi(object):
+    cache_domain = "abc"
+    caches = [None]
+    force = False
+
+
+class Test_10_channel_index(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.rpms = [_mk_rpm("bash", "4.1"), _mk_rpm("bash", "4.1", "i686"),
+                     _mk_rpm("bash", "4.2"), _mk_rpm("zsh", "5.0", epoch=1)]
+        self.index = TT.make_channel_index(self.rpms)
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_lookup_channel_index(self):
+        lookup = TT.lookup_channel_index
+
+        self.assertEquals(lookup(self.rpms[0], self.index), self.rpms[:1])
+        self.assertEquals(lookup(_mk_rpm("bash", "4.1", "noarch"),
+                                 self.index), self.rpms[:2])
+        self.assertEquals(lookup(_mk_rpm("zsh", "5.0"), self.index), [])
+        self.assertEquals(lookup(_mk_rpm("ksh", "1.0"), self.index), [])
+
+    def test_20_save_and_load(self):
+        rapi = _FakeRpcApi()
+        path = TT.channel_index_path("rhel-x86_64-server-6",
+                                     rapi.cache_domain, self.workdir)
+        TT.dump_pickle(self.index, path)
+
+        self.assertTrue(os.path.exists(path))
+        self.assertEquals(os.listdir(os.path.dirname(path)),
+                          [os.path.basename(path)])
+
+        index = TT._load_channel_index("rhel-x86_64-server-6",
+                                       indexdir=self.workdir, rapi=rapi)
+        self.assertEquals(index, self.index)
+
+    def test_30_load_channel_index__failed_not_memoized(self):
+        rets = [None, self.index]
+        load_channel_index = TT._load_channel_index
+        TT._load_channel_index = lambda *args, **kwargs: rets.pop(0)
+        try:
+            self.assertTrue(TT.load_channel_index("ch-0") is None)
+            self.assertEquals(TT.load_channel_index("ch-0"), self.index)
+            self.assertEquals(TT.load_channel_index("ch-0"), self.index)
+        finally:
+            TT._load_channel_index = load_channel_index
+            TT._CHANNEL_INDEXES.clear()
+
+
+_SWAPI_CONFIG = """\
+[DEFAULT]
+server = rhns.example.com
+userid = foo
+password = secret
+"""
+
+
+class Test_20_identify_rpms(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.cachedir = os.path.join(self.workdir, "cache")
+
+        config = os.path.join(self.workdir, "config")
+        open(config, 'w').write(_SWAPI_CONFIG)
+        self.options = ["--config", config, "--cachedir", self.cachedir]
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_identify_rpms__resolved_locally(self):
+        labels = ["bash-4.1-1.x86_64", "bash-4.1-1.x86_64", "-"]
+        (pss, failed) = TT.identify_rpms(labels, options=self.options)
+
+        self.assertEquals(len(pss), 2)
+        self.assertEquals(pss[0][0]["name"], "bash")
+        self.assertEquals(failed, ["-"])
+        self.assertFalse(os.path.exists(self.cachedir))  # Nothing to save.
+
+    def test_20_identify_rpms__cached(self):
+        label = "bash-4.1-1.x86_64"
+        pkg = dict(_mk_rpm("bash", "4.1"), id=1, summary="bash")
+        rapi = TT.SW.get_client(self.options).rapi
+        TT.save_cached_labels(rapi, [(TT._label_key(label, True, []),
+                                      [pkg])])
+        self.assertTrue(os.path.exists(os.path.join(self.cachedir,
+                                                    rapi.cache_domain)))
+
+        (pss, failed) = TT.identify_rpms([label], details=True,
+                                         options=self.options)
+        self.assertEquals(pss, [[pkg]])
+        self.assertEquals(failed, [])
+
+    def test_30_load_cached_labels__force(self):
+        key = TT._label_key("bash-4.1-1.x86_64", True, [])
+        rapi = TT.SW.get_client(self.options).rapi
+        TT.save_cached_labels(rapi, [(key, [dict(id=1)])])
+        self.assertEquals(TT.load_cached_labels(rapi, [key]), [[dict(id=1)]])
+
+        rapi = TT.SW.get_client(self.options + ["--force"]).rapi
+        self.assertEquals(TT.load_cached_labels(rapi, [key]), [None])
+
+
+_INSTALLED_RPMS = """\
+bash-4.1.2-15.el6_4.x86_64                                  Wed Aug 14 2013
+# comment
+zsh-4.3.10-7.el6.x86_64                                     Wed Aug 14 2013
+
+bash-4.1.2-15.el6_4.x86_64                                  Wed Aug 14 2013
+"""
+
+
+class Test_30_load_packages(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.pfs = [os.path.join(self.workdir, f) for f in ("a", "b")]
+
+        open(self.pfs[0], 'w').write(_INSTALLED_RPMS)
+        open(self.pfs[1], 'w').write("ksh-20100621-19.el6.x86_64\n" +
+                                     _INSTALLED_RPMS)
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_load_packages(self):
+        self.assertEquals(TT.load_packages(self.pfs[0]),
+                          ["bash-4.1.2-15.el6_4.x86_64",
+                           "zsh-4.3.10-7.el6.x86_64"])
+
+    def test_20_load_packages_from_files(self):
+        labels = TT.load_packages_from_files(self.pfs, 2)
+
+        self.assertEquals(labels, ["bash-4.1.2-15.el6_4.x86_64",
+                                   "zsh-4.3.10-7.el6.x86_64",
+                                   "ksh-20100621-19.el6.x86_64"])
+        self.assertEquals(labels, TT.load_packages_from_files(self.pfs, 1))
+
+# vim:sw=4:ts=4:et:
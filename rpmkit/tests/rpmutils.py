@@ -18,6 +18,7 @@
 import rpmkit.rpmutils as RU
 import rpmkit.utils as U
 
+import os.path
 import random
 import unittest
 
@@ -55,6 +56,78 @@ class Test_00(unittest.TestCase):
         """test for _is_noarch: TBD"""
 
 
+# Test cases taken from tests/rpmvercmp.at in rpm:
+RPMVERCMP_CASES = [("1.0", "1.0", 0), ("1.0", "2.0", -1), ("2.0", "1.0", 1),
+                   ("2.0.1", "2.0.1", 0), ("2.0", "2.0.1", -1),
+                   ("2.0.1", "2.0", 1), ("2.0.1a", "2.0.1a", 0),
+                   ("2.0.1a", "2.0.1", 1), ("2.0.1", "2.0.1a", -1),
+                   ("5.5p1", "5.5p1", 0), ("5.5p1", "5.5p2", -1),
+                   ("5.5p2", "5.5p1", 1), ("5.5p10", "5.5p10", 0),
+                   ("5.5p1", "5.5p10", -1), ("5.5p10", "5.5p1", 1),
+                   ("10xyz", "10.1xyz", -1), ("10.1xyz", "10xyz", 1),
+                   ("xyz10", "xyz10", 0), ("xyz10", "xyz10.1", -1),
+                   ("xyz10.1", "xyz10", 1), ("xyz.4", "xyz.4", 0),
+                   ("xyz.4", "8", -1), ("8", "xyz.4", 1),
+                   ("xyz.4", "2", -1), ("2", "xyz.4", 1),
+                   ("5.5p2", "5.6p1", -1), ("5.6p1", "5.5p2", 1),
+                   ("5.6p1", "6.5p1", -1), ("6.5p1", "5.6p1", 1),
+                   ("6.0.rc1", "6.0", 1), ("6.0", "6.0.rc1", -1),
+                   ("10b2", "10a1", 1), ("10a2", "10b2", -1),
+                   ("1.0aa", "1.0aa", 0), ("1.0a", "1.0aa", -1),
+                   ("1.0aa", "1.0a", 1), ("10.0001", "10.0001", 0),
+                   ("10.0001", "10.1", 0), ("10.1", "10.0001", 0),
+                   ("10.0001", "10.0039", -1), ("10.0039", "10.0001", 1),
+                   ("4.999.9", "5.0", -1), ("5.0", "4.999.9", 1),
+                   ("20101121", "20101121", 0), ("20101121", "20101122", -1),
+                   ("20101122", "20101121", 1), ("2_0", "2_0", 0),
+                   ("2.0", "2_0", 0), ("2_0", "2.0", 0), ("a", "a", 0),
+                   ("a+", "a+", 0), ("a+", "a_", 0), ("a_", "a+", 0),
+                   ("+a", "+a", 0), ("+a", "_a", 0), ("_a", "+a", 0),
+                   ("+_", "+_", 0), ("_+", "+_", 0), ("_+", "_+", 0),
+                   ("+", "_", 0), ("_", "+", 0), ("1.0~rc1", "1.0~rc1", 0),
+                   ("1.0~rc1", "1.0", -1), ("1.0", "1.0~rc1", 1),
+                   ("1.0~rc1", "1.0~rc2", -1), ("1.0~rc2", "1.0~rc1", 1),
+                   ("1.0~rc1~git123", "1.0~rc1~git123", 0),
+                   ("1.0~rc1~git123", "1.0~rc1", -1),
+                   ("1.0~rc1", "1.0~rc1~git123", 1),
+                   ("1.0^", "1.0^", 0), ("1.0^", "1.0", 1),
+                   ("1.0", "1.0^", -1), ("1.0^git1", "1.0^git1", 0),
+                   ("1.0^git1", "1.0", 1), ("1.0", "1.0^git1", -1),
+                   ("1.0^git1", "1.0^git2", -1), ("1.0^git2", "1.0^git1", 1),
+                   ("1.0^git1", "1.01", -1), ("1.01", "1.0^git1", 1),
+                   ("1.0^20160101", "1.0^20160101", 0),
+                   ("1.0^20160101", "1.0.1", -1),
+                   ("1.0.1", "1.0^20160101", 1),
+                   ("1.0^20160101^git1", "1.0^20160101^git1", 0),
+                   ("1.0^20160102", "1.0^20160101^git1", 1),
+                   ("1.0^20160101^git1", "1.0^20160102", -1),
+                   ("1.0~rc1^git1", "1.0~rc1^git1", 0),
+                   ("1.0~rc1^git1", "1.0~rc1", 1),
+                   ("1.0~rc1", "1.0~rc1^git1", -1),
+                   ("1.0^git1~pre", "1.0^git1~pre", 0),
+                   ("1.0^git1", "1.0^git1~pre", 1),
+                   ("1.0^git1~pre", "1.0^git1", -1)]
+
+
+class Test_30_rpmvercmp(unittest.TestCase):
+
+    def test_10_rpmvercmp(self):
+        for ver1, ver2, exp in RPMVERCMP_CASES:
+            self.assertEquals(RU.rpmvercmp(ver1, ver2), exp,
+                              "%s vs. %s" % (ver1, ver2))
+
+    def test_20_evr_key(self):
+        evrs = [(1, "0.1", "1"), (0, "1.0", "1.el6"), (0, "1.0", "1.el6_1"),
+                (0, "1.0~rc1", "1"), ("0", "1.0", "10.el6")]
+        exp = [evrs[3], evrs[1], evrs[2], evrs[4], evrs[0]]
+
+        self.assertEquals(sorted(evrs, key=lambda t: RU.evr_key(*t)), exp)
+
+    def test_30_newer_packages_g(self):
+        ps = list(RU.newer_packages_g(PACKAGES_2, PACKAGES_2[1]))
+        self.assertEquals(ps, PACKAGES_2[2:])
+
+
 class Test_40_find_latest(unittest.TestCase):
 
     def test_00__different_packages(self):
@@ -131,4 +204,71 @@ class Test_60_find_updates_g(unittest.TestCase):
 
         self.assertEquals(updates, expected)
 
+
+def _mk_header(name, requires, provides, files=[]):
+    dirs = sorted(set(os.path.dirname(f) + '/' for f in files))
+    return dict(name=name, requirename=requires, providename=provides,
+                basenames=[os.path.basename(f) for f in files],
+                dirnames=dirs,
+                dirindexes=[dirs.index(os.path.dirname(f) + '/') for f
+                            in files])
+
+
+class Test_70_make_requires_dicts(unittest.TestCase):
+
+    def test_10_make_requires_dicts_from_records(self):
+        hs = [_mk_header("bash", ["libc.so.6", "/bin/sh"], ["bash"],
+                         ["/bin/bash", "/bin/sh"]),
+              _mk_header("glibc", ["/sbin/ldconfig", "libc.so.6"],
+                         ["glibc", "libc.so.6"],
+                         ["/sbin/ldconfig", "/lib64/libc.so.6"]),
+              _mk_header("rsync", ["libc.so.6", "/bin/sh"], ["rsync"],
+                         ["/usr/bin/rsync"]),
+              _mk_header("zsh", ["/bin/zsh", "libz.so"], ["zsh"],
+                         ["/bin/zsh"])]
+
+        recs = [RU._deps_record(h) for h in hs]
+        (reqs, rreqs) = RU.make_requires_dicts_from_records(recs)
+
+        self.assertEquals(reqs, dict(bash=["glibc"], glibc=[],
+                                     rsync=["bash", "glibc"], zsh=[]))
+        self.assertEquals(rreqs, dict(bash=["rsync"], glibc=["bash", "rsync"],
+                                      rsync=[], zsh=[]))
+
+
+class Test_80_DepGraph(unittest.TestCase):
+
+    def setUp(self):
+        # a -> b -> c, d -> c, e -> f
+        self.reqs = dict(a=["b"], b=["c"], c=[], d=["c"], e=["f"], f=[])
+        self.graph = RU.DepGraph(self.reqs)
+
+    def test_10_closure(self):
+        self.assertEquals(self.graph.closure(["a", "e"]),
+                          ["a", "e", "b", "f", "c"])
+        self.assertEquals(self.graph.closure(["c"], True, excludes=["b"]),
+                          ["c", "d"])
+        self.assertEquals(self.graph.closure(["x"]), ["x"])
+
+    def test_20_leaves_and_standalones(self):
+        self.assertEquals(self.graph.leaves(), ["a", "d", "e"])
+        self.assertEquals(list(self.graph.standalones_g(["a", "f"], 2)),
+                          ["a"])
+        self.assertEquals(list(self.graph.standalones_g(["a", "f"], 3)),
+                          ["a", "e"])
+        self.assertEquals(list(self.graph.standalones_g(["a", "f"], 3,
+                                                        ["e"])), ["a"])
+
+    def test_30_orphans_closure(self):
+        self.assertEquals(self.graph.orphans_closure(["a"]), ["a", "b"])
+        self.assertEquals(self.graph.orphans_closure(["a", "d"]),
+                          ["a", "d", "b", "c"])
+        self.assertEquals(self.graph.orphans_closure(["b"]), [])
+
+    def test_40_compute_removed__deep_chain(self):
+        names = ["p%05d" % i for i in range(5000)]
+        rreqs = dict(zip(names, [[n] for n in names[1:]] + [[]]))
+
+        self.assertEquals(RU.compute_removed(names[:1], rreqs=rreqs), names)
+
 # vim:sw=4:ts=4:et:
@@ -13,10 +13,21 @@
 import rpmkit.swapi as S
 import rpmkit.tests.common as C
 
+from operator import itemgetter
+
+import BaseHTTPServer
+import StringIO
+import datetime
+import hashlib
+import json
 import os.path
 import os
 import shlex
+import socket
+import threading
+import time
 import unittest
+import xmlrpclib
 
 
 SYSTEST_ENABLED = os.environ.get("SWAPI_SYSTEST", False)
@@ -70,6 +81,176 @@ class Test_20_effectful_functions(unittest.TestCase):
         self.assertTrue(S.run(" ls /dev"))
 
 
+_CVE_DATES_TXT = """\
+# comment line
+CVE-2000-0909 public=20000922
+CVE-2009-1302 public=20090421,cvss2=6.8/AV:N/AC:M/Au:N/C:P/I:P/A:P
+CVE-2014-9999 public=20141231,cvss2=4.3/AV:N/AC:M/Au:N/C:N/I:P/A:N
+CVE-2014-10001 public=20150101
+"""
+
+_RHSAMAPCPE_TXT = """\
+RHSA-2012:1019 CVE-2012-0551,CVE-2012-1711 cpe:/a:redhat:rhel_productivity:5
+RHSA-2012:1014 CVE-2012-1167 cpe:/a:redhat:jboss_enterprise_web_platform:5
+"""
+
+
+class _DatasetRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serves the content of the server with its ETag.
+    """
+
+    def do_GET(self):
+        etag = '"%s"' % hashlib.md5(self.server.content).hexdigest()
+        self.server.requests.append(self.headers.get("If-None-Match"))
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(self.server.content)))
+        self.end_headers()
+        self.wfile.write(self.server.content)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_dataset_server(content):
+    server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0),
+                                       _DatasetRequestHandler)
+    server.content = content
+    server.requests = []
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server
+
+
+class Test_25_Dataset(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.server = _start_dataset_server(_CVE_DATES_TXT)
+        self.cves = S.CveDataset(self.workdir, "http://127.0.0.1:%d/" %
+                                 self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_refresh(self):
+        self.assertTrue(self.cves.refresh())
+        self.assertTrue(os.path.exists(self.cves.dbpath))
+
+        # Checked recently so that no requests are sent.
+        self.assertFalse(self.cves.refresh())
+        self.assertEquals(len(self.server.requests), 1)
+
+    def test_20_refresh__not_modified(self):
+        self.cves.refresh()
+        self.assertFalse(self.cves.refresh(force=True))
+        self.assertTrue(self.server.requests[-1] is not None)
+
+        self.server.content += "CVE-2015-0001 public=20150101\n"
+        self.assertTrue(self.cves.refresh(force=True))
+        self.assertEquals(len(S.get_all_cve(offline=True,
+                                            dataset=self.cves)), 5)
+
+    def test_30_get_cvss_for_cve(self):
+        cvss = S.get_cvss_for_cve("CVE-2009-1302", dataset=self.cves)
+        self.assertEquals(cvss["score"], "6.8")
+        self.assertEquals(cvss["metrics"], "AV:N/AC:M/Au:N/C:P/I:P/A:P")
+
+        self.assertTrue(S.get_cvss_for_cve("CVE-2000-0909",
+                                           dataset=self.cves) is None)
+        self.assertTrue(S.get_cvss_for_cve("CVE-2015-0001",
+                                           dataset=self.cves) is None)
+
+    def test_40_get_all_cve(self):
+        cves = S.get_all_cve(dataset=self.cves)
+        self.assertEquals([c["cve"] for c in cves],
+                          ["CVE-2000-0909", "CVE-2009-1302",
+                           "CVE-2014-9999", "CVE-2014-10001"])
+        self.assertFalse("score" in cves[0])
+
+        lines = S.get_all_cve(True, dataset=self.cves)
+        self.assertEquals(lines, _CVE_DATES_TXT.splitlines())
+
+    def test_50_list_cves_in_range(self):
+        cves = S.list_cves_in_range("CVE-2009-0001", "CVE-2014-10001",
+                                    dataset=self.cves)
+        self.assertEquals([c["cve"] for c in cves],
+                          ["CVE-2009-1302", "CVE-2014-9999",
+                           "CVE-2014-10001"])
+
+        cves = S.list_cves_in_range("CVE-2014-10000", "CVE-2015-0001",
+                                    dataset=self.cves)
+        self.assertEquals([c["cve"] for c in cves], ["CVE-2014-10001"])
+
+    def test_60_offline(self):
+        self.assertEquals(S.get_all_cve(offline=True, dataset=self.cves), [])
+        self.assertTrue(S.get_cvss_for_cve("CVE-2009-1302", offline=True,
+                                           dataset=self.cves) is None)
+        self.assertEquals(self.server.requests, [])
+
+    def test_70_errata_dataset(self):
+        self.server.content = _RHSAMAPCPE_TXT
+        errata = S.ErrataDataset(self.workdir, self.cves.url)
+
+        self.assertEquals(S.get_all_errata(dataset=errata),
+                          [dict(advisory="RHSA-2012:1019",
+                                cves=["CVE-2012-0551", "CVE-2012-1711"]),
+                           dict(advisory="RHSA-2012:1014",
+                                cves=["CVE-2012-1167"])])
+        self.assertEquals(S.get_cves_for_errata("RHSA-2012:1014",
+                                                dataset=errata),
+                          ["CVE-2012-1167"])
+        self.assertEquals(S.list_errata_for_cve("CVE-2012-1711",
+                                                dataset=errata),
+                          ["RHSA-2012:1019"])
+
+    def test_80_rpcapi__cacheonly(self):
+        conn_params = dict(protocol="https", server="rhns.example.com",
+                           userid="foo", passwd="secret", timeout=600)
+        vapis = {"swapi.cve.getAll": lambda *args, **kwargs: kwargs}
+        rapi = S.RpcApi(conn_params, cachedir=self.workdir, cacheonly=True,
+                        vapis=vapis)
+
+        self.assertEquals(rapi.call("swapi.cve.getAll"), dict(offline=True))
+
+    def test_82_rpcapi__cvss_from_web(self):
+        conn_params = dict(protocol="https", server="rhns.example.com",
+                           userid="foo", passwd="secret", timeout=600)
+        calls = []
+
+        def get_cvss_from_web(cve):
+            calls.append(cve)
+            return dict(cve=cve, score="5.0")
+
+        vapis = dict(S.VIRTUAL_APIS)
+        vapis["swapi.cve.getCvssFromWeb"] = get_cvss_from_web
+        rapi = S.RpcApi(conn_params, cachedir=self.workdir, vapis=vapis)
+
+        dataset = S.CveDataset(os.path.join(self.workdir, "datasets"))
+        dataset.refresh = lambda: None  # Not available.
+        (cve_dataset, S.CVE_DATASET) = (S.CVE_DATASET, dataset)
+        try:
+            for _i in range(2):
+                self.assertEquals(rapi.call("swapi.cve.getCvss",
+                                            "CVE-2014-0001"),
+                                  dict(cve="CVE-2014-0001", score="5.0"))
+        finally:
+            S.CVE_DATASET = cve_dataset
+
+        self.assertEquals(calls, ["CVE-2014-0001"])  # Cached.
+
+
 class Test_30_Cache(unittest.TestCase):
 
     def setUp(self):
@@ -112,6 +293,128 @@ class Test_32_ReadOnlyCache(unittest.TestCase):
         self.assertFalse(c.needs_update("not_existent_obj"))
 
 
+class Test_33_SqliteCache(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.cachedir = os.path.join(self.workdir, "cache")
+        self.exps = {"m0": 1, "m1": -1, "m2": 0}
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_01_save_and_load(self):
+        k = ("m0", (1, ))
+        c = S.SqliteCache("domain0", self.cachedir, self.exps)
+        d = dict(a=1, b=[2, 3], c=dict(d=4, e=[5, 6]))
+
+        self.assertTrue(c.load(k) is None)
+        self.assertTrue(c.needs_update(k, itemgetter(0)))
+
+        self.assertTrue(c.save(k, d))
+        self.assertTrue(os.path.isfile(c.path))
+        self.assertEquals(c.load(k), d)
+        self.assertFalse(c.needs_update(k, itemgetter(0)))
+
+        self.assertFalse(c.needs_update(("m1", (1, )), itemgetter(0)))
+        self.assertTrue(c.needs_update(("m2", (1, )), itemgetter(0)))
+
+    def test_10_save_and_load_many(self):
+        c = S.SqliteCache("domain0", self.cachedir, self.exps)
+        pairs = [(("m0", (i, )), dict(id=i)) for i in range(5)]
+
+        self.assertTrue(c.save_many(pairs[:3]))
+        self.assertEquals(c.load_many([k for k, _d in pairs]),
+                          [d for _k, d in pairs[:3]] + [None, None])
+
+    def test_20_evict_and_compact(self):
+        c = S.SqliteCache("domain0", self.cachedir, self.exps)
+        c.save(("m0", (0, )), 0)
+        c.save(("m1", (1, )), 1)
+        c.save(("m2", (2, )), 2)
+
+        self.assertEquals(c.evict(), 1)  # m2 is never cached.
+
+        with c.conn() as conn:
+            conn.execute("UPDATE cache SET mtime = mtime - 2 * 86400")
+        self.assertEquals(c.compact(), 1)  # m0 expired.
+        self.assertEquals(c.load(("m1", (1, ))), 1)
+
+    def test_30_migrate(self):
+        keys = [("m0", (i, )) for i in range(3)]
+        oc = S.Cache("domain0", self.cachedir, self.exps)
+        for k in keys:
+            oc.save(k, dict(k=k))
+
+        c = S.SqliteCache("domain0", self.cachedir, self.exps)
+        self.assertEquals(c.migrate(), 3)
+        self.assertEquals(c.load_many(keys), [dict(k=k) for k in keys])
+        self.assertFalse(c.needs_update(keys[0], itemgetter(0)))
+
+        # Migrated data are kept until API methods of them are known.
+        with c.conn() as conn:
+            conn.execute("UPDATE cache SET mtime = mtime - 2 * 86400")
+        self.assertEquals(c.evict(), 0)
+
+    def test_40_read_only(self):
+        k = ("m0", (1, ))
+        rc = S.ReadOnlySqliteCache("domain0", self.cachedir, self.exps)
+
+        self.assertTrue(rc.load(k) is None)
+        self.assertTrue(rc.save(k, 1))
+        self.assertFalse(os.path.exists(rc.path))
+
+        S.SqliteCache("domain0", self.cachedir, self.exps).save(k, 1)
+        self.assertEquals(rc.load(k), 1)
+        self.assertFalse(rc.needs_update(k))
+
+
+class Test_34_RateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_reserve(self):
+        limiter = S.RateLimiter("a", rate=10, burst=2, statedir=self.workdir)
+
+        self.assertEquals(limiter.reserve(), 0)
+        self.assertEquals(limiter.reserve(), 0)
+
+        # The bucket is shared with other limiters for the same server.
+        limiter2 = S.RateLimiter("a", rate=10, burst=2,
+                                 statedir=self.workdir)
+        wait = limiter2.reserve()
+        self.assertTrue(0 < wait <= 0.1, wait)
+        self.assertTrue(0.1 < limiter.reserve() <= 0.2)
+
+    def test_20_reserve__no_limits(self):
+        limiter = S.RateLimiter("a", rate=0, statedir=self.workdir)
+        self.assertTrue(all(limiter.reserve() == 0 for _i in range(10)))
+
+    def test_30_acquire_slot(self):
+        limiter = S.RateLimiter("a", rate=0, concurrency=1,
+                                statedir=self.workdir)
+        slot = limiter.acquire_slot()
+
+        self.assertFalse(slot is None)
+        self.assertTrue(limiter.acquire_slot(block=False) is None)
+
+        slot.close()
+        slot = limiter.acquire_slot(block=False)
+        self.assertFalse(slot is None)
+        slot.close()
+
+    def test_40_limit(self):
+        limiter = S.RateLimiter("a", rate=100, burst=1, concurrency=2,
+                                statedir=self.workdir)
+        with limiter.limit():
+            with limiter.limit():
+                self.assertTrue(limiter.acquire_slot(block=False) is None)
+
+
 class Test_40_RpcApi__wo_caches(unittest.TestCase):
 
     def test_00___init__(self):
@@ -125,11 +428,653 @@ class Test_40_RpcApi__wo_caches(unittest.TestCase):
         )
 
 
+class _FakeServer(object):
+    """Fake server of which first session expires soon.
+    """
+
+    def __init__(self):
+        self.sids = []
+        self.auth = self
+
+    def login(self, userid, passwd, timeout):
+        self.sids.append("sid-%d" % len(self.sids))
+        return self.sids[-1]
+
+    def __getattr__(self, method_name):
+        def method(sid, *args):
+            if sid == "sid-0":
+                raise xmlrpclib.Fault(-1, "Could not find session")
+            if args and args[0] < 0:
+                raise xmlrpclib.Fault(-210, "No such package")
+            return [sid] + list(args)
+
+        return method
+
+
+class Test_36_Stats(unittest.TestCase):
+
+    def test_10_observe_server(self):
+        stats = S.Stats((0.1, 1))
+        for secs in (0.05, 0.1, 0.5, 2):
+            stats.observe_server("packages.getDetails", secs)
+        stats.observe_server("packages.getDetails", 0.01, True)
+
+        res = stats.dump()["server"]["packages.getDetails"]
+        self.assertEquals(res["calls"], 5)
+        self.assertEquals(res["errors"], 1)
+        self.assertEquals(res["histogram"],
+                          {"<=0.1": 3, "<=1": 1, ">1": 1})
+
+    def test_20_count_cache(self):
+        stats = S.Stats()
+        stats.count_cache("/tmp/a", "api.getVersion", "hits", 10)
+        stats.count_cache("/tmp/a", "api.getVersion", "stale")
+
+        self.assertEquals(stats.dump()["caches"]["/tmp/a"]["api.getVersion"],
+                          dict(hits=1, misses=0, stale=1, bytes=10))
+
+    def test_30_save(self):
+        workdir = C.setup_workdir()
+        path = os.path.join(workdir, "stats.json")
+        try:
+            stats = S.Stats()
+            stats.observe_login(0.5)
+            stats.save(path)
+
+            self.assertEquals(json.load(open(path))["logins"],
+                              dict(count=1, time=0.5))
+        finally:
+            C.cleanup_workdir(workdir)
+
+
+class _SlowFakeServer(_FakeServer):
+    """Fake server takes a while to respond and records threads called it.
+    """
+
+    def __init__(self):
+        super(_SlowFakeServer, self).__init__()
+        self.threads = set()
+        self.ncalls = 0
+
+    def __getattr__(self, method_name):
+        method = super(_SlowFakeServer, self).__getattr__(method_name)
+
+        def slow_method(sid, *args):
+            self.threads.add(threading.current_thread().name)
+            self.ncalls += 1
+            time.sleep(0.1)
+            return method(sid, *args)
+
+        return slow_method
+
+
+class _RpcApi(S.RpcApi):
+
+    fake_server = None
+
+    def _server_proxy(self):
+        return self.fake_server
+
+
+class Test_41_RpcApi__session(unittest.TestCase):
+
+    def setUp(self):
+        conn_params = dict(protocol="https", server="rhns.example.com",
+                           userid="foo", passwd="secret", timeout=600)
+        self.rapi = _RpcApi(conn_params, enable_cache=False)
+        self.rapi.fake_server = _FakeServer()
+
+    def test_10_call_server__relogin(self):
+        res = self.rapi._call_server("packages.getDetails", 1)
+
+        self.assertEquals(res, ["sid-1", 1])
+        self.assertEquals(self.rapi.fake_server.sids, ["sid-0", "sid-1"])
+
+        res = self.rapi._call_server("packages.getDetails", 2)
+        self.assertEquals(res, ["sid-1", 2])
+        self.assertEquals(len(self.rapi.fake_server.sids), 2)
+
+    def test_20_call_server__threads(self):
+        results = []
+
+        def call(idx):
+            results.append(self.rapi._call_server("packages.getDetails",
+                                                  idx))
+
+        threads = [threading.Thread(target=call, args=(i, )) for i
+                   in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEquals(sorted(results), [["sid-1", i] for i in range(8)])
+        self.assertEquals(len(self.rapi.fake_server.sids), 2)
+
+
+class _FakeMulticallServer(_FakeServer):
+    """Fake server supports system.multicall.
+    """
+
+    def __init__(self, supported=True):
+        super(_FakeMulticallServer, self).__init__()
+        self.system = self
+        self.supported = supported
+        self.batches = []
+        self.error = None  # An exception to raise in system.multicall.
+
+    def multicall(self, calls):
+        if not self.supported:
+            raise xmlrpclib.Fault(-32601, "No such handler: system.multicall")
+        if self.error is not None:
+            raise self.error
+
+        self.batches.append(calls)
+        rets = []
+        for call in calls:
+            (sid, args) = (call["params"][0], call["params"][1:])
+            arg = args[0] if len(args) == 1 else list(args)
+            if sid == "sid-0":
+                rets.append(dict(faultCode=-1,
+                                 faultString="Could not find session"))
+            elif arg < 0:
+                rets.append(dict(faultCode=-210,
+                                 faultString="No such package"))
+            else:
+                rets.append([dict(id=arg)])
+
+        return rets
+
+
+class _FakeSyncServer(_FakeMulticallServer):
+    """Fake server has a channel of packages and errata.
+    """
+
+    def __init__(self):
+        super(_FakeSyncServer, self).__init__()
+        then = datetime.datetime(2015, 1, 1)
+        self.data = {"channel.software.listAllPackages":
+                     [dict(id=1, last_modified=then),
+                      dict(id=2, last_modified=then)],
+                     "channel.software.listErrata":
+                     [dict(id=10, advisory_name="RHSA-2015:0001",
+                           last_modified=then)]}
+        self.lists = []
+
+    def __getattr__(self, method_name):
+        if method_name not in self.data:
+            return super(_FakeSyncServer, self).__getattr__(method_name)
+
+        def list_method(sid, channel, since=None):
+            if sid == "sid-0":
+                raise xmlrpclib.Fault(-1, "Could not find session")
+
+            self.lists.append((method_name, since))
+            return [x for x in self.data[method_name]
+                    if since is None or x["last_modified"] >= since]
+
+        return list_method
+
+
+class Test_42_RpcApi__stats(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        conn_params = dict(protocol="https", server="rhns.example.com",
+                           userid="foo", passwd="secret", timeout=600,
+                           rate=0)
+        self.rapi = _RpcApi(conn_params, cachedir=self.workdir)
+        self.rapi.fake_server = _FakeServer()
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_call(self):
+        self.rapi.call("packages.getDetails", 1)
+        self.rapi.call("packages.getDetails", 1)
+
+        stats = self.rapi.stats.dump()
+        ucache = stats["caches"][self.rapi.caches[-1].topdir]
+
+        self.assertEquals(ucache["packages.getDetails"]["stale"], 1)
+        self.assertEquals(ucache["packages.getDetails"]["hits"], 1)
+        self.assertTrue(ucache["packages.getDetails"]["bytes"] > 0)
+        self.assertEquals(stats["server"]["packages.getDetails"]["calls"], 1)
+        self.assertEquals(stats["logins"]["count"], 2)  # Relogin once.
+
+    def test_20_call__error(self):
+        self.assertRaises(RuntimeError, self.rapi.call, "packages.getDetails",
+                          -1)
+
+        stats = self.rapi.stats.dump()
+        self.assertEquals(stats["server"]["packages.getDetails"]["errors"], 1)
+
+
+class Test_43_RpcApi__multicall(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        conn_params = dict(protocol="https", server="rhns.example.com",
+                           userid="foo", passwd="secret", timeout=600,
+                           rate=0)
+        self.rapi = _RpcApi(conn_params, cachedir=self.workdir, batch_size=3)
+        self.rapi.fake_server = _FakeMulticallServer()
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_multicall(self):
+        res = list(self.rapi.multicall("packages.getDetails",
+                                       [1, 2, -1, 3, 4]))
+
+        self.assertEquals(res, [dict(id=1), dict(id=2), None, dict(id=3),
+                                dict(id=4)])
+        # Batches: [1, 2, -1] (session expired), [1, 2, -1], [3, 4]
+        self.assertEquals([len(b) for b in self.rapi.fake_server.batches],
+                          [3, 3, 2])
+
+    def test_20_multicall__cached(self):
+        list(self.rapi.multicall("packages.getDetails", [1, 2]))
+        nbatches = len(self.rapi.fake_server.batches)
+
+        res = list(self.rapi.multicall("packages.getDetails", [1, 2, 5]))
+        self.assertEquals(res, [dict(id=1), dict(id=2), dict(id=5)])
+
+        batches = self.rapi.fake_server.batches[nbatches:]
+        self.assertEquals([c["params"][1] for c in batches[0]], [5])
+
+    def test_22_multicall__cached_in_sqlite(self):
+        conn_params = dict(protocol="https", server="rhns.example.com",
+                           userid="foo", passwd="secret", timeout=600,
+                           rate=0)
+        rapi = _RpcApi(conn_params, cachedir=self.workdir,
+                       cache_backend="sqlite")
+        rapi.fake_server = self.rapi.fake_server
+
+        list(rapi.multicall("packages.getDetails", [1, 2]))
+        res = list(rapi.multicall("packages.getDetails", [1, 2]))
+
+        self.assertEquals(res, [dict(id=1), dict(id=2)])
+        self.assertEquals(len(rapi.fake_server.batches), 2)
+
+    def test_30_multicall__not_supported(self):
+        self.rapi.fake_server.supported = False
+        self.rapi.caches = []
+
+        res = list(self.rapi.multicall("packages.getDetails", [1, -1, 2]))
+        self.assertEquals(res, [["sid-1", 1], None, ["sid-1", 2]])
+        self.assertFalse(self.rapi.multicall_supported)
+
+    def test_40_multicall__multiple_args(self):
+        argsets = [("bash", "4.1"), ("zsh", "5.0")]
+        res = list(self.rapi.multicall("packages.findByNvrea", argsets))
+
+        self.assertEquals(res, [dict(id=["bash", "4.1"]),
+                                dict(id=["zsh", "5.0"])])
+        self.assertEquals([c["params"][1:] for c
+                           in self.rapi.fake_server.batches[-1]], argsets)
+
+        # Results are cached and shared with calls of the API.
+        nbatches = len(self.rapi.fake_server.batches)
+        self.assertEquals(self.rapi.call("packages.findByNvrea", "zsh",
+                                         "5.0"), res[1])
+        self.assertEquals(len(self.rapi.fake_server.batches), nbatches)
+
+    def test_50_multicall__transport_errors(self):
+        for err in (socket.error(111, "Connection refused"),
+                    socket.timeout("timed out"),
+                    xmlrpclib.ProtocolError("rhns.example.com/rpc/api", 502,
+                                            "Bad Gateway", {})):
+            self.rapi.fake_server.error = err
+            res = list(self.rapi.multicall("packages.getDetails",
+                                           [1, 2, 3, 4]))
+            self.assertEquals(res, [None] * 4)
+
+        # Failures are not cached and calls are done again later.
+        self.rapi.fake_server.error = None
+        res = list(self.rapi.multicall("packages.getDetails", [1, 2]))
+        self.assertEquals(res, [dict(id=1), dict(id=2)])
+        self.assertTrue(self.rapi.multicall_supported)
+
+
 class Test_42_RpcApi__w_caches(unittest.TestCase):
     """FIXME: Test cases for RpcApi class w/ caches"""
     pass
 
 
+class Test_45_sync(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.conn_params = dict(protocol="https", server="rhns.example.com",
+                                userid="foo", passwd="secret", timeout=600,
+                                rate=0)
+        self.rapi = _RpcApi(self.conn_params, cachedir=self.workdir)
+        self.rapi.fake_server = self.server = _FakeSyncServer()
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def _batched_args(self, api, start=0):
+        return [c["params"][1] for b in self.server.batches[start:]
+                for c in b if c["methodName"] == api]
+
+    def test_10_sync__first(self):
+        res = S.sync(self.rapi, ["ch-0"])
+
+        self.assertEquals(res[0]["packages"], 2)
+        self.assertEquals(res[0]["modified_errata"], 1)
+        self.assertEquals(res[0]["failures"], 0)
+        self.assertEquals([s for _m, s in self.server.lists], [None, None])
+        self.assertEquals(self._batched_args("packages.getDetails"), [1, 2])
+
+    def test_20_sync__cacheonly(self):
+        S.sync(self.rapi, ["ch-0"])
+
+        rapi = _RpcApi(self.conn_params, cachedir=self.workdir,
+                       cacheonly=True)
+        rapi.fake_server = None  # Any access to the server must fail.
+
+        ps = rapi.call("channel.software.listAllPackages", "ch-0")
+        self.assertEquals([p["id"] for p in ps], [1, 2])
+        self.assertEquals(rapi.call("packages.getDetails", 2), dict(id=2))
+        self.assertEquals(rapi.call("errata.listPackages", "RHSA-2015:0001"),
+                          dict(id="RHSA-2015:0001"))
+
+    def test_30_sync__incremental(self):
+        res = S.sync(self.rapi, ["ch-0"])
+        nbatches = len(self.server.batches)
+
+        now = datetime.datetime.now() + datetime.timedelta(1)
+        self.server.data["channel.software.listAllPackages"] = \
+            [dict(id=1, last_modified=now, modified=True),
+             dict(id=2, last_modified=datetime.datetime(2015, 1, 1)),
+             dict(id=3, last_modified=now)]
+
+        res = S.sync(self.rapi, ["ch-0"])
+        self.assertEquals(res[0]["packages"], 3)
+        self.assertEquals(res[0]["modified_packages"], 2)
+        self.assertEquals(res[0]["modified_errata"], 0)
+        self.assertTrue(all(s is not None for _m, s
+                            in self.server.lists[2:]))
+        self.assertEquals(self._batched_args("packages.getDetails",
+                                             nbatches), [1, 3])
+
+        key = self.rapi.ma_to_key("channel.software.listAllPackages",
+                                  ("ch-0", ))
+        ps = self.rapi.caches[-1].load(key)
+        self.assertEquals([p["id"] for p in ps], [1, 2, 3])
+        self.assertTrue(ps[0]["modified"])
+
+    def test_40_sync__overlap(self):
+        res = S.sync(self.rapi, ["ch-0"])
+        nbatches = len(self.server.batches)
+
+        # Modified just before the last sync but not seen in it, e.g. the
+        # clock of the server is behind the client's.
+        then = res[0]["last_synced"] - datetime.timedelta(minutes=10)
+        self.server.data["channel.software.listAllPackages"].append(
+            dict(id=3, last_modified=then))
+
+        res = S.sync(self.rapi, ["ch-0"])
+        self.assertEquals(res[0]["packages"], 3)
+        self.assertEquals(self._batched_args("packages.getDetails",
+                                             nbatches), [3])
+
+    def test_50_sync__transport_error(self):
+        self.server.error = socket.timeout("timed out")
+        res = S.sync(self.rapi, ["ch-0"])
+
+        # packages.getDetails x 2, errata.{getDetails,listPackages} x 1
+        self.assertEquals(res[0]["failures"], 4)
+        self.assertTrue(res[0]["last_synced"] is None)
+
+        # All of them are fetched again in the next sync.
+        self.server.error = None
+        self.server.lists = []
+        res = S.sync(self.rapi, ["ch-0"])
+        self.assertEquals(res[0]["failures"], 0)
+        self.assertEquals([s for _m, s in self.server.lists], [None, None])
+
+
+_BUGZILLA_CMD = """\
+#!/bin/sh
+echo "$@" >> %s
+for arg; do
+    case $arg in --bug_id=*) ids=${arg#--bug_id=};; esac
+done
+for id in $(echo $ids | tr , ' '); do
+    test $id -gt 100 || printf '%%s\\037bug %%s\\037high\\037low\\n' $id $id
+done
+"""
+
+
+class Test_47_bugzilla(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.log = os.path.join(self.workdir, "bugzilla.log")
+
+        cmd = os.path.join(self.workdir, "bugzilla")
+        open(cmd, 'w').write(_BUGZILLA_CMD % self.log)
+        os.chmod(cmd, 0700)
+
+        self.path = os.environ["PATH"]
+        os.environ["PATH"] = self.workdir + os.pathsep + self.path
+
+        self.limiter = S.get_rate_limiter("swapi.bugzilla.getDetails")
+        (self.rate, self.limiter.rate) = (self.limiter.rate, 0)
+
+    def tearDown(self):
+        os.environ["PATH"] = self.path
+        self.limiter.rate = self.rate
+        C.cleanup_workdir(self.workdir)
+
+    def _queries(self):
+        return [l.split()[1] for l in open(self.log).readlines()]
+
+    def test_10_get_bugzilla_info_many(self):
+        bzs = S.get_bugzilla_info_many([1, 2, 101])
+
+        self.assertEquals(bzs[0], dict(bug_id="1", summary="bug 1",
+                                       priority="high", severity="low"))
+        self.assertEquals(bzs[1]["summary"], "bug 2")
+        self.assertEquals(bzs[2], dict())
+        self.assertEquals(self._queries(), ["--bug_id=1,2,101"])
+
+    def test_20_get_bugzilla_info(self):
+        self.assertEquals(S.get_bugzilla_info(1),
+                          dict(bug_id="1", summary="bug 1",
+                               priority="high", severity="low"))
+        self.assertEquals(S.get_bugzilla_info(101), dict())
+
+    def test_30_call__list_details_cached_per_bug(self):
+        conn_params = dict(protocol="https", server="rhns.example.com",
+                           userid="foo", passwd="secret", timeout=600)
+        rapi = S.RpcApi(conn_params, cachedir=self.workdir)
+
+        bzs = rapi.call("swapi.bugzilla.listDetails", 1, 2, 3)
+        self.assertEquals([b["bug_id"] for b in bzs], ["1", "2", "3"])
+
+        bzs = rapi.call("swapi.bugzilla.listDetails", 2, 3, 4)
+        self.assertEquals([b["bug_id"] for b in bzs], ["2", "3", "4"])
+        self.assertEquals(self._queries(), ["--bug_id=1,2,3",
+                                            "--bug_id=4"])
+
+        self.assertEquals(rapi.call("swapi.bugzilla.getDetails", 4), bzs[2])
+        self.assertEquals(len(self._queries()), 2)
+
+    def test_40_call__failed_not_cached(self):
+        conn_params = dict(protocol="https", server="rhns.example.com",
+                           userid="foo", passwd="secret", timeout=600)
+        rapi = S.RpcApi(conn_params, cachedir=self.workdir)
+
+        cmd = os.path.join(self.workdir, "bugzilla")
+        os.rename(cmd, cmd + ".save")
+        open(cmd, 'w').write("#!/bin/sh\nexit 1\n")
+        os.chmod(cmd, 0700)
+
+        self.assertTrue(S.get_bugzilla_info(1) is None)
+        self.assertTrue(rapi.call("swapi.bugzilla.getDetails", 1) is None)
+
+        os.rename(cmd + ".save", cmd)
+        self.assertEquals(rapi.call("swapi.bugzilla.getDetails", 1)["bug_id"],
+                          "1")
+
+
+_CONFIG = """\
+[DEFAULT]
+server = rhns.example.com
+userid = foo
+password = secret
+"""
+
+
+class Test_50_Client(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.config = os.path.join(self.workdir, "config")
+        open(self.config, 'w').write(_CONFIG)
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_get_client(self):
+        options = ["--config", self.config, "--no-cache"]
+        client = S.get_client(options)
+
+        self.assertEquals(client.rapi.url, "https://rhns.example.com/rpc/api")
+        self.assertTrue(S.get_client(options) is client)
+        self.assertFalse(S.get_client(options + ["-v"]) is client)
+
+    def test_20_call__virtual_api(self):
+        vapis = dict(S.VIRTUAL_APIS)
+        vapis["swapi.test.echo"] = lambda *args: [dict(arg=a) for a in args]
+
+        client = S.Client(["--config", self.config, "--no-cache",
+                           "--no-short-keys"])
+        client.rapi.vapis = vapis
+
+        self.assertEquals(client.call("swapi.test.echo", [1, "a"]),
+                          [dict(arg=1), dict(arg="a")])
+
+    def _client(self, workers=S.WORKERS):
+        conn_params = dict(protocol="https", server="rhns.example.com",
+                           userid="foo", passwd="secret", timeout=600,
+                           rate=0)
+        client = S.Client(["--config", self.config, "--no-short-keys"],
+                          workers=workers)
+        client.rapi = _RpcApi(conn_params, cachedir=self.workdir)
+        client.rapi.fake_server = _SlowFakeServer()
+
+        return client
+
+    def test_30_gather(self):
+        client = self._client(workers=4)
+        res = client.gather([("packages.getDetails", 1),
+                             ("errata.getDetails", "RHSA-2015:0001")])
+        client.close()
+
+        self.assertEquals([r[1:] for r in res],
+                          [[1], ["RHSA-2015:0001"]])
+
+    def test_32_map__concurrent(self):
+        client = self._client(workers=4)
+        res = client.map("packages.getDetails", range(4))
+        client.close()
+
+        self.assertEquals([r[1:] for r in res], [[i] for i in range(4)])
+        self.assertTrue(len(client.rapi.fake_server.threads) > 1)
+
+    def test_34_gather__shared_session_and_caches(self):
+        client = self._client()
+        res = client.map("packages.getDetails", [1, 2, 3])
+
+        # The first session expired and all calls share the new one.
+        self.assertEquals(client.rapi.fake_server.sids, ["sid-0", "sid-1"])
+
+        key = client.rapi.ma_to_key("packages.getDetails", (3, ))
+        self.assertEquals(client.rapi.get_result_from_caches(key), res[2])
+
+        ncalls = client.rapi.fake_server.ncalls
+        self.assertEquals(client.map("packages.getDetails", [1, 2, 3]), res)
+        self.assertEquals(client.rapi.fake_server.ncalls, ncalls)
+        client.close()
+
+    def test_40_gather__return_exceptions(self):
+        client = self._client()
+        calls = [("packages.getDetails", 1), ("packages.getDetails", -1)]
+
+        self.assertRaises(RuntimeError, client.gather, calls)
+
+        res = client.gather(calls, return_exceptions=True)
+        client.close()
+
+        self.assertEquals(res[0][1:], [1])
+        self.assertTrue(isinstance(res[1], RuntimeError))
+
+
+class Test_60_output(unittest.TestCase):
+
+    def setUp(self):
+        self.res = [dict(channel_id=i, channel_label="ch-%d" % i,
+                         channel_arch=("x86_64" if i % 2 else "i386"))
+                    for i in range(4)]
+
+    def _options(self, opts=[]):
+        return S.option_parser().parse_args(opts)[0]
+
+    def test_10_process_results_g__lazy(self):
+        consumed = []
+
+        def res_g():
+            for r in self.res:
+                consumed.append(r)
+                yield r
+
+        options = self._options(["--select", "arch:x86_64"])
+        res = S.process_results_g(res_g(), options)
+
+        self.assertEquals(next(res), dict(id=1, label="ch-1", arch="x86_64"))
+        self.assertEquals(len(consumed), 2)
+
+    def test_20_process_results(self):
+        options = self._options(["--deselect", "arch:x86_64", "--sort",
+                                 "label", "--group", "arch"])
+        res = S.process_results(reversed(self.res), options)
+
+        self.assertEquals(res.keys(), ["i386"])
+        self.assertEquals([r["id"] for r in res["i386"]], [0, 2])
+
+    def test_30_print_results__jsonl(self):
+        options = self._options(["--stream", "jsonl", "--no-short-keys"])
+        out = StringIO.StringIO()
+        S.print_results(iter(self.res), options, out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEquals(len(lines), 4)
+        self.assertEquals(json.loads(lines[1]), self.res[1])
+
+    def test_40_print_results__csv(self):
+        options = self._options(["--stream", "csv", "--headers",
+                                 "id,label"])
+        out = StringIO.StringIO()
+        S.print_results(S.process_results_g(iter(self.res), options),
+                        options, out)
+
+        self.assertEquals(out.getvalue().splitlines(),
+                          ["0,ch-0", "1,ch-1", "2,ch-2", "3,ch-3"])
+
+    def test_42_dump_results_csv__headers_of_first_result(self):
+        out = StringIO.StringIO()
+        S.dump_results_csv(iter(self.res[:1]), out)
+
+        self.assertEquals(out.getvalue().splitlines(),
+                          [",".join(self.res[0].keys()),
+                           ",".join(str(v) for v in self.res[0].values())])
+
+
 class Test_99_system_tests(unittest.TestCase):
 
     def test_01_api_wo_arg_and_sid(self):
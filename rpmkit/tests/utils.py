@@ -16,8 +16,11 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 import rpmkit.utils as TT
+import rpmkit.tests.common as C
 import functools
+import json
 import operator
+import os.path
 import unittest
 
 
@@ -54,4 +57,41 @@ class Test_00(unittest.TestCase):
         res = TT.pcall(plus, [(1, 2), (2, 3, 4)], 2)
         self.assertEquals(res, [3, 9])
 
+
+class Test_10_json_dump_and_load_g(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.items = [dict(a=1, b="x,\ny"), dict(a=2, b=[]), "abc,"]
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_json(self):
+        path = os.path.join(self.workdir, "a.json")
+
+        self.assertEquals(TT.json_dump_g(iter(self.items), path), 3)
+        self.assertEquals(json.load(open(path)), dict(data=self.items))
+        self.assertEquals(list(TT.json_load_g(path)), self.items)
+
+    def test_12_json__empty(self):
+        path = os.path.join(self.workdir, "a.json")
+
+        self.assertEquals(TT.json_dump_g([], path), 0)
+        self.assertEquals(json.load(open(path)), dict(data=[]))
+        self.assertEquals(list(TT.json_load_g(path)), [])
+
+    def test_14_json__dumped_by_json_dump(self):
+        path = os.path.join(self.workdir, "a.json")
+
+        TT.json_dump(dict(data=self.items), path)
+        self.assertEquals(list(TT.json_load_g(path)), self.items)
+
+    def test_20_jsonl(self):
+        for fname in ("a.jsonl", "a.jsonl.gz"):
+            path = os.path.join(self.workdir, fname)
+
+            self.assertEquals(TT.json_dump_g(self.items, path), 3)
+            self.assertEquals(list(TT.json_load_g(path)), self.items)
+
 # vim:sw=4 ts=4 et:
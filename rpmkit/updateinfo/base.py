@@ -6,9 +6,13 @@
 """
 import rpmkit.updateinfo.utils
 import rpmkit.memoize
+import rpmkit.utils as RU
 
 import collections
+import hashlib
+import json
 import logging
+import os
 import os.path
 
 
@@ -39,6 +43,17 @@ class Base(object):
         else:
             self._cachedir = cachedir
 
+    def repos_data_name(self, name):
+        """
+        :param name: Name of the data made from repos' metadata
+        :return: The name prefixed with the name of this backend not to share
+            data files in the cachedir with other backends
+
+        >>> Base().repos_data_name("errata_index")
+        'base_errata_index'
+        """
+        return "%s_%s" % (self.name.split('.')[-1], name)
+
     def is_rpmdb_available(self, readonly=False):
         return rpmkit.updateinfo.utils.check_rpmdb_root(self.root, readonly)
 
@@ -149,4 +164,90 @@ class Package(dict):
     def __str__(self):
         return "({name}, {version}, {release}, {epoch}, {arch})" % self
 
+
+def repos_data_path(repos, cachedir, name):
+    """
+    :param repos: List of enabled yum repos
+    :param cachedir: A dir to save metadata cache of yum repos
+    :param name: Name of the data made from repos' metadata, ex. errata_index
+
+    :return: Path to the data file of the repos or None if any metadata of
+        repos are not cached
+    """
+    revs = rpmkit.updateinfo.utils.repos_revisions(sorted(repos), cachedir)
+    if not revs or None in revs.values():
+        return None
+
+    key = hashlib.sha1(json.dumps(sorted(revs.items()))).hexdigest()
+    return os.path.join(cachedir, "%s_%s.jsonl.gz" % (name, key))
+
+
+def save_repos_data(data, path):
+    """
+    :param data: A list of dicts made from repos' metadata
+    :param path: Path to the data file
+    """
+    tmp = "%s.%d.jsonl.gz" % (path, os.getpid())
+    RU.json_dump_g(data, tmp)
+    os.rename(tmp, path)  # It's atomic and other processes never see tmp.
+
+
+def _load_repos_data(path):
+    """
+    :param path: Path to the data file
+    :return: A list of dicts made from repos' metadata
+    """
+    LOG.debug("Loading the data made from repos' metadata: %s", path)
+    return list(RU.json_load_g(path))
+
+
+load_repos_data = rpmkit.memoize.memoize(_load_repos_data)
+
+
+def mk_errata_index(errata):
+    """
+    :param errata: A list of errata
+    :return: A dict of {(package_name, package_arch): [errata]}
+    """
+    eidx = collections.defaultdict(list)
+    for e in errata:
+        for na in set((p["name"], p["arch"]) for p in e["packages"]):
+            eidx[na].append(e)
+
+    return eidx
+
+
+def _load_errata_index(path):
+    """
+    :param path: Path to the errata index file
+    :return: A dict of {(package_name, package_arch): [errata]}
+    """
+    return mk_errata_index(load_repos_data(path))
+
+
+load_errata_index = rpmkit.memoize.memoize(_load_errata_index)
+
+
+def applicable_errata_g(eidx, oldpkgtup, vercmp):
+    """
+    Mimics yum.update_md.UpdateMetadata.get_applicable_notices.
+
+    :param eidx: A dict of {(package_name, package_arch): [errata]}
+    :param oldpkgtup: A tuple of (name, arch, epoch, version, release) of an
+        installed package to update
+    :param vercmp: A function to compare (epoch, version, release) tuples
+    """
+    (name, arch, epoch, version, release) = oldpkgtup
+    oldevr = (epoch, version, release)
+
+    for e in eidx.get((name, arch), []):
+        for p in e["packages"]:
+            if p["name"] != name or p["arch"] != arch:
+                continue
+
+            evr = (p["epoch"] or '0', p["version"], p["release"])
+            if vercmp(evr, oldevr) > 0:
+                yield dict(e)  # Copy as errata may be modified later.
+                break
+
 # vim:sw=4:ts=4:et:
@@ -20,13 +20,16 @@ _DEFAULTS = dict(path=None, workdir="/tmp/rk-updateinfo-{}".format(_TODAY),
                  repos=[], multiproc=False, id=None,
                  score=0, keywords=RUM.ERRATA_KEYWORDS,
                  rpms=RUM.CORE_RPMS, period='', cachedir=None, refdir=None,
+                 cvefile=None, outfmt=None, incremental=False, jobs=None,
+                 timeout=None, report=None, render_only=False,
                  backend=RUM.DEFAULT_BACKEND, verbosity=0)
 _USAGE = """\
 %prog [Options...] ROOT
 
     where ROOT = RPM DB root having var/lib/rpm from the target host or
                  top dir to hold RPM DB roots of some hosts
-                 [multihosts mode]"""
+                 [multihosts mode] or working dir having results
+                 [--render-only mode]"""
 
 
 def option_parser(defaults=_DEFAULTS, usage=_USAGE, backends=RUM.BACKENDS):
@@ -42,10 +45,16 @@ def option_parser(defaults=_DEFAULTS, usage=_USAGE, backends=RUM.BACKENDS):
                       "RPM DBs automatically, and please not that any other "
                       "repos are disabled if this option was set.")
     p.add_option("-I", "--id", help="Data ID [None]")
-    # TODO: Disabled until issue of yum vs. multiprocessing module is fixed.
-    # p.add_option("-M", "--multiproc", action="store_true",
-    #             help="Specify this option if you want to analyze data "
-    #                  "in parallel (disabled currently)")
+    p.add_option("-M", "--multiproc", action="store_true",
+                 help="Specify this option if you want to analyze hosts "
+                      "in parallel in multihosts mode. Each host is analyzed "
+                      "in an isolated worker process")
+    p.add_option("-j", "--jobs", type="int",
+                 help="Max number of worker processes in parallel mode "
+                      "[number of CPUs]")
+    p.add_option('', "--timeout", type="int",
+                 help="Timeout in seconds to analyze each host in parallel "
+                      "mode [no timeouts]")
     p.add_option("-B", "--backend", choices=backends.keys(),
                  help="Specify backend to get updates and errata. Choices: "
                       "%s [%%default]" % ', '.join(backends.keys()))
@@ -57,6 +66,10 @@ def option_parser(defaults=_DEFAULTS, usage=_USAGE, backends=RUM.BACKENDS):
                  help="Keyword to select more 'important' bug errata. "
                       "You can specify this multiple times. "
                       "[%s]" % ', '.join(defaults["keywords"]))
+    p.add_option('', "--cvefile",
+                 help="Local copy of cve_dates.txt to get CVSS data of CVEs "
+                      "from instead of querying them one by one w/ swapi. "
+                      "It's used only if --score is given.")
     p.add_option('', "--rpm", dest="rpms", action="append",
                  help="RPM names to filter errata relevant to given RPMs")
     p.add_option('', "--period",
@@ -64,8 +77,29 @@ def option_parser(defaults=_DEFAULTS, usage=_USAGE, backends=RUM.BACKENDS):
                       "YYYY[-MM[-DD]][,YYYY[-MM[-DD]]], "
                       "ex. '2014-10-01,2014-12-31', '2014-01-01'. "
                       "If end date is omitted, Today will be used instead")
+    p.add_option('', "--outfmt", choices=RUM.OUTPUT_FORMATS,
+                 help="Output format of the lists of packages, errata and "
+                      "updates. Choices: %s [json]" %
+                      ', '.join(RUM.OUTPUT_FORMATS))
+    p.add_option('', "--incremental", action="store_true",
+                 help="Skip to analyze hosts if their installed RPMs, yum "
+                      "repos' metadata and options are same as the ones in "
+                      "the previous run saved in the working dir and repos' "
+                      "metadata_expire has not passed since then, and "
+                      "reuse the CVE details of errata analyzed in it")
+    p.add_option('', "--report", choices=RUM.REPORT_FORMATS,
+                 help="Render spreadsheet reports in this format just after "
+                      "analysis. Reports are not rendered by default and "
+                      "can be rendered later with --render-only. "
+                      "Choices: %s" % ', '.join(RUM.REPORT_FORMATS))
+    p.add_option('', "--render-only", action="store_true",
+                 help="Render reports of the results found under ROOT, "
+                      "the working dir of previous runs, in parallel "
+                      "instead of analysis")
     p.add_option("-C", "--cachedir",
-                 help="Specify yum repo metadata cachedir [root/var/cache]")
+                 help="Specify yum repo metadata cachedir [root/var/cache, "
+                      "or workdir/.cache shared among hosts in multihost "
+                      "mode]")
     p.add_option("-R", "--refdir",
                  help="Output 'delta' result compared to the data in this dir")
     p.add_option("-v", "--verbose", action="count", dest="verbosity",
@@ -83,22 +117,31 @@ def main():
     root = args[0] if args else raw_input("Host[s] data dir (root) > ")
     assert os.path.exists(root), "Not found RPM DB Root: %s" % root
 
+    if options.render_only:
+        RUM.set_loglevel(options.verbosity)
+        workdirs = RUM.find_results_dirs(root)
+        RUM.render_results_in_parallel(workdirs, options.report or "xlsx",
+                                       options.jobs)
+        return
+
     period = options.period.split(',') if options.period else ()
 
     if os.path.exists(os.path.join(root, "var/lib/rpm")):
         RUM.main(root, options.workdir, options.repos, options.id,
                  options.score, options.keywords, options.rpms, period,
                  options.cachedir, options.refdir, options.verbosity,
-                 options.backend)
+                 options.backend, cvefile=options.cvefile,
+                 outfmt=options.outfmt, incremental=options.incremental,
+                 report=options.report)
     else:
         # multihosts mode.
-        #
-        # TODO: multiproc mode is disabled and options.multiproc is not passed
-        # to RUMS.main until the issue of yum that its thread locks conflict w/
-        # multiprocessing module is fixed.
         RUMS.main(root, options.workdir, options.repos, options.score,
                   options.keywords, options.rpms, period, options.cachedir,
-                  options.refdir, options.verbosity, options.backend)
+                  options.refdir, options.verbosity, options.multiproc,
+                  options.backend, cvefile=options.cvefile,
+                  outfmt=options.outfmt, incremental=options.incremental,
+                  jobs=options.jobs, timeout=options.timeout,
+                  report=options.report)
 
 
 if __name__ == '__main__':
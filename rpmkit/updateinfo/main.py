@@ -11,8 +11,8 @@
 from rpmkit.globals import _
 from operator import itemgetter
 
-import rpmkit.updateinfo.yumbase
-import rpmkit.updateinfo.dnfbase
+import rpmkit.updateinfo.nativebase
+import rpmkit.updateinfo.report
 import rpmkit.updateinfo.utils
 import rpmkit.memoize
 import rpmkit.rpmutils
@@ -28,10 +28,13 @@ import datetime
 import functools
 import itertools
 import logging
+import multiprocessing
 import os
 import os.path
 import re
-import tablib
+import sqlite3
+import time
+import traceback
 
 if os.environ.get("RPMKIT_MEMORY_DEBUG", False):
     try:
@@ -52,10 +55,25 @@ LOG = logging.getLogger("rpmkit.updateinfo")
 _RPM_LIST_FILE = "packages.json"
 _ERRATA_LIST_FILE = "errata.json"
 _UPDATES_LIST_FILE = "updates.json"
+_SUMMARY_FILE = "summary.json"
+_STATE_FILE = "state.json"
 
-BACKENDS = dict(yum=rpmkit.updateinfo.yumbase.Base,
-                dnf=rpmkit.updateinfo.dnfbase.Base)
-DEFAULT_BACKEND = BACKENDS["yum"]
+BACKENDS = dict(native=rpmkit.updateinfo.nativebase.Base)
+
+# yum and dnf backends are available only if yum and dnf are installed.
+try:
+    import rpmkit.updateinfo.yumbase
+    BACKENDS["yum"] = rpmkit.updateinfo.yumbase.Base
+except ImportError:
+    pass
+
+try:
+    import rpmkit.updateinfo.dnfbase
+    BACKENDS["dnf"] = rpmkit.updateinfo.dnfbase.Base
+except ImportError:
+    pass
+
+DEFAULT_BACKEND = BACKENDS.get("yum", BACKENDS["native"])
 
 NEVRA_KEYS = ["name", "epoch", "version", "release", "arch"]
 
@@ -81,54 +99,249 @@ def set_loglevel(verbosity=0, backend=False):
     if not backend:
         llvl = logging.WARN
 
-    rpmkit.updateinfo.yumbase.LOG.setLevel(llvl)
-    rpmkit.updateinfo.dnfbase.LOG.setLevel(llvl)
+    for backend in BACKENDS.values():
+        logging.getLogger(backend.name).setLevel(llvl)
+
+
+# Output formats of the lists of packages, errata and updates: JSON (default),
+# JSON Lines and gzip-compressed JSON Lines.
+OUTPUT_FORMATS = ("json", "jsonl", "jsonl.gz")
+
+# Output formats of spreadsheet reports rendered from results.
+REPORT_FORMATS = rpmkit.updateinfo.report.FORMATS
+
+
+def _list_file(filename, outfmt=None):
+    """
+    :param filename: Output file basename
+    :param outfmt: Output format in OUTPUT_FORMATS or None (default: json)
+
+    >>> _list_file("errata.json")
+    'errata.json'
+    >>> _list_file("errata.json", "jsonl.gz")
+    'errata.jsonl.gz'
+    """
+    if not outfmt:
+        return filename
+
+    return "%s.%s" % (os.path.splitext(filename)[0], outfmt)
 
 
-def rpm_list_path(workdir, filename=_RPM_LIST_FILE):
+def rpm_list_path(workdir, filename=_RPM_LIST_FILE, outfmt=None):
     """
     :param workdir: Working dir to dump the result
     :param filename: Output file basename
+    :param outfmt: Output format in OUTPUT_FORMATS
     """
-    return os.path.join(workdir, filename)
+    return os.path.join(workdir, _list_file(filename, outfmt))
 
 
-def errata_list_path(workdir, filename=_ERRATA_LIST_FILE):
+def errata_list_path(workdir, filename=_ERRATA_LIST_FILE, outfmt=None):
     """
     :param workdir: Working dir to dump the result
     :param filename: Output file basename
+    :param outfmt: Output format in OUTPUT_FORMATS
     """
-    return os.path.join(workdir, filename)
+    return os.path.join(workdir, _list_file(filename, outfmt))
 
 
-def updates_file_path(workdir, filename=_UPDATES_LIST_FILE):
+def updates_file_path(workdir, filename=_UPDATES_LIST_FILE, outfmt=None):
     """
     :param workdir: Working dir to dump the result
+    :param outfmt: Output format in OUTPUT_FORMATS
     """
-    return os.path.join(workdir, filename)
+    return os.path.join(workdir, _list_file(filename, outfmt))
+
 
+def find_list_file(workdir, filename, outfmts=OUTPUT_FORMATS):
+    """
+    Find the list file dumped in any of output formats.
 
-def mk_cve_vs_cvss_map():
+    :param workdir: Dir to find the file
+    :param filename: File basename in the default output format
+    :return: The path of the file found or None
     """
-    Make up CVE vs. CVSS map w/ using swapi's virtual APIs.
+    for outfmt in outfmts:
+        path = os.path.join(workdir, _list_file(filename, outfmt))
+        if os.path.exists(path):
+            return path
+
+    return None
+
 
+CVE_CVSS_DB = os.path.join(rpmkit.swapi.CACHE_DIR, "cve_cvss.db")
+_CVE_CVSS_KEYS = ("cve", "score", "metrics", "url")
+
+
+def mk_cve_vs_cvss_map(cvefile=None):
+    """
+    Make up CVE vs. CVSS map w/ using swapi's virtual APIs or a local copy of
+    cve_dates.txt.
+
+    :param cvefile: cve_dates.txt file path or None (get it w/ swapi)
     :return: A list of CVE details :: {cve: {cve, url, score, metrics}, }
     """
-    return dict((c["cve"], c) for c in
-                rpmkit.swapi.call("swapi.cve.getAll") if c)
+    if cvefile:
+        LOG.info(_("Loading CVE and CVSS data from %s"), cvefile)
+        cves = (rpmkit.swapi.parse_cve_line(l) for l in open(cvefile)
+                if l.startswith("CVE-"))
+    else:
+        cves = rpmkit.swapi.call("swapi.cve.getAll")
+
+    return dict((c["cve"], c) for c in cves if c)
+
+
+def cve_cvss_source(cvefile=None):
+    """
+    :param cvefile: cve_dates.txt file path or None (get it w/ swapi)
+    :return: A string identifies the source of CVE vs. CVSS map
+
+    >>> cve_cvss_source()
+    'swapi'
+    """
+    if not cvefile:
+        return "swapi"
+
+    return "%s:%d" % (os.path.abspath(cvefile), os.stat(cvefile).st_mtime)
+
+
+def save_cve_vs_cvss_map(cvemap, dbpath=CVE_CVSS_DB, keys=_CVE_CVSS_KEYS,
+                         source="swapi"):
+    """
+    Save CVE vs. CVSS map into a SQLite database indexed by CVE IDs.
+
+    :param cvemap: A dict :: {cve: cve_and_cvss_data}
+    :param dbpath: Path to the database file
+    :param source: The source of `cvemap` made by :function:`cve_cvss_source`
+    """
+    dbdir = os.path.dirname(dbpath)
+    if dbdir and not os.path.exists(dbdir):
+        os.makedirs(dbdir)
+
+    tmppath = dbpath + ".%d" % os.getpid()
+    conn = sqlite3.connect(tmppath)
+    try:
+        conn.execute("DROP TABLE IF EXISTS cves")
+        conn.execute("CREATE TABLE cves (cve TEXT PRIMARY KEY, score TEXT, "
+                     "metrics TEXT, url TEXT)")
+        conn.executemany("INSERT OR REPLACE INTO cves VALUES (?, ?, ?, ?)",
+                         (tuple(c.get(k) for k in keys) for c
+                          in cvemap.values()))
+        conn.execute("DROP TABLE IF EXISTS meta")
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("INSERT INTO meta VALUES ('source', ?)", (source, ))
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.rename(tmppath, dbpath)  # Replace the old one atomically.
+
+
+def load_cve_vs_cvss_map(dbpath=CVE_CVSS_DB, keys=_CVE_CVSS_KEYS):
+    """
+    Load CVE vs. CVSS map saved by :function:`save_cve_vs_cvss_map`.
+
+    :param dbpath: Path to the database file
+    :return: A dict :: {cve: cve_and_cvss_data}
+    """
+    conn = sqlite3.connect(dbpath)
+    try:
+        rows = conn.execute("SELECT %s FROM cves" % ", ".join(keys))
+        return dict((r[0], dict((k, v) for k, v in zip(keys, r)
+                                if v is not None)) for r in rows)
+    finally:
+        conn.close()
+
+
+def load_cve_cvss_db_source(dbpath=CVE_CVSS_DB):
+    """
+    :param dbpath: Path to the database file
+    :return: The source of CVE vs. CVSS map saved in the database or None if
+        it's not recorded
+    """
+    conn = sqlite3.connect(dbpath)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'source'"
+                           ).fetchone()
+        return None if row is None else row[0]
+    except sqlite3.Error:
+        return None  # Made by older versions w/o the meta table.
+    finally:
+        conn.close()
+
+
+def _is_cve_cvss_db_new(dbpath, cvefile=None,
+                        expires=rpmkit.swapi.API_CACHE_EXPIRATIONS.get(
+                            "swapi.cve.getAll", 1)):
+    """
+    :param dbpath: Path to the database file
+    :param cvefile: cve_dates.txt file path the database should be made from
+        or None (made w/ swapi)
+    :param expires: Expiration dates of the database made w/ swapi
+    """
+    if not os.path.exists(dbpath):
+        return False
+
+    source = load_cve_cvss_db_source(dbpath)
+    if source != cve_cvss_source(cvefile):
+        LOG.info(_("CVE and CVSS data in %s were made from other source: "
+                   "%s"), dbpath, source)
+        return False
+
+    if cvefile:
+        return True  # The source has the mtime of the file.
+
+    return (time.time() - os.stat(dbpath).st_mtime) < expires * 86400
+
+
+def _get_cve_vs_cvss_map(cvefile=None, dbpath=CVE_CVSS_DB):
+    """
+    Get CVE vs. CVSS map from the database or make it up and save into the
+    database if the database is not available or old.
+
+    :param cvefile: cve_dates.txt file path or None (get it w/ swapi)
+    :param dbpath: Path to the database file
+    :return: A dict :: {cve: cve_and_cvss_data}
+    """
+    if _is_cve_cvss_db_new(dbpath, cvefile):
+        try:
+            return load_cve_vs_cvss_map(dbpath)
+        except sqlite3.Error as e:
+            LOG.warn(_("Failed to load CVE and CVSS data from %s, err=%s"),
+                     dbpath, str(e))
+
+    cvemap = mk_cve_vs_cvss_map(cvefile)
+    if cvemap:
+        try:
+            save_cve_vs_cvss_map(cvemap, dbpath,
+                                 source=cve_cvss_source(cvefile))
+        except (OSError, IOError, sqlite3.Error) as e:
+            LOG.warn(_("Failed to save CVE and CVSS data to %s, err=%s"),
+                     dbpath, str(e))
+
+    return cvemap
+
+
+# It's loaded once and shared in a process.
+get_cve_vs_cvss_map = rpmkit.memoize.memoize(_get_cve_vs_cvss_map)
 
 
 def fetch_cve_details(cve, cve_cvss_map={}):
     """
     :param cve: A dict represents CVE :: {id:, url:, ...}
-    :param cve_cvss_map: A dict :: {cve: cve_and_cvss_data}
+    :param cve_cvss_map: A dict :: {cve: cve_and_cvss_data}. CVSS data is
+        fetched w/ swapi only if it's empty.
 
     :return: A dict represents CVE and its CVSS metrics
     """
     cveid = cve.get("id", cve.get("cve"))
-    dcve = cve_cvss_map.get(cveid)
-    if dcve:
-        cve.update(**dcve)
+    if cve_cvss_map:
+        dcve = cve_cvss_map.get(cveid)
+        if dcve:
+            cve.update(**dcve)
+        else:
+            LOG.debug("CVSS metrics of %s was not found", cveid)
+
         return cve
 
     try:
@@ -206,33 +419,19 @@ def _make_cell_data(x, key, default="N/A"):
         return ", ".join(v) if isinstance(v, (list, tuple)) else v
 
 
-def make_dataset(list_data, title=None, headers=[], lheaders=[]):
+def make_sheet(list_data, title, headers, lheaders=[]):
     """
     :param list_data: List of data
-    :param title: Dataset title to be used as worksheet's name
-    :param headers: Dataset headers to be used as column headers, etc.
-    :param lheaders: Localized version of `headers`
-    """
-    dataset = tablib.Dataset()
-
-    # TODO: Check title as valid worksheet name, ex. len(title) <= 31.
-    # See also xlwt.Utils.valid_sheet_name.
-    if title:
-        dataset.title = title
-
-    if headers:
-        if lheaders:
-            dataset.headers = [h.replace('_s', '') for h in lheaders]
-        else:
-            dataset.headers = [h.replace('_s', '') for h in headers]
+    :param title: Sheet title to be used as worksheet's name
+    :param headers: Keys of data to be used as columns
+    :param lheaders: Localized version of `headers` to be used as column
+        headers
 
-        for x in list_data:
-            dataset.append([_make_cell_data(x, h) for h in headers])
-    else:
-        for x in list_data:
-            dataset.append(x.values())
-
-    return dataset
+    :return: A tuple of (title, headers, rows) where rows is a generator
+        yields rows, passed to :function:`rpmkit.updateinfo.report.dump`
+    """
+    rows = ([_make_cell_data(x, h) for h in headers] for x in list_data)
+    return (title, [h.replace('_s', '') for h in lheaders or headers], rows)
 
 
 def errata_date(date_s):
@@ -348,7 +547,7 @@ def list_updates_from_errata(errata):
     """
     us = sorted(U.uconcat(e.get("updates", []) for e in errata),
                 key=itemgetter("name"))
-    return [sorted(g, cmp=rpmkit.rpmutils.pcmp, reverse=True)[0]
+    return [max(g, key=rpmkit.rpmutils.pkg_evr_key)
             for g in sgroupby(us, itemgetter("name"))]
 
 
@@ -371,36 +570,19 @@ def compute_delta(refdir, errata, updates, nevra_keys=NEVRA_KEYS):
     emsg = "Reference %s not found: %s"
     assert os.path.exists(refdir), emsg % ("data dir", refdir)
 
-    ref_es_file = os.path.join(refdir, "errata.json")
-    ref_us_file = os.path.join(refdir, "updates.json")
-    assert os.path.exists(ref_es_file), emsg % ("errata file", ref_es_file)
-    assert os.path.exists(ref_us_file), emsg % ("updates file", ref_us_file)
+    ref_es_file = find_list_file(refdir, _ERRATA_LIST_FILE)
+    ref_us_file = find_list_file(refdir, _UPDATES_LIST_FILE)
+    assert ref_es_file, emsg % ("errata file", refdir)
+    assert ref_us_file, emsg % ("updates file", refdir)
 
-    ref_es_data = U.json_load(ref_es_file)
-    ref_us_data = U.json_load(ref_us_file)
+    ref_eadvs = set(e["advisory"] for e in U.json_load_g(ref_es_file))
+    ref_nevras = set(tuple(p[k] for k in nevra_keys) for p
+                     in U.json_load_g(ref_us_file))
     LOG.debug(_("Loaded reference errata and updates file"))
 
-    ref_eadvs = set(e["advisory"] for e in ref_es_data["data"])
-    ref_nevras = set((p[k] for k in nevra_keys) for p in ref_us_data["data"])
-
     return ([e for e in errata if e["advisory"] not in ref_eadvs],
             [u for u in updates
-             if (u[k] for k in nevra_keys) not in ref_nevras])
-
-
-def errata_matches_keywords_g(errata, keywords=ERRATA_KEYWORDS):
-    """
-    :param errata: A list of errata
-    :param keywords: Keyword list to filter 'important' RHBAs
-
-    :return: A generator to yield errata of which description contains any of
-        given keywords
-    """
-    for e in errata:
-        mks = [k for k in keywords if k in e["description"]]
-        if mks:
-            e["keywords"] = mks
-            yield e
+             if tuple(u[k] for k in nevra_keys) not in ref_nevras])
 
 
 def _ekeyfunc(e):
@@ -436,13 +618,17 @@ def higher_score_cve_errata_g(errata, score=DEFAULT_CVSS_SCORE):
             yield e
 
 
-def errata_complement_g(errata, updates, score=0):
+def errata_complement_g(errata, updates, score=0, cve_cvss_map={},
+                        ref_cves={}):
     """
     TODO: What should be complemented?
 
     :param errata: A list of errata
     :param updates: A list of update packages
     :param score: CVSS score
+    :param cve_cvss_map: A dict :: {cve: cve_and_cvss_data}
+    :param ref_cves: A dict :: {advisory: [cve_and_cvss_data]} of errata
+        analyzed previously to reuse the CVE details of them
     """
     unas = set(p2na(u) for u in updates)
     for e in errata:
@@ -456,26 +642,15 @@ def errata_complement_g(errata, updates, score=0):
         e["synopsis"] = e["synopsis"].strip()
 
         if score > 0:
-            e["cves"] = [fetch_cve_details(cve) for cve in e.get("cves", [])]
+            if e["advisory"] in ref_cves:
+                e["cves"] = ref_cves[e["advisory"]]
+            else:
+                e["cves"] = [fetch_cve_details(cve, cve_cvss_map) for cve
+                             in e.get("cves", [])]
 
         yield e
 
 
-def list_num_of_es_for_updates(es):
-    """
-    List number of specific type of errata for each package names.
-
-    :param es: List of reference errata of specific type (and severity)
-    :return: [(package_name :: str, num_of_relevant_errata :: Int)]
-    """
-    unes = U.uconcat([(u["name"], e) for u in e["updates"]] for e in es)
-    uess = [(k, [ue[1]["advisory"] for ue in g]) for k, g in
-            itertools.groupby(unes, itemgetter(0))]
-
-    return sorted(((un, len(es)) for un, es in uess), key=itemgetter(1),
-                  reverse=True)
-
-
 _DATE_REG = re.compile(r"^(\d{4})(?:.(\d{2})(?:.(\d{2}))?)?$")
 
 
@@ -554,27 +729,167 @@ def ymd_to_date(ymd, roundout=False, datereg=_DATE_REG):
     return round_ymd(int(d[0]), int_(d[1]), int_(d[2]), roundout)
 
 
-def mk_update_name_vs_advs_map(errata):
-    """
-    Make a list of a dict {name: [adv]} where name is name of update
-    package relevant to an errata and [adv] is a list of its advisories.
+class ErrataIndex(object):
+    """
+    Index of errata built in one pass over the errata list to avoid scanning
+    it again and again to classify errata by type, severity, etc.
+
+    >>> es = [dict(advisory="RHSA-2014:0001", severity="Critical",
+    ...            issue_date="2014-01-10", update_names=["a", "b"],
+    ...            description="..."),
+    ...       dict(advisory="RHBA-2014:0002", issue_date="2014-02-01",
+    ...            update_names=["b"], description="kernel panic"),
+    ...       dict(advisory="RHEA-2014:0003", issue_date="2014-02-03",
+    ...            update_names=["c"], description="...")]
+    >>> idx = ErrataIndex(es, ["panic"])
+    >>> [e["advisory"] for e in idx.rhsa + idx.rhba + idx.rhea]
+    ['RHSA-2014:0001', 'RHBA-2014:0002', 'RHEA-2014:0003']
+    >>> [e["advisory"] for e in idx.list_by_severity("Critical")]
+    ['RHSA-2014:0001']
+    >>> [e["advisory"] for e in idx.rhba_by_kwds]
+    ['RHBA-2014:0002']
+    >>> [e["advisory"] for e in idx.list_of_rpms(['b'], 'B')]
+    ['RHBA-2014:0002']
+    >>> [e["advisory"] for e in idx.list_in_period(20140201, 20140202)]
+    ['RHBA-2014:0002']
+    >>> idx.count_by_update_names('S')
+    [('a', 1), ('b', 1)]
+    >>> idx.advisories_by_update_names()
+    [('b', ['RHSA-2014:0001', 'RHBA-2014:0002']), ('a', ['RHSA-2014:0001']), \
+('c', ['RHEA-2014:0003'])]
+    """
+
+    def __init__(self, errata, keywords=ERRATA_KEYWORDS):
+        """
+        :param errata: A list of applicable errata sorted by severity
+            if it's RHSA and advisory in ascending sequence
+        :param keywords: Keyword list to filter 'important' RHBAs
+        """
+        self.errata = errata
+        self.keywords = keywords
+
+        self._by_type = collections.defaultdict(list)  # echar -> [e]
+        self._by_severity = collections.defaultdict(list)  # RHSA only
+        self._by_update_name = collections.defaultdict(list)  # name -> [e]
+        self._by_date = collections.defaultdict(list)  # yyyymmdd -> [e]
+        self.rhba_by_kwds = []
 
-    :param errata: A list of applicable errata sorted by severity
-        if it's RHSA and advisory in ascending sequence
-    """
-    def un_adv_pairs(errata):
         for e in errata:
-            for un in e.get("update_names", []):
-                yield (un, e["advisory"])
+            echar = e["advisory"][2]
+            self._by_type[echar].append(e)
+
+            if echar == 'S':
+                self._by_severity[e.get("severity")].append(e)
+
+            elif echar == 'B':
+                mks = [k for k in keywords if k in e["description"]]
+                if mks:
+                    e["keywords"] = mks
+                    self.rhba_by_kwds.append(e)
+
+            for name in e.get("update_names", []):
+                self._by_update_name[name].append(e)
+
+            self._by_date[_d2i(errata_date(e["issue_date"]))].append(e)
+
+    @property
+    def rhsa(self):
+        return self._by_type['S']
+
+    @property
+    def rhba(self):
+        return self._by_type['B']
+
+    @property
+    def rhea(self):
+        return self._by_type['E']
+
+    def list_by_type(self, echar):
+        """
+        :param echar: A char represents errata type, 'S', 'B' or 'E'
+        """
+        return self._by_type[echar]
+
+    def list_by_severity(self, severity):
+        """
+        :param severity: RHSA's severity, e.g. "Critical", "Important"
+        """
+        return self._by_severity[severity]
+
+    def list_by_update_name(self, name):
+        """
+        :param name: Name of update package relevant to errata
+        """
+        return self._by_update_name[name]
+
+    def list_of_rpms(self, rpms, echar=None):
+        """
+        :param rpms: RPM names to select relevant errata
+        :param echar: Select errata of this type only if given
+
+        :return: A list of errata relevant to any of given RPMs in the same
+            order as in the original errata list
+        """
+        eids = set(id(e) for n in rpms for e in self._by_update_name[n])
+        es = self.errata if echar is None else self._by_type[echar]
+
+        return [e for e in es if id(e) in eids]
+
+    def list_in_period(self, start_date, end_date):
+        """
+        :param start_date, end_date: Start and end date of period in int,
+            e.g. 20141001 (see :function:`period_to_dates`)
+
+        :return: A list of errata issued in given period in the same order as
+            in the original errata list
+        """
+        eids = set(id(e) for d, es in self._by_date.items()
+                   if start_date <= d and d < end_date for e in es)
+
+        return [e for e in self.errata if id(e) in eids]
 
-    un_advs_list = sorted(un_adv_pairs(errata), key=itemgetter(0))
-    return sorted(((k, [t[1] for t in g]) for k, g in
-                   itertools.groupby(un_advs_list, key=itemgetter(0))),
-                  key=lambda t: len(t[1]), reverse=True)
+    def _select(self, echar=None, severity=None):
+        def pred(e):
+            if echar is not None and e["advisory"][2] != echar:
+                return False
+
+            return severity is None or e.get("severity") == severity
+
+        return pred
+
+    def count_by_update_names(self, echar=None, severity=None):
+        """
+        Count errata for each name of update packages relevant to them.
+
+        :param echar: Count errata of this type only if given
+        :param severity: Count RHSAs of this severity only if given
+
+        :return: [(package_name :: str, num_of_relevant_errata :: Int)]
+        """
+        pred = self._select(echar, severity)
+        ncs = ((n, len([e for e in es if pred(e)])) for n, es
+               in sorted(self._by_update_name.items()))
+
+        return sorted(((n, c) for n, c in ncs if c), key=itemgetter(1),
+                      reverse=True)
+
+    def advisories_by_update_names(self, echar=None):
+        """
+        List advisories of errata for each name of update packages relevant
+        to them, in descending order of the number of advisories.
+
+        :param echar: Select errata of this type only if given
+        """
+        pred = self._select(echar)
+        nas = ((n, [e["advisory"] for e in es if pred(e)]) for n, es
+               in sorted(self._by_update_name.items()))
+
+        return sorted(((n, advs) for n, advs in nas if advs),
+                      key=lambda t: len(t[1]), reverse=True)
 
 
 def analyze_errata(errata, updates, score=0, keywords=ERRATA_KEYWORDS,
-                   core_rpms=CORE_RPMS, period=()):
+                   core_rpms=CORE_RPMS, period=(), eindex=None):
     """
     :param errata: A list of applicable errata sorted by severity
         if it's RHSA and advisory in ascending sequence
@@ -584,25 +899,29 @@ def analyze_errata(errata, updates, score=0, keywords=ERRATA_KEYWORDS,
     :param core_rpms: Core RPMs to filter errata by them
     :param period: Period of errata in format of YYYY[-MM[-DD]],
         ex. ("2014-10-01", "2014-11-01")
+    :param eindex: An instance of :class:`ErrataIndex` built from `errata`
+        or None (build it in this function)
     """
-    rhsa = [e for e in errata if e["advisory"][2] == 'S']
-    cri_rhsa = [e for e in rhsa if e.get("severity") == "Critical"]
-    imp_rhsa = [e for e in rhsa if e.get("severity") == "Important"]
+    if eindex is None:
+        eindex = ErrataIndex(errata, keywords)
+
+    rhsa = eindex.rhsa
+    cri_rhsa = eindex.list_by_severity("Critical")
+    imp_rhsa = eindex.list_by_severity("Important")
     latest_cri_rhsa = list_latest_errata_groupby_updates(cri_rhsa)
     latest_imp_rhsa = list_latest_errata_groupby_updates(imp_rhsa)
 
     us_of_cri_rhsa = list_updates_from_errata(cri_rhsa)
     us_of_imp_rhsa = list_updates_from_errata(imp_rhsa)
 
-    rhba = [e for e in errata if e["advisory"][2] == 'B']
+    rhba = eindex.rhba
 
     kf = lambda e: (len(e.get("keywords", [])), e["issue_date"],
                     e["update_names"])
-    rhba_by_kwds = sorted(errata_matches_keywords_g(rhba, keywords),
-                          key=kf, reverse=True)
+    rhba_by_kwds = sorted(eindex.rhba_by_kwds, key=kf, reverse=True)
     rhba_of_rpms_by_kwds = errata_of_rpms(rhba_by_kwds, core_rpms, kf)
-    rhba_of_rpms = errata_of_rpms(rhba, core_rpms,
-                                  itemgetter("update_names"))
+    rhba_of_rpms = sorted(eindex.list_of_rpms(core_rpms, 'B'),
+                          key=itemgetter("update_names"), reverse=True)
     latest_rhba_of_rpms = list_latest_errata_groupby_updates(rhba_of_rpms)
 
     if score > 0:
@@ -618,22 +937,20 @@ def analyze_errata(errata, updates, score=0, keywords=ERRATA_KEYWORDS,
 
     us_of_rhba_by_kwds = list_updates_from_errata(rhba_by_kwds)
 
-    rhea = [e for e in errata if e["advisory"][2] == 'E']
+    rhea = eindex.rhea
 
-    rhsa_rate_by_sev = [("Critical", len(cri_rhsa)),
-                        ("Important", len(imp_rhsa)),
-                        ("Moderate",
-                         len([e for e in rhsa
-                              if e.get("severity") == "Moderate"])),
-                        ("Low",
-                         len([e for e in rhsa
-                              if e.get("severity") == "Low"]))]
+    rhsa_rate_by_sev = [(sev, len(eindex.list_by_severity(sev))) for sev
+                        in ("Critical", "Important", "Moderate", "Low")]
 
-    n_rhsa_by_pns = list_num_of_es_for_updates(rhsa)
-    n_cri_rhsa_by_pns = list_num_of_es_for_updates(cri_rhsa)
-    n_imp_rhsa_by_pns = list_num_of_es_for_updates(imp_rhsa)
+    n_rhsa_by_pns = eindex.count_by_update_names('S')
+    n_cri_rhsa_by_pns = eindex.count_by_update_names('S', "Critical")
+    n_imp_rhsa_by_pns = eindex.count_by_update_names('S', "Important")
 
-    n_rhba_by_pns = list_num_of_es_for_updates(rhba)
+    n_rhba_by_pns = eindex.count_by_update_names('B')
+
+    rhsa_advs_by_pns = eindex.advisories_by_update_names('S')
+    rhba_advs_by_pns = eindex.advisories_by_update_names('B')
+    rhea_advs_by_pns = eindex.advisories_by_update_names('E')
 
     return dict(rhsa=dict(list=rhsa,
                           list_critical=cri_rhsa,
@@ -648,7 +965,7 @@ def analyze_errata(errata, updates, score=0, keywords=ERRATA_KEYWORDS,
                           list_n_by_pnames=n_rhsa_by_pns,
                           list_n_cri_by_pnames=n_cri_rhsa_by_pns,
                           list_n_imp_by_pnames=n_imp_rhsa_by_pns,
-                          list_by_packages=mk_update_name_vs_advs_map(rhsa)),
+                          list_by_packages=rhsa_advs_by_pns),
                 rhba=dict(list=rhba,
                           list_by_kwds=rhba_by_kwds,
                           list_of_core_rpms=rhba_of_rpms,
@@ -658,9 +975,9 @@ def analyze_errata(errata, updates, score=0, keywords=ERRATA_KEYWORDS,
                           list_updates_by_kwds=us_of_rhba_by_kwds,
                           list_higher_cvss_updates=us_of_rhba_by_score,
                           list_n_by_pnames=n_rhba_by_pns,
-                          list_by_packages=mk_update_name_vs_advs_map(rhba)),
+                          list_by_packages=rhba_advs_by_pns),
                 rhea=dict(list=rhea,
-                          list_by_packages=mk_update_name_vs_advs_map(rhea)),
+                          list_by_packages=rhea_advs_by_pns),
                 rate_by_type=[("Security", len(rhsa)),
                               ("Bug", len(rhba)),
                               ("Enhancement", len(rhea))])
@@ -678,16 +995,15 @@ def padding_row(row, mcols):
     return row + [''] * (mcols - len(row))
 
 
-def make_overview_dataset(workdir, data, score=0, keywords=ERRATA_KEYWORDS,
-                          core_rpms=[]):
+def make_overview_sheet(data, score=0, keywords=ERRATA_KEYWORDS,
+                        core_rpms=[]):
     """
-    :param workdir: Working dir to dump the result
     :param data: RPMs, Update RPMs and various errata data summarized
     :param score: CVSS base metrics score limit
     :param core_rpms: Core RPMs to filter errata by them
 
-    :return: An instance of tablib.Dataset becomes a worksheet represents the
-        overview of analysys reuslts
+    :return: A sheet, (title, headers, rows), represents the overview of
+        analysys reuslts
     """
     rows = [[_("Critical or Important RHSAs (Security Errata)")],
             [_("# of Critical RHSAs"),
@@ -743,67 +1059,25 @@ def make_overview_dataset(workdir, data, score=0, keywords=ERRATA_KEYWORDS,
              [_("# of RPMs from other vendors (non Red Hat)"),
               len(data["installed"]["list_from_others"])]]
 
-    headers = (_("Item"), _("Value"), _("Notes"))
-    dataset = tablib.Dataset(headers=headers)
-    dataset.title = _("Overview of analysis results")
-
+    headers = [_("Item"), _("Value"), _("Notes")]
     mcols = len(headers)
-    for row in rows:
-        try:
-            if row and len(row) == 1:  # Special case: separator
-                dataset.append_separator(row[0])
-            else:
-                dataset.append(padding_row(row, mcols))
-        except:
-            LOG.error("row=" + str(row))
-            raise
 
-    return dataset
+    # Separator rows have only one cell.
+    return (_("Overview of analysis results"), headers,
+            (row if len(row) == 1 else padding_row(row, mcols) for row
+             in rows))
 
 
-def dump_xls(dataset, filepath):
-    book = tablib.Databook(dataset)
-    with open(filepath, 'wb') as out:
-        out.write(book.xls)
-
-
-def dump_results(workdir, rpms, errata, updates, score=0,
-                 keywords=ERRATA_KEYWORDS, core_rpms=[], details=True,
-                 rpmkeys=NEVRA_KEYS, vendor="redhat"):
+def mk_summary_sheets_g(data, score=0, keywords=ERRATA_KEYWORDS,
+                        core_rpms=[], rpmkeys=NEVRA_KEYS):
     """
-    :param workdir: Working dir to dump the result
-    :param rpms: A list of installed RPMs
-    :param errata: A list of applicable errata
-    :param updates: A list of update RPMs
+    :param data: RPMs, Update RPMs and various errata data summarized
     :param score: CVSS base metrics score
     :param keywords: Keyword list to filter 'important' RHBAs
     :param core_rpms: Core RPMs to filter errata by them
-    :param details: Dump details also if True
-    """
-    rpms_rebuilt = [p for p in rpms if p.get("rebuilt", False)]
-    rpms_replaced = [p for p in rpms if p.get("replaced", False)]
-    rpms_from_others = [p for p in rpms if p.get("origin", '') != vendor]
-    rpms_by_vendor = [p for p in rpms if p.get("origin", '') == vendor and
-                      not p.get("rebuilt", False) and
-                      not p.get("replaced", False)]
-
-    nps = len(rpms)
-    nus = len(updates)
-
-    data = dict(errata=analyze_errata(errata, updates, score, keywords,
-                                      core_rpms),
-                installed=dict(list=rpms,
-                               list_rebuilt=rpms_rebuilt,
-                               list_replaced=rpms_replaced,
-                               list_from_others=rpms_from_others,
-                               list_by_vendor=rpms_by_vendor),
-                updates=dict(list=updates,
-                             rate=[(_("packages need updates"), nus),
-                                   (_("packages not need updates"),
-                                    nps - nus)]))
-
-    U.json_dump(data, os.path.join(workdir, "summary.json"))
 
+    :return: A generator yields sheets of the summary of analysis results
+    """
     # FIXME: How to keep DRY principle?
     lrpmkeys = [_("name"), _("epoch"), _("version"), _("release"), _("arch")]
 
@@ -817,76 +1091,222 @@ def dump_results(workdir, rpms, errata, updates, score=0,
     lbekeys = (_("advisory"), _("keywords"), _("synopsis"), _("url"),
                _("update_names"))
 
-    ds = [make_overview_dataset(workdir, data, score, keywords, core_rpms),
-          make_dataset((data["errata"]["rhsa"]["list_latest_critical"] +
-                        data["errata"]["rhsa"]["list_latest_important"]),
-                       _("Cri-Important RHSAs (latests)"), sekeys, lsekeys),
-          make_dataset(sorted(data["errata"]["rhsa"]["list_critical"],
-                              key=itemgetter("update_names")) +
-                       sorted(data["errata"]["rhsa"]["list_important"],
-                              key=itemgetter("update_names")),
-                       _("Critical or Important RHSAs"), sekeys, lsekeys),
-          make_dataset(data["errata"]["rhba"]["list_by_kwds_of_core_rpms"],
-                       _("RHBAs (core rpms, keywords)"), bekeys, lbekeys),
-          make_dataset(data["errata"]["rhba"]["list_by_kwds"],
-                       _("RHBAs (keyword)"), bekeys, lbekeys),
-          make_dataset(data["errata"]["rhba"]["list_latests_of_core_rpms"],
-                       _("RHBAs (core rpms, latests)"), bekeys, lbekeys),
-          make_dataset(data["errata"]["rhsa"]["list_critical_updates"],
-                       _("Update RPMs by RHSAs (Critical)"), rpmkeys,
-                       lrpmkeys),
-          make_dataset(data["errata"]["rhsa"]["list_important_updates"],
-                       _("Updates by RHSAs (Important)"), rpmkeys, lrpmkeys),
-          make_dataset(data["errata"]["rhba"]["list_updates_by_kwds"],
-                       _("Updates by RHBAs (Keyword)"), rpmkeys, lrpmkeys)]
+    rhsa = data["errata"]["rhsa"]
+    rhba = data["errata"]["rhba"]
+
+    yield make_overview_sheet(data, score, keywords, core_rpms)
+    yield make_sheet(rhsa["list_latest_critical"] +
+                     rhsa["list_latest_important"],
+                     _("Cri-Important RHSAs (latests)"), sekeys, lsekeys)
+    yield make_sheet(sorted(rhsa["list_critical"],
+                            key=itemgetter("update_names")) +
+                     sorted(rhsa["list_important"],
+                            key=itemgetter("update_names")),
+                     _("Critical or Important RHSAs"), sekeys, lsekeys)
+    yield make_sheet(rhba["list_by_kwds_of_core_rpms"],
+                     _("RHBAs (core rpms, keywords)"), bekeys, lbekeys)
+    yield make_sheet(rhba["list_by_kwds"], _("RHBAs (keyword)"), bekeys,
+                     lbekeys)
+    yield make_sheet(rhba["list_latests_of_core_rpms"],
+                     _("RHBAs (core rpms, latests)"), bekeys, lbekeys)
+    yield make_sheet(rhsa["list_critical_updates"],
+                     _("Update RPMs by RHSAs (Critical)"), rpmkeys, lrpmkeys)
+    yield make_sheet(rhsa["list_important_updates"],
+                     _("Updates by RHSAs (Important)"), rpmkeys, lrpmkeys)
+    yield make_sheet(rhba["list_updates_by_kwds"],
+                     _("Updates by RHBAs (Keyword)"), rpmkeys, lrpmkeys)
 
     if score > 0:
-        cvss_ds = [
-            make_dataset(data["errata"]["rhsa"]["list_higher_cvss_score"],
+        yield make_sheet(rhsa["list_higher_cvss_score"],
                          _("RHSAs (CVSS score >= %.1f)") % score,
-                         ("advisory", "severity", "synopsis",
-                         "cves", "cvsses_s", "url"),
+                         ("advisory", "severity", "synopsis", "cves",
+                          "cvsses_s", "url"),
                          (_("advisory"), _("severity"), _("synopsis"),
-                         _("cves"), _("cvsses_s"), _("url"))),
-            make_dataset(data["errata"]["rhsa"]["list_higher_cvss_score"],
+                          _("cves"), _("cvsses_s"), _("url")))
+        yield make_sheet(rhba["list_higher_cvss_score"],
                          _("RHBAs (CVSS score >= %.1f)") % score,
                          ("advisory", "synopsis", "cves", "cvsses_s", "url"),
                          (_("advisory"), _("synopsis"), _("cves"),
-                         _("cvsses_s"), _("url")))]
-        ds.extend(cvss_ds)
+                          _("cvsses_s"), _("url")))
 
     if data["installed"]["list_rebuilt"]:
-        ds.append(make_dataset(data["installed"]["list_rebuilt"],
-                               _("Rebuilt RPMs"), rpmdkeys, lrpmdkeys))
+        yield make_sheet(data["installed"]["list_rebuilt"],
+                         _("Rebuilt RPMs"), rpmdkeys, lrpmdkeys)
 
     if data["installed"]["list_replaced"]:
-        ds.append(make_dataset(data["installed"]["list_replaced"],
-                               _("Replaced RPMs"), rpmdkeys, lrpmdkeys))
+        yield make_sheet(data["installed"]["list_replaced"],
+                         _("Replaced RPMs"), rpmdkeys, lrpmdkeys)
 
     if data["installed"]["list_from_others"]:
-        ds.append(make_dataset(data["installed"]["list_from_others"],
-                               _("RPMs from other vendors"), rpmdkeys,
-                               lrpmdkeys))
+        yield make_sheet(data["installed"]["list_from_others"],
+                         _("RPMs from other vendors"), rpmdkeys, lrpmdkeys)
+
+
+def mk_details_sheets_g(errata, updates, rpms, rpmkeys=NEVRA_KEYS):
+    """
+    :param errata: An iterable yields applicable errata
+    :param updates: An iterable yields update RPMs
+    :param rpms: An iterable yields installed RPMs
+
+    :return: A generator yields sheets of the details of analysis results
+    """
+    lrpmkeys = [_("name"), _("epoch"), _("version"), _("release"), _("arch")]
+
+    rpmdkeys = rpmkeys + ["summary", "vendor", "buildhost"]
+    lrpmdkeys = lrpmkeys + [_("summary"), _("vendor"), _("buildhost")]
+
+    yield make_sheet(errata, _("Errata Details"),
+                     ("advisory", "type", "severity", "synopsis",
+                      "description", "issue_date", "update_date", "url",
+                      "cves", "bzs", "update_names"),
+                     (_("advisory"), _("type"), _("severity"),
+                      _("synopsis"), _("description"), _("issue_date"),
+                      _("update_date"), _("url"), _("cves"),
+                      _("bzs"), _("update_names")))
+    yield make_sheet(updates, _("Update RPMs"), rpmkeys, lrpmkeys)
+    yield make_sheet(rpms, _("Installed RPMs"), rpmdkeys, lrpmdkeys)
 
-    dump_xls(ds, os.path.join(workdir, "errata_summary.xls"))
 
-    if details:
-        dds = [make_dataset(errata, _("Errata Details"),
-                            ("advisory", "type", "severity", "synopsis",
-                             "description", "issue_date", "update_date", "url",
-                             "cves", "bzs", "update_names"),
-                            (_("advisory"), _("type"), _("severity"),
-                            _("synopsis"), _("description"), _("issue_date"),
-                            _("update_date"), _("url"), _("cves"),
-                            _("bzs"), _("update_names"))),
-               make_dataset(updates, _("Update RPMs"), rpmkeys, lrpmkeys),
-               make_dataset(rpms, _("Installed RPMs"), rpmdkeys, lrpmdkeys)]
+def summary_file_path(workdir, filename=_SUMMARY_FILE):
+    """
+    :param workdir: Working dir to dump the result
+    :param filename: Output file basename
+    """
+    return os.path.join(workdir, filename)
+
+
+def render_results(workdir, fmt="xlsx"):
+    """
+    Render spreadsheet reports, errata_summary and errata_details, from the
+    results, summary.json and the lists of errata and updates, saved in
+    `workdir`. Sheets are rendered row by row from these files.
+
+    :param workdir: Working dir the results were saved in
+    :param fmt: Output format of reports in REPORT_FORMATS
+    :return: A list of paths of reports rendered
+    """
+    LOG.debug(_("Render reports in %s from the results in %s"), fmt, workdir)
+    data = U.json_load(summary_file_path(workdir))
+    params = data.get("params", {})
+
+    sheets = mk_summary_sheets_g(data, params.get("score", 0),
+                                 params.get("keywords", ERRATA_KEYWORDS),
+                                 params.get("core_rpms", []))
+    paths = rpmkit.updateinfo.report.dump(
+        sheets, os.path.join(workdir, "errata_summary"), fmt)
+
+    epath = find_list_file(workdir, _ERRATA_LIST_FILE)
+    if params.get("details", True) and epath:
+        upath = find_list_file(workdir, _UPDATES_LIST_FILE)
+        sheets = mk_details_sheets_g(U.json_load_g(epath),
+                                     U.json_load_g(upath) if upath else [],
+                                     data["installed"]["list"])
+        paths += rpmkit.updateinfo.report.dump(
+            sheets, os.path.join(workdir, "errata_details"), fmt)
+
+    return paths
+
+
+def find_results_dirs(topdir, filename=_SUMMARY_FILE):
+    """
+    :param topdir: Dir to find results, e.g. the working dir of multihosts
+        mode
+    :return: A list of dirs having results, summary.json
+    """
+    return sorted(d for d, _ds, fs in os.walk(topdir) if filename in fs)
+
+
+def _render_results(args):
+    """
+    Render reports in a worker process.
+
+    :param args: A tuple of (workdir, fmt)
+    :return: A tuple of (workdir, paths of reports, error or None)
+    """
+    (workdir, fmt) = args
+    try:
+        return (workdir, render_results(workdir, fmt), None)
+    except Exception:
+        LOG.error(_("Failed to render reports in %s"), workdir)
+        return (workdir, [], traceback.format_exc())
+
+
+def render_results_in_parallel(workdirs, fmt="xlsx", jobs=None):
+    """
+    Render reports of results in `workdirs` in a pool of worker processes.
+
+    :param workdirs: A list of dirs having results
+    :param fmt: Output format of reports in REPORT_FORMATS
+    :param jobs: Max number of worker processes or None (number of CPUs)
+    :return: A dict of {workdir: dict(status=ok|failed, paths=[...],
+        error=traceback or None)}
+    """
+    pool = multiprocessing.Pool(jobs)
+    results = dict()
+    try:
+        for workdir, paths, error in pool.imap_unordered(
+                _render_results, [(w, fmt) for w in workdirs]):
+            results[workdir] = dict(status="failed" if error else "ok",
+                                    paths=paths, error=error)
+            LOG.info(_("[%d/%d] Rendered reports in %s: %s"), len(results),
+                     len(workdirs), workdir, results[workdir]["status"])
+    finally:
+        pool.close()
+        pool.join()
+
+    return results
+
+
+def dump_results(workdir, rpms, errata, updates, score=0,
+                 keywords=ERRATA_KEYWORDS, core_rpms=[], details=True,
+                 rpmkeys=NEVRA_KEYS, vendor="redhat", eindex=None,
+                 report=None):
+    """
+    :param workdir: Working dir to dump the result
+    :param rpms: A list of installed RPMs
+    :param errata: A list of applicable errata
+    :param updates: A list of update RPMs
+    :param score: CVSS base metrics score
+    :param keywords: Keyword list to filter 'important' RHBAs
+    :param core_rpms: Core RPMs to filter errata by them
+    :param details: Render details also if True
+    :param eindex: An instance of :class:`ErrataIndex` built from `errata`
+        or None (build it in :function:`analyze_errata`)
+    :param report: Output format of reports to render just after dumping the
+        result or None (do not render reports; they may be rendered later
+        with :function:`render_results`)
+    """
+    rpms_rebuilt = [p for p in rpms if p.get("rebuilt", False)]
+    rpms_replaced = [p for p in rpms if p.get("replaced", False)]
+    rpms_from_others = [p for p in rpms if p.get("origin", '') != vendor]
+    rpms_by_vendor = [p for p in rpms if p.get("origin", '') == vendor and
+                      not p.get("rebuilt", False) and
+                      not p.get("replaced", False)]
+
+    nps = len(rpms)
+    nus = len(updates)
+
+    data = dict(errata=analyze_errata(errata, updates, score, keywords,
+                                      core_rpms, eindex=eindex),
+                installed=dict(list=rpms,
+                               list_rebuilt=rpms_rebuilt,
+                               list_replaced=rpms_replaced,
+                               list_from_others=rpms_from_others,
+                               list_by_vendor=rpms_by_vendor),
+                updates=dict(list=updates,
+                             rate=[(_("packages need updates"), nus),
+                                   (_("packages not need updates"),
+                                    nps - nus)]),
+                params=dict(score=score, keywords=keywords,
+                            core_rpms=core_rpms, details=details))
+
+    U.json_dump(data, summary_file_path(workdir))
 
-        dump_xls(dds, os.path.join(workdir, "errata_details.xls"))
+    if report:
+        render_results(workdir, report)
 
 
-def get_backend(backend, fallback=rpmkit.updateinfo.yumbase.Base,
-                backends=BACKENDS):
+def get_backend(backend, fallback=DEFAULT_BACKEND, backends=BACKENDS):
     LOG.info("Using the backend: %s", backend)
     return backends.get(backend, fallback)
 
@@ -894,7 +1314,7 @@ def get_backend(backend, fallback=rpmkit.updateinfo.yumbase.Base,
 @profile
 def prepare(root, workdir=None, repos=[], did=None, cachedir=None,
             backend=DEFAULT_BACKEND, backends=BACKENDS,
-            nevra_keys=NEVRA_KEYS):
+            nevra_keys=NEVRA_KEYS, outfmt=None):
     """
     :param root: Root dir of RPM db, ex. / (/var/lib/rpm)
     :param workdir: Working dir to save results
@@ -903,6 +1323,8 @@ def prepare(root, workdir=None, repos=[], did=None, cachedir=None,
     :param cachedir: A dir to save metadata cache of yum repos
     :param backend: Backend module to use to get updates and errata
     :param backends: Backend list
+    :param outfmt: Output format of the lists of packages, errata and updates
+        in OUTPUT_FORMATS or None (json)
 
     :return: A bunch.Bunch object of (Base, workdir, installed_rpms_list)
     """
@@ -922,7 +1344,7 @@ def prepare(root, workdir=None, repos=[], did=None, cachedir=None,
 
     host = bunch.bunchify(dict(id=did, root=root, workdir=workdir,
                                repos=repos, available=False,
-                               cachedir=cachedir))
+                               cachedir=cachedir, outfmt=outfmt))
 
     # pylint: disable=maybe-no-member
     if not rpmkit.updateinfo.utils.check_rpmdb_root(root):
@@ -944,13 +1366,153 @@ def prepare(root, workdir=None, repos=[], did=None, cachedir=None,
              len([p for p in host.installed if p.get("rebuilt", False)]),
              len([p for p in host.installed if p.get("replaced", False)]))
 
-    U.json_dump(dict(data=host.installed, ), rpm_list_path(host.workdir))
+    U.json_dump_g(host.installed, rpm_list_path(host.workdir, outfmt=outfmt))
     host.available = True
     # pylint: enable=maybe-no-member
 
     return host
 
 
+def state_file_path(workdir, filename=_STATE_FILE):
+    """
+    :param workdir: Working dir to dump the result
+    :param filename: Output file basename
+    """
+    return os.path.join(workdir, filename)
+
+
+def mk_state_params(backend=DEFAULT_BACKEND, backends=BACKENDS, score=0,
+                    keywords=ERRATA_KEYWORDS, core_rpms=[], period=(),
+                    refdir=None, cvefile=None, outfmt=None):
+    """
+    Make a dict of analysis parameters to keep in host's state record. See
+    :function:`analyze` for the meanings of parameters.
+
+    >>> params = mk_state_params(score=4.0, period=("2014-10-01", ))
+    >>> params["period"][0]
+    20141001
+    >>> params["keywords"] == ERRATA_KEYWORDS
+    True
+    """
+    if period:
+        period = list(period_to_dates(*period))
+
+    return dict(backend=getattr(backends.get(backend, backend), "name",
+                                backend),
+                score=score, keywords=list(keywords),
+                core_rpms=list(core_rpms), period=list(period),
+                refdir=refdir and os.path.abspath(refdir),
+                cvefile=cvefile and os.path.abspath(cvefile), outfmt=outfmt)
+
+
+def mk_host_state(root, repos=[], cachedir=None, params={}):
+    """
+    Make host's state record, fingerprints of its installed RPMs, yum repos'
+    metadata and analysis parameters, without loading yum or dnf.
+
+    Revisions of repos' metadata are read from the cache which is refreshed
+    only in analysis, so the record has the time it's made and the
+    expiration period of repos' metadata also to analyze the host again when
+    the cache should be refreshed.
+
+    :param root: Root dir of RPM db, ex. / (/var/lib/rpm)
+    :param repos: List of yum repos to get updateinfo data (errata and updtes)
+    :param cachedir: A dir to save metadata cache of yum repos
+    :param params: A dict of analysis parameters :function:`mk_state_params`
+        returns
+
+    :return: A dict represents the state of the host or None if its RPM DB is
+        not available or its yum repos cannot be guessed
+    """
+    root = os.path.abspath(root)
+    if not rpmkit.updateinfo.utils.check_rpmdb_root(root):
+        return None
+
+    if not repos:
+        try:
+            repos = rpmkit.updateinfo.utils.guess_rhel_repos(root)
+        except AssertionError as exc:
+            LOG.warn(_("Failed to guess yum repos of %s: %s"), root, exc)
+            return None
+
+    if cachedir is None:
+        cachedir = os.path.join(root, "var/cache")
+
+    utils = rpmkit.updateinfo.utils
+    return dict(rpmdb=utils.rpmdb_digest(root),
+                repos=utils.repos_revisions(repos, cachedir),
+                params=params, timestamp=int(time.time()),
+                expires=utils.repos_metadata_expire(repos))
+
+
+def load_host_state(workdir):
+    """
+    :param workdir: Working dir where results of the host were saved
+    :return: A dict represents the state of the host saved previously or {}
+    """
+    path = state_file_path(workdir)
+    if not os.path.exists(path):
+        return dict()
+
+    return U.json_load(path)
+
+
+def save_host_state(state, workdir):
+    """
+    :param state: A dict represents the state of the host
+    :param workdir: Working dir to save results of the host
+    """
+    U.json_dump(state, state_file_path(workdir))
+
+
+def is_host_state_unchanged(state, prev, workdir):
+    """
+    :param state: A dict represents the current state of the host
+    :param prev: A dict represents the state of the host saved previously
+    :param workdir: Working dir where results of the host were saved
+
+    :return: True if nothing changed since the previous analysis and its
+        results can be reused as they are
+    """
+    if not prev or None in state["repos"].values():
+        return False  # Not analyzed yet or repos' metadata are not cached.
+
+    if state.get("rpmdb") is None:
+        return False  # RPM DB is missing and it cannot be compared.
+
+    expires = state.get("expires", rpmkit.updateinfo.utils.METADATA_EXPIRE)
+    if expires >= 0 and time.time() - prev.get("timestamp", 0) >= expires:
+        return False  # Repos' metadata may be updated since then.
+
+    if not find_list_file(workdir, _ERRATA_LIST_FILE):
+        return False
+
+    return all(prev.get(k) == state[k] for k in ("rpmdb", "repos", "params"))
+
+
+def can_reuse_errata(state, prev):
+    """
+    :param state: A dict represents the current state of the host
+    :param prev: A dict represents the state of the host saved previously
+
+    :return: True if the details of errata analyzed previously can be reused
+    """
+    return bool(prev) and prev.get("params") == state["params"]
+
+
+def load_ref_cves(workdir):
+    """
+    :param workdir: Working dir where results of the host were saved
+    :return: A dict :: {advisory: [cve_and_cvss_data]}
+    """
+    path = find_list_file(workdir, _ERRATA_LIST_FILE)
+    if not path:
+        return dict()
+
+    return dict((e["advisory"], e.get("cves", [])) for e
+                in U.json_load_g(path))
+
+
 _TODAY = datetime.datetime.now().strftime("%Y-%m-%d")
 
 
@@ -976,20 +1538,10 @@ def period_to_dates(start_date, end_date=_TODAY):
     return (_d2i(ymd_to_date(start_date)), _d2i(ymd_to_date(end_date, True)))
 
 
-def errata_in_period(errata, start_date, end_date):
-    """
-    :param errata: A dict represents errata
-    :param start_date, end_date: Start and end date of period,
-        (year :: int, month :: int, day :: int)
-    """
-    d = _d2i(errata_date(errata["issue_date"]))
-
-    return start_date <= d and d < end_date
-
-
 @profile
 def analyze(host, score=0, keywords=ERRATA_KEYWORDS, core_rpms=[],
-            period=(), refdir=None, nevra_keys=NEVRA_KEYS):
+            period=(), refdir=None, nevra_keys=NEVRA_KEYS, cvefile=None,
+            reuse=False, report=None):
     """
     :param host: host object function :function:`prepare` returns
     :param score: CVSS base metrics score
@@ -999,6 +1551,12 @@ def analyze(host, score=0, keywords=ERRATA_KEYWORDS, core_rpms=[],
         ex. ("2014-10-01", "2014-11-01")
     :param refdir: A dir holding reference data previously generated to
         compute delta (updates since that data)
+    :param cvefile: A local copy of cve_dates.txt to get CVSS data from or
+        None (get CVSS data w/ swapi)
+    :param reuse: Reuse the details of errata analyzed previously and saved in
+        host.workdir and only complement new errata if True
+    :param report: Output format of reports to render just after analysis or
+        None (render reports later with :function:`render_results`)
     """
     base = host.base
     workdir = host.workdir
@@ -1018,14 +1576,27 @@ def analyze(host, score=0, keywords=ERRATA_KEYWORDS, core_rpms=[],
 
     us = U.uniq(base.list_updates(), key=itemgetter(*nevra_keys))
     es = base.list_errata()
-    es = U.uniq(errata_complement_g(es, us, score), key=itemgetter("id"),
-                reverse=True)
+
+    ref_cves = load_ref_cves(workdir) if reuse else {}
+    nes = len([e for e in es if e["advisory"] not in ref_cves])
+    LOG.debug(_("%s: Reuse %d errata analyzed previously"), host.id,
+              len(es) - nes)
+
+    if score > 0 and nes:
+        cvemap = get_cve_vs_cvss_map(cvefile)
+        LOG.debug(_("%s: Loaded CVSS data of %d CVEs"), host.id, len(cvemap))
+    else:
+        cvemap = {}
+
+    es = U.uniq(errata_complement_g(es, us, score, cvemap, ref_cves),
+                key=itemgetter("id"), reverse=True)
     LOG.info(_("%s: Found %d Errata, %d Update RPMs"), host.id, len(es),
              len(us))
 
     LOG.debug(_("%s: Dump Errata and Update RPMs list..."), host.id)
-    U.json_dump(dict(data=es, ), errata_list_path(workdir))
-    U.json_dump(dict(data=us, ), updates_file_path(workdir))
+    outfmt = host.get("outfmt")
+    U.json_dump_g(es, errata_list_path(workdir, outfmt=outfmt))
+    U.json_dump_g(us, updates_file_path(workdir, outfmt=outfmt))
 
     host.errata = es
     host.updates = us
@@ -1033,20 +1604,23 @@ def analyze(host, score=0, keywords=ERRATA_KEYWORDS, core_rpms=[],
 
     LOG.info(_("%s: Analyze and dump results of errata data in %s"),
              host.id, workdir)
-    dump_results(workdir, ips, es, us, score, keywords, core_rpms)
+    eindex = ErrataIndex(es, keywords)
+    dump_results(workdir, ips, es, us, score, keywords, core_rpms,
+                 eindex=eindex, report=report)
 
     if period:
         (start_date, end_date) = period_to_dates(*period)
         LOG.info(_("%s: Analyze errata in period: %s ~ %s"),
                  host.id, start_date, end_date)
-        pes = [e for e in es if errata_in_period(e, start_date, end_date)]
+        pes = eindex.list_in_period(start_date, end_date)
 
         pdir = os.path.join(workdir, "%s_%s" % (start_date, end_date))
         if not os.path.exists(pdir):
             LOG.debug(_("%s: Creating period working dir %s"), host.id, pdir)
             os.makedirs(pdir)
 
-        dump_results(pdir, ips, pes, us, score, keywords, core_rpms, False)
+        dump_results(pdir, ips, pes, us, score, keywords, core_rpms, False,
+                     report=report)
 
     if refdir:
         LOG.debug(_("%s [delta]: Analyze delta errata data by refering %s"),
@@ -1061,18 +1635,20 @@ def analyze(host, score=0, keywords=ERRATA_KEYWORDS, core_rpms=[],
                       host.id, deltadir)
             os.makedirs(deltadir)
 
-        U.json_dump(dict(data=es, ), errata_list_path(deltadir))
-        U.json_dump(dict(data=us, ), updates_file_path(deltadir))
+        U.json_dump_g(es, errata_list_path(deltadir, outfmt=outfmt))
+        U.json_dump_g(us, updates_file_path(deltadir, outfmt=outfmt))
 
         LOG.info(_("%s: Analyze and dump results of delta errata in %s"),
                  host.id, deltadir)
-        dump_results(workdir, ips, es, us, score, keywords, core_rpms)
+        dump_results(deltadir, ips, es, us, score, keywords, core_rpms,
+                     report=report)
 
 
 def main(root, workdir=None, repos=[], did=None, score=0,
          keywords=ERRATA_KEYWORDS, rpms=CORE_RPMS, period=(),
          cachedir=None, refdir=None, verbosity=0,
-         backend=DEFAULT_BACKEND, backends=BACKENDS):
+         backend=DEFAULT_BACKEND, backends=BACKENDS, cvefile=None,
+         outfmt=None, incremental=False, report=None):
     """
     :param root: Root dir of RPM db, ex. / (/var/lib/rpm)
     :param workdir: Working dir to save results
@@ -1089,11 +1665,42 @@ def main(root, workdir=None, repos=[], did=None, score=0,
     :param verbosity: Verbosity level: 0 (default), 1 (verbose), 2 (debug)
     :param backend: Backend module to use to get updates and errata
     :param backends: Backend list
+    :param cvefile: A local copy of cve_dates.txt to get CVSS data from
+    :param outfmt: Output format of the lists of packages, errata and updates
+    :param incremental: Skip to analyze if nothing changed since the previous
+        run or reuse the CVE details of errata analyzed in it if True
+    :param report: Output format of reports to render just after analysis or
+        None (do not render reports)
     """
     set_loglevel(verbosity)
 
-    host = prepare(root, workdir, repos, did, cachedir, backend, backends)
+    if incremental:
+        params = mk_state_params(backend, backends, score, keywords, rpms,
+                                 period, refdir, cvefile, outfmt)
+        state = mk_host_state(root, repos, cachedir, params)
+        if state is None:
+            LOG.warn(_("%s: RPM DB not available and don't analyze %s"),
+                     did, root)
+            return
+
+        prev = load_host_state(workdir or root)
+
+        if is_host_state_unchanged(state, prev, workdir or root):
+            LOG.info(_("%s: Nothing changed since the last run. Skip to "
+                       "analyze %s"), did, root)
+            return
+
+    host = prepare(root, workdir, repos, did, cachedir, backend, backends,
+                   outfmt=outfmt)
     if host.available:
-        analyze(host, score, keywords, rpms, period, refdir)
+        reuse = incremental and can_reuse_errata(state, prev)
+        analyze(host, score, keywords, rpms, period, refdir, cvefile=cvefile,
+                reuse=reuse, report=report)
+
+        if incremental:
+            # Repos' metadata cache may be updated during the analysis.
+            state = mk_host_state(root, host.repos, cachedir, params)
+            if state is not None:
+                save_host_state(state, host.workdir)
 
 # vim:sw=4:ts=4:et:
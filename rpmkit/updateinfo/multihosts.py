@@ -13,21 +13,30 @@ import rpmkit.updateinfo.main as RUM
 import rpmkit.updateinfo.utils
 import rpmkit.utils as U
 
-# It looks available in EPEL for RHELs:
-#   https://apps.fedoraproject.org/packages/python-bunch
-import bunch
+import errno
 import glob
-import itertools
+import hashlib
 import logging
 import multiprocessing
-import operator
 import os
 import os.path
 import shutil
+import sys
+import time
+import traceback
 
 
 LOG = logging.getLogger("rpmkit.updateinfo")
 
+_MANIFEST_FILE = "manifest.json"
+_RESULTS_DIR = "results"
+_CLAIMS_DIR = ".claims"
+_CACHE_DIR = ".cache"
+_FAILED_FILE = "ANALYSIS_FAILED"
+
+# Exit codes of worker processes for each status.
+_EXIT_CODES = dict(ok=0, failed=1, unavailable=2)
+
 
 def hosts_rpmroot_g(hosts_datadir):
     """
@@ -53,95 +62,336 @@ def hosts_rpmroot_g(hosts_datadir):
             yield (os.path.basename(hostdir), None)
 
 
-def touch(filepath):
-    open(filepath, 'w').write()
+def touch(filepath, content=''):
+    open(filepath, 'w').write(content)
 
 
-def prepare(hosts_datadir, workdir=None, repos=[], cachedir=None,
-            backend=RUM.DEFAULT_BACKEND, backends=RUM.BACKENDS):
+def nevras_digest(packages, nevra_keys=RUM.NEVRA_KEYS):
+    """
+    :param packages: A list of dicts represent packages
+    :return: The SHA1 hex digest of the set of NEVRAs of `packages`
+
+    >>> p1 = dict(name="bash", epoch=0, version="4.1.2", release="29.el6",
+    ...           arch="x86_64")
+    >>> p2 = dict(name="zlib", epoch=0, version="1.2.3", release="29.el6",
+    ...           arch="x86_64")
+    >>> nevras_digest([p1, p2]) == nevras_digest([p2, p1, p1])
+    True
+    >>> nevras_digest([p1]) == nevras_digest([p2])
+    False
     """
-    Scan and collect hosts' basic data (installed rpms list, etc.).
+    nevras = sorted(set('\t'.join(str(p[k]) for k in nevra_keys) for p
+                        in packages))
+    return hashlib.sha1('\n'.join(nevras)).hexdigest()
+
+
+def results_dir(digest, rdir=_RESULTS_DIR):
+    """
+    :param digest: The digest of the set of NEVRAs of installed RPMs
+    :return: Path to the dir to save results relative to the working dir
+
+    >>> results_dir("abcdef0123")
+    'results/ab/abcdef0123'
+    """
+    return os.path.join(rdir, digest[:2], digest)
+
+
+def claim_results_dir(workdir, digest, runid):
+    """
+    Claim to analyze and save results to the results dir for `digest` in this
+    run. Only the first host claimed it will be analyzed in a run.
 
-    :param hosts_datadir: Dir in which rpm db roots of hosts exist
     :param workdir: Working dir to save results
-    :param repos: List of yum repos to get updateinfo data (errata and updtes)
-    :param cachedir: A dir to save metadata cache of yum repos
-    :param backend: Backend module to use to get updates and errata
-    :param backends: Backend list
+    :param digest: The digest of the set of NEVRAs of installed RPMs
+    :param runid: The identity of this run
+    :return: True if it was claimed by the caller
+    """
+    try:
+        os.makedirs(os.path.join(workdir, _CLAIMS_DIR, runid, digest))
+        return True
+    except OSError as exc:
+        if exc.errno == errno.EEXIST:
+            return False
+        raise
 
-    :return: A generator to yield a tuple,
-        (host_identity, host_rpmroot or None)
+
+def load_manifest_entry(hworkdir):
     """
-    if workdir is None:
-        LOG.info(_("Set workdir to hosts_datadir: %s"), hosts_datadir)
-        workdir = hosts_datadir
+    :param hworkdir: Working dir of the host
+    :return: A dict represents the manifest entry of the host or {}
+    """
+    path = os.path.join(hworkdir, _MANIFEST_FILE)
+    if not os.path.exists(path):
+        return dict()
+
+    return U.json_load(path)
+
+
+def save_manifest_entry(entry, hworkdir):
+    """
+    :param entry: A dict represents the manifest entry of the host
+    :param hworkdir: Working dir of the host
+    """
+    U.json_dump(entry, os.path.join(hworkdir, _MANIFEST_FILE))
+
+
+def analyze_host(root, hworkdir, did, workdir, runid, repos=[], score=-1,
+                 keywords=RUM.ERRATA_KEYWORDS, rpms=[], period=(),
+                 cachedir=None, refdir=None, verbosity=0,
+                 backend=RUM.DEFAULT_BACKEND, backends=RUM.BACKENDS,
+                 cvefile=None, outfmt=None, incremental=False, report=None):
+    """
+    Prepare and analyze a host. Hosts having same installed RPMs share the
+    results saved in the results dir named by the digest of them, and only one
+    of them will be analyzed in a run.
+
+    :param root: Root dir of RPM db of the host
+    :param hworkdir: Working dir of the host to save its manifest entry,
+        installed RPMs list and state
+    :param did: Host identity
+    :param workdir: Working dir to save results
+    :param runid: The identity of this run
+
+    See :function:`main` for other parameters.
+
+    :return: A dict represents the manifest entry of the host, {id, digest,
+        results, runid, claimed[, unchanged]}, or {} if the host is not
+        available
+    """
+    RUM.set_loglevel(verbosity)
+
+    if incremental:
+        params = RUM.mk_state_params(backend, backends, score, keywords, rpms,
+                                     period, refdir, cvefile, outfmt)
+        state = RUM.mk_host_state(root, repos, cachedir, params)
+        if state is None:
+            LOG.warn(_("%s: RPM DB not available and don't analyze %s"),
+                     did, root)
+            save_manifest_entry(dict(id=did, runid=runid,
+                                     status="unavailable"), hworkdir)
+            return dict()
+
+        prev = RUM.load_host_state(hworkdir)
+        entry = load_manifest_entry(hworkdir)
+
+        if entry.get("results") and RUM.is_host_state_unchanged(
+                state, prev, os.path.join(workdir, entry["results"])):
+            LOG.info(_("%s: Nothing changed since the last run. Skip to "
+                       "analyze %s"), did, root)
+            entry = dict(entry, runid=runid, claimed=False, unchanged=True)
+            save_manifest_entry(entry, hworkdir)
+            return entry
+
+    host = RUM.prepare(root, hworkdir, repos, did, cachedir, backend,
+                       backends, outfmt=outfmt)
+    if not host.available:
+        save_manifest_entry(dict(id=did, runid=runid, status="unavailable"),
+                            hworkdir)
+        return dict()
+
+    digest = nevras_digest(host.installed)
+    entry = dict(id=did, digest=digest, results=results_dir(digest),
+                 runid=runid,
+                 claimed=claim_results_dir(workdir, digest, runid))
+    save_manifest_entry(entry, hworkdir)
+
+    if entry["claimed"]:
+        host.workdir = os.path.join(workdir, entry["results"])
+        if not os.path.exists(host.workdir):
+            os.makedirs(host.workdir)
+
+        reuse = incremental and RUM.can_reuse_errata(state, prev)
+        RUM.analyze(host, score, keywords, rpms, period, refdir,
+                    cvefile=cvefile, reuse=reuse, report=report)
     else:
-        if not os.path.exists(workdir):
-            LOG.debug(_("Creating working dir: %s"), workdir)
-            os.makedirs(workdir)
+        LOG.info(_("%s: Skip to analyze as its installed RPMs are exactly "
+                   "same as others' in %s"), did, entry["results"])
 
-    for h, root in hosts_rpmroot_g(hosts_datadir):
-        hworkdir = os.path.join(workdir, h)
-        if not hworkdir:
-            os.makedirs(hworkdir)
+    if incremental:
+        # Repos' metadata cache may be updated during the analysis.
+        state = RUM.mk_host_state(root, host.repos, cachedir, params)
+        if state is not None:
+            RUM.save_host_state(state, hworkdir)
 
-        if root is None:
-            touch(os.path.join(hworkdir, "RPMDB_NOT_AVAILABLE"))
-            yield bunch.bunchify(dict(id=h, workdir=hworkdir, available=False))
-        else:
-            yield RUM.prepare(root, hworkdir, repos, h, cachedir, backend,
-                              backends)
+    return entry
 
 
-def p2nevra(p):
+def analyze_host_safely(root, hworkdir, did, kwargs):
     """
-    :param p: A dict represents package info including N, E, V, R, A
+    Prepare and analyze a host. Errors are logged and saved in the file
+    ANALYSIS_FAILED in the host's working dir.
+
+    :param root: Root dir of RPM db of the host
+    :param hworkdir: Working dir to save results of the host
+    :param did: Host identity
+    :param kwargs: Keyword arguments passed to :function:`analyze_host`
+
+    :return: Status of the analysis, "ok", "failed" or "unavailable"
     """
-    return operator.itemgetter("name", "epoch", "version", "release",
-                               "arch")(p)
+    failed = os.path.join(hworkdir, _FAILED_FILE)
+    if os.path.exists(failed):
+        os.remove(failed)  # Left by the previous run.
 
+    try:
+        entry = analyze_host(root, hworkdir, did, **kwargs)
+    except Exception:
+        LOG.error(_("%s: Failed to analyze %s"), did, root)
+        touch(failed, traceback.format_exc())
+        return "failed"
 
-def add_host_to_metadata(workdir, host):
-    metadatafile = os.path.join(workdir, "metadata.json")
+    return "ok" if entry else "unavailable"
 
-    shutil.copy2(metadatafile, metadatafile + ".save")
-    metadata = U.json_load(metadatafile)
-    metadata["hosts"].append(host)
-    U.json_dump(metadata, metadatafile)
 
+def _analyze_host(root, hworkdir, did, kwargs):
+    """
+    Prepare and analyze a host in a worker process. Backend (yum or dnf) is
+    initialized in this process and never shared with others. The status of
+    the analysis is returned as the exit code of the process.
+
+    :param root: Root dir of RPM db of the host
+    :param hworkdir: Working dir to save results of the host
+    :param did: Host identity
+    :param kwargs: Keyword arguments passed to :function:`analyze_host`
+    """
+    sys.exit(_EXIT_CODES[analyze_host_safely(root, hworkdir, did, kwargs)])
 
-def mk_symlinks_to_results_of_ref_host(href, hsrest):
+
+def run_workers(hosts, kwargs, jobs=None, timeout=None, interval=0.5):
     """
-    :param href: Reference host object
-    :param hsrest: A list of hosts having same installed rpms as `href`
+    Analyze hosts in isolated worker processes; each host is analyzed in a
+    newly forked process, and at most `jobs` processes run concurrently.
+
+    :param hosts: A list of (host_identity, host_rpmroot, host_workdir)
+    :param kwargs: Keyword arguments passed to :function:`analyze_host`
+    :param jobs: Max number of worker processes or None (number of CPUs)
+    :param timeout: Timeout in seconds to analyze each host or None
+    :param interval: Interval in seconds to poll worker processes
 
-    TODO: Ugly code around symlinks ...
+    :return: A dict of {host_identity: {status: "ok" | "failed" |
+        "unavailable" | "timeout", elapsed: elapsed_time_in_seconds}}
+    """
+    if not jobs:
+        jobs = multiprocessing.cpu_count()
+
+    pending = list(hosts)
+    running = dict()  # {host_identity: (process, start_time)}
+    results = dict()
+    total = len(pending)
+    statuses = dict((code, st) for st, code in _EXIT_CODES.items())
+
+    while pending or running:
+        while pending and len(running) < jobs:
+            (h, root, hworkdir) = pending.pop(0)
+            proc = multiprocessing.Process(target=_analyze_host, name=h,
+                                           args=(root, hworkdir, h, kwargs))
+            proc.start()
+            running[h] = (proc, time.time())
+            LOG.debug(_("%s: Started the worker process %d"), h, proc.pid)
+
+        time.sleep(interval)
+
+        for h, (proc, start) in list(running.items()):
+            elapsed = time.time() - start
+            if proc.is_alive():
+                if not timeout or elapsed < timeout:
+                    continue
+
+                LOG.warn(_("%s: Timed out and terminate the worker %d"), h,
+                         proc.pid)
+                proc.terminate()
+                proc.join()
+                status = "timeout"
+            else:
+                proc.join()
+                status = statuses.get(proc.exitcode, "failed")
+
+            del running[h]
+            results[h] = dict(status=status, elapsed=round(elapsed, 1))
+            LOG.info(_("[%d/%d] %s: %s (%.1f sec)"), len(results), total, h,
+                     status, elapsed)
+
+    return results
+
+
+def run_sequentially(hosts, kwargs):
     """
-    orgdir = os.path.abspath(os.curdir)
+    Analyze hosts one by one in this process.
 
-    for h in hsrest:
-        os.chdir(h.workdir)
-        href_workdir = os.path.join('..', href.id)  # TODO: Keep consistency.
-        LOG.info(_("%s: Make symlinks to results in %s/"), h.id, href_workdir)
-        for src in glob.glob(os.path.join(href_workdir, '*.*')):
-            dst = os.path.basename(src)
-            if not os.path.exists(dst):
-                LOG.debug("Make a symlink to %s", src)
-                os.symlink(src, dst)
+    :param hosts: A list of (host_identity, host_rpmroot, host_workdir)
+    :param kwargs: Keyword arguments passed to :function:`analyze_host`
+    :return: Same as :function:`run_workers`
+    """
+    results = dict()
+    for h, root, hworkdir in hosts:
+        start = time.time()
+        status = analyze_host_safely(root, hworkdir, h, kwargs)
+        elapsed = time.time() - start
 
-        add_host_to_metadata(href_workdir, h.id)
-        os.chdir(orgdir)
+        results[h] = dict(status=status, elapsed=round(elapsed, 1))
+        LOG.info(_("[%d/%d] %s: %s (%.1f sec)"), len(results), len(hosts), h,
+                 status, elapsed)
 
+    return results
 
-def analyze(args):
-    RUM.analyze(*args)
+
+def mk_manifest(workdir, hosts, results, runid):
+    """
+    Make the manifest of hosts pointing at the results of them, and update
+    the list of hosts in each results' metadata.
+
+    :param workdir: Working dir to save results
+    :param hosts: A list of (host_identity, host_rpmroot, host_workdir)
+    :param results: A dict of {host_identity: {status, elapsed}}
+    :param runid: The identity of this run; manifest entries of hosts not
+        made in this run are ignored as these are stale
+
+    :return: A dict of {hosts: {host_identity: entry},
+        results: {digest: [host_identity]}}
+    """
+    entries = dict()
+    for h, _root, hworkdir in hosts:
+        entry = load_manifest_entry(hworkdir) if h in results else {}
+        if entry.get("runid") != runid:
+            entry = dict()  # Left by the previous run; it's stale.
+
+        entries[h] = dict(entry, **results.get(h, dict(status="failed")))
+
+    # Hosts share the status of the host analyzed for them in this run.
+    claimers = dict((e["digest"], e) for e in entries.values()
+                    if e.get("claimed") and e.get("runid") == runid)
+    for e in entries.values():
+        ref = claimers.get(e.get("digest"))
+        if ref and ref is not e and ref["status"] != "ok":
+            e["status"] = ref["status"]
+            e["ref"] = ref["id"]
+
+    digests = dict()
+    for h, e in sorted(entries.items()):
+        if "digest" in e:
+            digests.setdefault(e["digest"], []).append(h)
+
+    for digest, hs in digests.items():
+        mfile = os.path.join(workdir, results_dir(digest), "metadata.json")
+        if os.path.exists(mfile):
+            metadata = U.json_load(mfile)
+            metadata["hosts"] = hs
+            U.json_dump(metadata, mfile)
+
+    return dict(hosts=entries, results=digests)
 
 
 def main(hosts_datadir, workdir=None, repos=[], score=-1,
          keywords=RUM.ERRATA_KEYWORDS, rpms=[], period=(), cachedir=None,
          refdir=None, verbosity=0, multiproc=False,
-         backend=RUM.DEFAULT_BACKEND, backends=RUM.BACKENDS):
+         backend=RUM.DEFAULT_BACKEND, backends=RUM.BACKENDS, cvefile=None,
+         outfmt=None, incremental=False, jobs=None, timeout=None,
+         report=None):
     """
+    Results of hosts are saved in `workdir`/results/<digest>/ where <digest>
+    is the digest of the set of NEVRAs of their installed RPMs so that hosts
+    having same installed RPMs are analyzed only once, and
+    `workdir`/manifest.json maps each host to its results and status.
+
     :param hosts_datadir: Dir in which rpm db roots of hosts exist
     :param workdir: Working dir to save results
     :param repos: List of yum repos to get updateinfo data (errata and updtes)
@@ -150,48 +400,75 @@ def main(hosts_datadir, workdir=None, repos=[], score=-1,
     :param rpms: Core RPMs to filter errata by them
     :param period: Period of errata in format of YYYY[-MM[-DD]],
         ex. ("2014-10-01", "2014-11-01")
-    :param cachedir: A dir to save metadata cache of yum repos
+    :param cachedir: A dir to save metadata cache of yum repos shared among
+        hosts or None (`workdir`/.cache). Repos' metadata and the data made
+        from them such as the errata index are reused among hosts having same
+        repos through it.
     :param refdir: A dir holding reference data previously generated to
         compute delta (updates since that data)
     :param verbosity: Verbosity level: 0 (default), 1 (verbose), 2 (debug)
-    :param multiproc: Utilize multiprocessing module to compute results
-        in parallel as much as possible if True
+    :param multiproc: Analyze hosts in parallel in isolated worker processes
+        if True
     :param backend: Backend module to use to get updates and errata
     :param backends: Backend list
+    :param cvefile: A local copy of cve_dates.txt to get CVSS data from
+    :param outfmt: Output format of the lists of packages, errata and updates
+    :param incremental: Skip to analyze hosts nothing changed since the
+        previous run or reuse the CVE details of errata analyzed in it if
+        True
+    :param jobs: Max number of worker processes in multiproc mode or None
+        (number of CPUs)
+    :param timeout: Timeout in seconds to analyze each host in multiproc mode
+        or None (no timeouts)
+    :param report: Output format of reports to render just after analysis or
+        None (do not render reports)
     """
     RUM.set_loglevel(verbosity)
 
-    all_hosts = list(prepare(hosts_datadir, workdir, repos, cachedir, backend,
-                             backends))
-    hosts = [h for h in all_hosts if h.available]
-
-    LOG.info(_("Analyze %d/%d hosts"), len(hosts), len(all_hosts))
-
-    ilen = lambda h: len(h.installed)
-    hps = lambda h: [p2nevra(p) for p in h.installed]
-    gby = lambda xs, kf: itertools.groupby(sorted(xs, key=kf), kf)
-
-    # Group hosts by installed rpms to degenerate these hosts and avoid to
-    # analyze for same installed RPMs more than once. his :: [[[h]]]
-    his = [[list(g2) for _k2, g2 in gby(g, hps)] for _k, g in gby(hosts, ilen)]
-
-    for hss in his:
-        hset = [(hs[0], hs[1:]) for hs in hss]
-        hsdata = [(h, score, keywords, rpms, period, refdir) for h, _hrest
-                  in hset]
-
-        # Disabled until fixing bugs:
-        # if multiproc:
-        #    pool = multiprocessing.Pool(multiprocessing.cpu_count())
-        #    pool.map(analyze, hsdata)
-        for args in hsdata:
-            analyze(args)
-
-        for h, hsrest in hset:
-            if hsrest:
-                LOG.info(_("Skip to analyze %s as its installed RPMs are "
-                           "exactly same as %s's"),
-                         ','.join(x.id for x in hsrest), h)
-                mk_symlinks_to_results_of_ref_host(h, hsrest)
+    if workdir is None:
+        LOG.info(_("Set workdir to hosts_datadir: %s"), hosts_datadir)
+        workdir = hosts_datadir
+
+    if cachedir is None:
+        cachedir = os.path.join(workdir, _CACHE_DIR)
+
+    hosts = []
+    for h, root in hosts_rpmroot_g(hosts_datadir):
+        hworkdir = os.path.join(workdir, h)
+        if not os.path.exists(hworkdir):
+            os.makedirs(hworkdir)
+
+        if root is None:
+            touch(os.path.join(hworkdir, "RPMDB_NOT_AVAILABLE"))
+        else:
+            hosts.append((h, root, hworkdir))
+
+    runid = "%d-%d" % (time.time(), os.getpid())
+    kwargs = dict(workdir=workdir, runid=runid, repos=repos, score=score,
+                  keywords=keywords, rpms=rpms, period=period,
+                  cachedir=cachedir, refdir=refdir, verbosity=verbosity,
+                  backend=backend, backends=backends, cvefile=cvefile,
+                  outfmt=outfmt, incremental=incremental, report=report)
+
+    if multiproc:
+        LOG.info(_("Analyze %d hosts with %d worker processes"), len(hosts),
+                 jobs or multiprocessing.cpu_count())
+        results = run_workers(hosts, kwargs, jobs, timeout)
+    else:
+        LOG.info(_("Analyze %d hosts"), len(hosts))
+        results = run_sequentially(hosts, kwargs)
+
+    manifest = mk_manifest(workdir, hosts, results, runid)
+    U.json_dump(manifest, os.path.join(workdir, _MANIFEST_FILE))
+    shutil.rmtree(os.path.join(workdir, _CLAIMS_DIR, runid),
+                  ignore_errors=True)
+
+    failures = [h for h, e in manifest["hosts"].items() if e["status"] != "ok"]
+    if failures:
+        LOG.warn(_("Failed to analyze %d/%d hosts: %s"), len(failures),
+                 len(hosts), ', '.join(sorted(failures)))
+
+    LOG.info(_("Analyzed %d hosts having %d different sets of installed RPMs"),
+             len(hosts), len(manifest["results"]))
 
 # vim:sw=4:ts=4:et:
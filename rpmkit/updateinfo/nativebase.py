@@ -0,0 +1,313 @@
+#
+# Copyright (C) 2015 Red Hat, Inc.
+# Author: Satoru SATOH <ssato@redhat.com>
+# License: GPLv3+
+#
+"""Native backend does not need yum nor dnf. It computes updates and errata
+from the installed RPMs list in RPM DB and yum repos' metadata, primary.xml
+and updateinfo.xml, cached locally.
+"""
+from __future__ import absolute_import
+
+import bz2
+import glob
+import gzip
+import logging
+import os.path
+
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+import rpmkit.updateinfo.base
+import rpmkit.updateinfo.utils
+import rpmkit.rpmutils
+import rpmkit.utils
+
+
+LOG = logging.getLogger(__name__)
+
+_REPO_NS = "{http://linux.duke.edu/metadata/repo}"
+_COMMON_NS = "{http://linux.duke.edu/metadata/common}"
+_RPM_NS = "{http://linux.duke.edu/metadata/rpm}"
+
+RHBZ_URL_BASE = "https://bugzilla.redhat.com/bugzilla/show_bug.cgi?id="
+
+_INSTALLED_KEYS = ("name", "version", "release", "epoch", "arch", "summary",
+                   "vendor", "buildhost")
+
+
+def _pkgtup(pkg):
+    """
+    :param pkg: A dict represents a package
+    :return: A tuple of (name, arch, epoch, version, release) of the package
+
+    >>> _pkgtup(dict(name="a", arch="noarch", epoch=None, version="1",
+    ...              release="1"))
+    ('a', 'noarch', '0', '1', '1')
+    """
+    return (pkg["name"], pkg["arch"], str(pkg["epoch"] or '0'),
+            pkg["version"], pkg["release"])
+
+
+def _open(path):
+    """
+    :param path: Path to a metadata file maybe compressed
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path)
+    elif path.endswith(".bz2"):
+        return bz2.BZ2File(path)
+    else:
+        return open(path)
+
+
+def find_repomd_files(repo, cachedir):
+    """
+    :param repo: Repo ID
+    :param cachedir: A dir to save metadata cache of yum repos
+    :return: A list of repomd.xml paths of the repo
+    """
+    # yum: <cachedir>/<repo>/, dnf: <cachedir>/<repo>-<hash>/repodata/ and
+    # mirrors: <cachedir>/<repo>/repodata/
+    return sorted(glob.glob(os.path.join(cachedir, repo, "repomd.xml")) +
+                  glob.glob(os.path.join(cachedir, repo, "repodata",
+                                         "repomd.xml")) +
+                  glob.glob(os.path.join(cachedir, repo + "-*", "repodata",
+                                         "repomd.xml")))
+
+
+def find_metadata_file(repomd, mdtype):
+    """
+    :param repomd: Path to repomd.xml
+    :param mdtype: Metadata type, ex. primary, updateinfo
+    :return: Path to the metadata file of given type or None
+    """
+    topdir = os.path.dirname(repomd)
+
+    for data in ET.parse(repomd).findall(_REPO_NS + "data"):
+        if data.get("type") != mdtype:
+            continue
+
+        href = data.find(_REPO_NS + "location").get("href")
+        for path in (os.path.join(topdir, os.path.basename(href)),
+                     os.path.join(os.path.dirname(topdir), href)):
+            if os.path.exists(path):
+                return path
+
+    return None
+
+
+def parse_primary_g(path):
+    """
+    Parse primary.xml and yield binary packages in it.
+
+    :param path: Path to primary.xml[.gz]
+    """
+    for _event, elem in ET.iterparse(_open(path)):
+        if elem.tag != _COMMON_NS + "package":
+            continue
+
+        arch = elem.findtext(_COMMON_NS + "arch")
+        if arch != "src":
+            ver = elem.find(_COMMON_NS + "version")
+            fmt = elem.find(_COMMON_NS + "format")
+            yield dict(name=elem.findtext(_COMMON_NS + "name"), arch=arch,
+                       epoch=ver.get("epoch", '0'), version=ver.get("ver"),
+                       release=ver.get("rel"),
+                       summary=elem.findtext(_COMMON_NS + "summary"),
+                       vendor=fmt.findtext(_RPM_NS + "vendor"),
+                       buildhost=fmt.findtext(_RPM_NS + "buildhost"))
+        elem.clear()
+
+
+def _date(elem, tag):
+    delem = elem.find(tag)
+    return None if delem is None else delem.get("date")
+
+
+def _update_to_errata(elem, urlbase=RHBZ_URL_BASE):
+    """
+    Convert an update element in updateinfo.xml to a dict represents errata,
+    same as :function:`rpmkit.updateinfo.yumbase._notice_to_errata` does.
+
+    :param elem: An update element
+    """
+    issued = _date(elem, "issued")
+    errata = dict(advisory=elem.findtext("id"),
+                  synopsis=elem.findtext("title"),
+                  description=elem.findtext("description"),
+                  update_date=_date(elem, "updated") or issued,
+                  issue_date=issued, solution=elem.findtext("solution"),
+                  type=elem.get("type"),
+                  severity=elem.findtext("severity") or "N/A")
+
+    refs = elem.findall("references/reference")
+    errata["bzs"] = [dict(id=r.get("id"), title=r.get("title"),
+                          summary=r.get("title"),
+                          url=r.get("href", urlbase + str(r.get("id"))))
+                     for r in refs if r.get("type") == "bugzilla"]
+    errata["cves"] = [dict(id=r.get("id"), cve=r.get("id"),
+                           title=r.get("title"), url=r.get("href"))
+                      for r in refs if r.get("type") == "cve"]
+
+    errata["packages"] = [dict(name=p.get("name"), arch=p.get("arch"),
+                               epoch=p.get("epoch", '0'),
+                               version=p.get("version"),
+                               release=p.get("release"), src=p.get("src"),
+                               filename=p.findtext("filename"))
+                          for p in elem.findall("pkglist/collection/package")]
+
+    names = rpmkit.utils.uniq(p["name"] for p in errata["packages"])
+    errata["package_names"] = ','.join(names)
+    errata["url"] = rpmkit.updateinfo.utils.errata_url(errata["advisory"])
+
+    return errata
+
+
+def parse_updateinfo_g(path):
+    """
+    Parse updateinfo.xml and yield errata in it.
+
+    :param path: Path to updateinfo.xml[.gz]
+    """
+    for _event, elem in ET.iterparse(_open(path)):
+        if elem.tag == "update":
+            yield _update_to_errata(elem)
+            elem.clear()
+
+
+class Base(rpmkit.updateinfo.base.Base):
+    name = "rpmkit.updateinfo.nativebase"
+
+    def __init__(self, root='/', repos=[], disabled_repos=['*'],
+                 workdir=None, **kwargs):
+        """
+        :param root: RPM DB root dir
+        :param repos: A list of repos to enable
+        :param disabled_repos: A list of repos to disable (not used)
+        :param workdir: Working dir to save logs and results
+
+        >>> base = Base()
+        """
+        super(Base, self).__init__(root, repos, disabled_repos,
+                                   workdir=workdir, **kwargs)
+
+    def _load_repos_data(self, name, mdtype, parse_fn):
+        """
+        Load data parsed from repos' metadata. Parsed data is saved in the
+        cachedir and shared among hosts having same repos.
+
+        :param name: Name of the data
+        :param mdtype: Type of the metadata to parse
+        :param parse_fn: Function to parse the metadata
+        """
+        path = rpmkit.updateinfo.base.repos_data_path(
+            self.repos, self._cachedir, self.repos_data_name(name))
+        if path and os.path.exists(path):
+            return rpmkit.updateinfo.base.load_repos_data(path)
+
+        LOG.info("Parsing %s of repos: %s", mdtype, ','.join(self.repos))
+        data = []
+        for repo in self.repos:
+            mdfiles = [find_metadata_file(f, mdtype) for f
+                       in find_repomd_files(repo, self._cachedir)]
+            if not any(mdfiles):
+                LOG.warn("%s of the repo %s not found in %s", mdtype, repo,
+                         self._cachedir)
+
+            for mdfile in (f for f in mdfiles if f):
+                data.extend(parse_fn(mdfile))
+
+        if path:
+            rpmkit.updateinfo.base.save_repos_data(data, path)
+
+        return data
+
+    def list_available(self):
+        """
+        :return: List of dicts of all packages in repos
+        """
+        if not self._packages["available"]:
+            self._packages["available"] = \
+                self._load_repos_data("available", "primary", parse_primary_g)
+
+        return self._packages["available"]
+
+    def errata_index(self):
+        """
+        :return: A dict of {(package_name, package_arch): [errata]}
+        """
+        path = rpmkit.updateinfo.base.repos_data_path(
+            self.repos, self._cachedir, self.repos_data_name("errata_index"))
+        if path and os.path.exists(path):
+            return rpmkit.updateinfo.base.load_errata_index(path)
+
+        es = self._load_repos_data("errata_index", "updateinfo",
+                                   parse_updateinfo_g)
+        return rpmkit.updateinfo.base.mk_errata_index(es)
+
+    def list_installed_impl(self, **kwargs):
+        """
+        List installed packages. Installed packages not available from repos
+        are marked as extras same as yum does.
+        """
+        if not self._packages["installed"]:
+            ts = rpmkit.rpmutils.rpm_transactionset(self.root)
+            ips = [rpmkit.rpmutils.h2nvrea(h, _INSTALLED_KEYS) for h
+                   in ts.dbMatch() if h["name"] != "gpg-pubkey"]
+            del ts
+
+            avails = set(_pkgtup(p) for p in self.list_available())
+            extra_names = [p["name"] for p in ips if _pkgtup(p) not in avails]
+
+            self._packages["installed"] = \
+                [rpmkit.updateinfo.base.Package(extra_names=extra_names, **p)
+                 for p in ips]
+
+        return self._packages["installed"]
+
+    def _list_updates_g(self):
+        """
+        :return: A generator yields tuples of (installed_package,
+            the_latest_update_of_it)
+        """
+        evr_key = rpmkit.rpmutils.pkg_evr_key
+        latests = dict()
+        for pkg in self.list_available():
+            key = (pkg["name"], pkg["arch"])
+            if key not in latests or evr_key(pkg) > evr_key(latests[key]):
+                latests[key] = pkg
+
+        for ipkg in self.list_installed():
+            upkg = latests.get((ipkg["name"], ipkg["arch"]))
+            if upkg and evr_key(upkg) > evr_key(ipkg):
+                yield (ipkg, upkg)
+
+    def list_updates_impl(self, **kwargs):
+        """
+        List the latest updates of installed packages. Obsoletes are not
+        taken into account unlike yum and dnf backends.
+        """
+        if not self._packages["updates"]:
+            self._packages["updates"] = \
+                [rpmkit.updateinfo.base.Package(**u) for _i, u
+                 in self._list_updates_g()]
+
+        return self._packages["updates"]
+
+    def list_errata_impl(self, **kwargs):
+        """
+        List errata applicable to installed packages having updates.
+        """
+        if not self._packages["errata"]:
+            eidx = self.errata_index()
+            self._packages["errata"] = rpmkit.utils.concat(
+                rpmkit.updateinfo.base.applicable_errata_g(
+                    eidx, _pkgtup(i), rpmkit.rpmutils.evrcmp)
+                for i, _u in self._list_updates_g())
+
+        return self._packages["errata"]
+
+# vim:sw=4:ts=4:et:
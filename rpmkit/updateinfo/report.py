@@ -0,0 +1,140 @@
+#
+# Copyright (C) 2015 Red Hat, Inc.
+# Author: Satoru SATOH <ssato@redhat.com>
+# License: GPLv3+
+#
+"""Streaming writers of spreadsheet reports.
+
+A sheet is a tuple of (title, headers, rows) where rows is an iterable
+yields lists of cell values. Rows are written one by one as they are yielded
+so that the whole workbook is never kept in memory.
+"""
+from __future__ import absolute_import
+
+import csv
+import logging
+import re
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+
+LOG = logging.getLogger(__name__)
+
+FORMATS = ("xlsx", "csv")
+
+XLSX_MAX_ROWS = 1048576
+_SHEET_NAME_MAX = 31
+_SHEET_NAME_INVALID_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+
+def sheet_name(title, names=None):
+    """
+    :param title: Sheet title
+    :param names: A set of sheet names used in the workbook already or None
+    :return: A valid worksheet name, unique in the workbook if `names` given
+
+    >>> sheet_name("RHSAs [CVSS score >= 4.0]")
+    'RHSAs _CVSS score >= 4.0_'
+    >>> sheet_name("a" * 40) == "a" * 31
+    True
+    >>> names = set()
+    >>> sheet_name("a", names), sheet_name("a", names)
+    ('a', 'a (2)')
+    """
+    name = base = _SHEET_NAME_INVALID_CHARS.sub('_', title)[:_SHEET_NAME_MAX]
+    if names is None:
+        return name
+
+    idx = 2
+    while name in names:
+        suffix = " (%d)" % idx
+        name = base[:_SHEET_NAME_MAX - len(suffix)] + suffix
+        idx += 1
+
+    names.add(name)
+    return name
+
+
+def dump_xlsx(sheets, filepath, max_rows=XLSX_MAX_ROWS):
+    """
+    Write sheets into a XLSX workbook in constant memory mode of xlsxwriter.
+
+    :param sheets: An iterable yields sheets, (title, headers, rows)
+    :param filepath: Output file path
+    :param max_rows: Max number of rows in a sheet including headers
+    """
+    book = xlsxwriter.Workbook(filepath, dict(constant_memory=True,
+                                              strings_to_urls=False))
+    bold = book.add_format(dict(bold=True))
+    names = set()
+
+    for title, headers, rows in sheets:
+        sheet = book.add_worksheet(sheet_name(title, names))
+        sheet.write_row(0, 0, headers, bold)
+
+        for idx, row in enumerate(rows, 1):
+            if idx >= max_rows:
+                LOG.warn("Too many rows in the sheet '%s'. Truncated to %d "
+                         "rows", title, max_rows)
+                break
+
+            sheet.write_row(idx, 0, row)
+
+    book.close()
+
+
+def _encode(val, encoding="utf-8"):
+    """
+    >>> _encode(u"a"), _encode(1)
+    ('a', 1)
+    """
+    return val.encode(encoding) if isinstance(val, unicode) else val
+
+
+def dump_csv(sheets, filepath):
+    """
+    Write each sheet into a CSV file named <filepath>_<index>.csv, e.g.
+    errata_summary_01.csv, as CSV cannot hold multiple sheets.
+
+    :param sheets: An iterable yields sheets, (title, headers, rows)
+    :param filepath: Output file path without the extension
+    :return: A list of paths of the CSV files
+    """
+    paths = []
+    for idx, (title, headers, rows) in enumerate(sheets, 1):
+        path = "%s_%02d.csv" % (filepath, idx)
+        LOG.debug("Dump the sheet '%s' into %s", title, path)
+
+        with open(path, 'wb') as out:
+            writer = csv.writer(out)
+            writer.writerow([_encode(h) for h in headers])
+            for row in rows:
+                writer.writerow([_encode(c) for c in row])
+
+        paths.append(path)
+
+    return paths
+
+
+def dump(sheets, filepath, fmt="xlsx"):
+    """
+    :param sheets: An iterable yields sheets, (title, headers, rows)
+    :param filepath: Output file path without the extension
+    :param fmt: Output format, xlsx or csv. CSV is used instead of XLSX if
+        xlsxwriter is not available.
+    :return: A list of paths of the output files
+    """
+    if fmt == "xlsx":
+        if xlsxwriter is not None:
+            path = filepath + ".xlsx"
+            dump_xlsx(sheets, path)
+            return [path]
+
+        LOG.warn("xlsxwriter is not available. Dump sheets in CSV instead")
+
+    return dump_csv(sheets, filepath)
+
+# vim:sw=4:ts=4:et:
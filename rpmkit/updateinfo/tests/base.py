@@ -0,0 +1,61 @@
+#
+# Copyright (C) 2015 Red Hat, Inc.
+# Red Hat Author(s): Satoru SATOH <ssato at redhat.com>
+# License: GPLv3+
+#
+import rpmkit.updateinfo.base as TT
+import rpmkit.tests.common as C
+
+import os.path
+import os
+import unittest
+
+
+_ERRATA = [dict(advisory="RHBA-2015:0001",
+                packages=[dict(name="bash", arch="x86_64", epoch="0",
+                               version="4.1.2", release="29.el6")]),
+           dict(advisory="RHBA-2015:0002",
+                packages=[dict(name="bash", arch="x86_64", epoch="0",
+                               version="4.1.2", release="15.el6"),
+                          dict(name="zlib", arch="x86_64", epoch="0",
+                               version="1.2.3", release="29.el6")])]
+
+
+class Test_00_errata_index(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_repos_data_path(self):
+        repo = "rhel-x86_64-server-6"
+        path = TT.repos_data_path([repo], self.workdir, "errata_index")
+        self.assertTrue(path is None)
+
+        os.makedirs(os.path.join(self.workdir, repo))
+        open(os.path.join(self.workdir, repo, "repomd.xml"),
+             'w').write("<revision>1</revision>")
+        path = TT.repos_data_path([repo], self.workdir, "errata_index")
+        self.assertTrue(path.startswith(self.workdir))
+
+    def test_20_save_and_load_errata_index(self):
+        path = os.path.join(self.workdir, "errata_index.jsonl.gz")
+        TT.save_repos_data(_ERRATA, path)
+        eidx = TT.load_errata_index(path)
+
+        self.assertEquals(len(eidx[("bash", "x86_64")]), 2)
+        self.assertEquals(len(eidx[("zlib", "x86_64")]), 1)
+
+    def test_30_applicable_errata_g(self):
+        eidx = TT.mk_errata_index(_ERRATA)
+        oldpkgtup = ("bash", "x86_64", "0", "4.1.2", "15.el6")
+
+        def vercmp(evr1, evr2):
+            return cmp(evr1, evr2)  # Enough for this case.
+
+        es = list(TT.applicable_errata_g(eidx, oldpkgtup, vercmp))
+        self.assertEquals([e["advisory"] for e in es], ["RHBA-2015:0001"])
+
+# vim:sw=4:ts=4:et:
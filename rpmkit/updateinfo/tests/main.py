@@ -0,0 +1,231 @@
+#
+# Copyright (C) 2015 Red Hat, Inc.
+# Red Hat Author(s): Satoru SATOH <ssato at redhat.com>
+# License: GPLv3+
+#
+import rpmkit.updateinfo.main as TT
+import rpmkit.tests.common as C
+import rpmkit.utils as U
+
+import os.path
+import time
+import unittest
+
+
+_CVE_DATES_TXT = """\
+# comment line
+CVE-2000-0909 public=20000922
+CVE-2009-1302 public=20090421,cvss2=6.8/AV:N/AC:M/Au:N/C:P/I:P/A:P
+"""
+
+
+class Test_10_cve_vs_cvss_map(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.cvefile = os.path.join(self.workdir, "cve_dates.txt")
+        self.dbpath = os.path.join(self.workdir, "cve_cvss.db")
+
+        open(self.cvefile, 'w').write(_CVE_DATES_TXT)
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_mk_cve_vs_cvss_map(self):
+        cvemap = TT.mk_cve_vs_cvss_map(self.cvefile)
+
+        self.assertEquals(sorted(cvemap.keys()),
+                          ["CVE-2000-0909", "CVE-2009-1302"])
+        self.assertEquals(cvemap["CVE-2009-1302"]["score"], "6.8")
+
+    def test_20_save_and_load(self):
+        cvemap = TT.mk_cve_vs_cvss_map(self.cvefile)
+        TT.save_cve_vs_cvss_map(cvemap, self.dbpath)
+        cvemap2 = TT.load_cve_vs_cvss_map(self.dbpath)
+
+        self.assertEquals(sorted(cvemap2.keys()), sorted(cvemap.keys()))
+        self.assertEquals(cvemap2["CVE-2009-1302"]["score"], "6.8")
+        self.assertFalse("score" in cvemap2["CVE-2000-0909"])
+
+    def test_30_fetch_cve_details(self):
+        cvemap = TT._get_cve_vs_cvss_map(self.cvefile, self.dbpath)
+        self.assertTrue(os.path.exists(self.dbpath))
+
+        cve = TT.fetch_cve_details(dict(id="CVE-2009-1302", url="xxx"),
+                                   cvemap)
+        self.assertEquals(cve["score"], "6.8")
+
+        # Not found in the map and not fetched w/ swapi.
+        cve = TT.fetch_cve_details(dict(id="CVE-2015-0001", url="xxx"),
+                                   cvemap)
+        self.assertFalse("score" in cve)
+
+    def test_40_get_cve_vs_cvss_map__other_source(self):
+        TT.save_cve_vs_cvss_map(dict(), self.dbpath)  # Made w/ swapi.
+        self.assertFalse(TT._is_cve_cvss_db_new(self.dbpath, self.cvefile))
+
+        cvemap = TT._get_cve_vs_cvss_map(self.cvefile, self.dbpath)
+        self.assertEquals(sorted(cvemap.keys()),
+                          ["CVE-2000-0909", "CVE-2009-1302"])
+        self.assertTrue(TT._is_cve_cvss_db_new(self.dbpath, self.cvefile))
+
+        other = os.path.join(self.workdir, "cve_dates_2.txt")
+        open(other, 'w').write(_CVE_DATES_TXT)
+        self.assertFalse(TT._is_cve_cvss_db_new(self.dbpath, other))
+
+
+def _mk_update(name, version):
+    return dict(name=name, version=version, release="1", epoch=0,
+                arch="x86_64")
+
+
+class Test_20_compute_delta(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.errata = [dict(advisory="RHSA-2015:0001"),
+                       dict(advisory="RHBA-2015:0002")]
+        self.updates = [_mk_update("bash", "4.1"), _mk_update("zsh", "5.0")]
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def _dump_refs(self, outfmt=None):
+        U.json_dump_g(self.errata[:1],
+                      TT.errata_list_path(self.workdir, outfmt=outfmt))
+        U.json_dump_g(self.updates[:1],
+                      TT.updates_file_path(self.workdir, outfmt=outfmt))
+
+    def test_10_compute_delta(self):
+        self._dump_refs()
+        (es, us) = TT.compute_delta(self.workdir, self.errata, self.updates)
+
+        self.assertEquals(es, self.errata[1:])
+        self.assertEquals(us, self.updates[1:])
+
+    def test_20_compute_delta__jsonl_gz(self):
+        self._dump_refs("jsonl.gz")
+        (es, us) = TT.compute_delta(self.workdir, self.errata, self.updates)
+
+        self.assertEquals(es, self.errata[1:])
+        self.assertEquals(us, self.updates[1:])
+
+
+class Test_30_host_state(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.state = dict(rpmdb="xxx", repos={"rhel-x86_64-server-6": "1"},
+                          params=TT.mk_state_params(score=4.0),
+                          timestamp=int(time.time()), expires=3600)
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_save_and_load(self):
+        self.assertEquals(TT.load_host_state(self.workdir), {})
+
+        TT.save_host_state(self.state, self.workdir)
+        self.assertEquals(TT.load_host_state(self.workdir), self.state)
+
+    def test_20_is_host_state_unchanged(self):
+        TT.save_host_state(self.state, self.workdir)
+        prev = TT.load_host_state(self.workdir)
+
+        # Not analyzed yet.
+        self.assertFalse(TT.is_host_state_unchanged(self.state, {},
+                                                    self.workdir))
+        # Results are missing.
+        self.assertFalse(TT.is_host_state_unchanged(self.state, prev,
+                                                    self.workdir))
+
+        U.json_dump_g([], TT.errata_list_path(self.workdir))
+        self.assertTrue(TT.is_host_state_unchanged(self.state, prev,
+                                                   self.workdir))
+
+        state = dict(self.state, repos={"rhel-x86_64-server-6": "2"})
+        self.assertFalse(TT.is_host_state_unchanged(state, prev,
+                                                    self.workdir))
+        self.assertTrue(TT.can_reuse_errata(state, prev))
+
+        state["params"] = TT.mk_state_params(score=0)
+        self.assertFalse(TT.can_reuse_errata(state, prev))
+
+        # RPM DB is missing.
+        state = dict(self.state, rpmdb=None)
+        self.assertFalse(TT.is_host_state_unchanged(state, prev,
+                                                    self.workdir))
+
+    def test_21_is_host_state_unchanged__expired(self):
+        U.json_dump_g([], TT.errata_list_path(self.workdir))
+        prev = dict(self.state, timestamp=int(time.time()) - 7200)
+
+        # Repos' metadata cached may be old and need to be refreshed.
+        self.assertFalse(TT.is_host_state_unchanged(self.state, prev,
+                                                    self.workdir))
+
+        state = dict(self.state, expires=-1)  # Never expire.
+        self.assertTrue(TT.is_host_state_unchanged(state, prev,
+                                                   self.workdir))
+
+    def test_22_mk_host_state__rpmdb_not_available(self):
+        self.assertTrue(TT.mk_host_state(self.workdir) is None)
+        TT.main(self.workdir, incremental=True)  # Not raise any errors.
+
+    def test_30_errata_complement_g__reuse_cves(self):
+        cves = [dict(id="CVE-2009-1302", url="xxx", score="6.8")]
+        U.json_dump_g([dict(advisory="RHSA-2015:0001", cves=cves)],
+                      TT.errata_list_path(self.workdir))
+        ref_cves = TT.load_ref_cves(self.workdir)
+
+        es = [dict(advisory="RHSA-2015:0001", synopsis="x ",
+                   cves=[dict(id="CVE-2009-1302", url="xxx")])]
+        es = list(TT.errata_complement_g(es, [], 4.0, {}, ref_cves))
+        self.assertEquals(es[0]["cves"], cves)
+
+
+class Test_40_render_results(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.rpms = [dict(_mk_update("bash", "4.1"), summary="bash",
+                          vendor="Red Hat, Inc.", buildhost="localhost",
+                          origin="redhat")]
+        self.errata = [dict(advisory="RHBA-2015:0002", type="bugfix",
+                            severity="N/A", synopsis="bash bug fix",
+                            description="xxx", issue_date="2015-01-01",
+                            update_date="2015-01-01", url="xxx", cves=[],
+                            bzs=[], update_names=["bash"])]
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_dump_results__deferred(self):
+        TT.dump_results(self.workdir, self.rpms, [], [])
+
+        self.assertTrue(os.path.exists(TT.summary_file_path(self.workdir)))
+        self.assertFalse([f for f in os.listdir(self.workdir)
+                          if f.startswith("errata_")])
+
+    def test_20_render_results(self):
+        TT.dump_results(self.workdir, self.rpms, [], [])
+        U.json_dump_g(self.errata, TT.errata_list_path(self.workdir))
+
+        paths = TT.render_results(self.workdir, "csv")
+        self.assertTrue(paths)
+        self.assertTrue(all(os.path.exists(p) for p in paths))
+        self.assertTrue(os.path.join(self.workdir, "errata_details_01.csv")
+                        in paths)
+
+    def test_30_render_results_in_parallel(self):
+        workdirs = [os.path.join(self.workdir, d) for d in ("a", "b")]
+        for workdir in workdirs:
+            os.makedirs(workdir)
+            TT.dump_results(workdir, self.rpms, [], [], details=False)
+
+        self.assertEquals(TT.find_results_dirs(self.workdir), workdirs)
+
+        res = TT.render_results_in_parallel(workdirs, "csv", 2)
+        self.assertTrue(all(res[w]["status"] == "ok" for w in workdirs))
+
+# vim:sw=4:ts=4:et:
@@ -0,0 +1,217 @@
+#
+# Copyright (C) 2015 Red Hat, Inc.
+# Red Hat Author(s): Satoru SATOH <ssato at redhat.com>
+# License: GPLv3+
+#
+import rpmkit.updateinfo.multihosts as TT
+import rpmkit.updateinfo.nativebase as NB
+import rpmkit.updateinfo.tests.nativebase as NT
+import rpmkit.updateinfo.utils
+import rpmkit.tests.common as C
+import rpmkit.utils as U
+
+import gzip
+import os.path
+import time
+import unittest
+
+
+def _fake_analyze_host(root, hworkdir, did, **kwargs):
+    if did == "fail":
+        raise RuntimeError("Failed: " + did)
+    elif did == "hang":
+        time.sleep(10)
+    elif did == "unavailable":
+        return dict()
+
+    return dict(id=did)
+
+
+class _FakeHost(object):
+    available = False
+
+
+class _NativeBase(NB.Base):
+    """
+    Native backend gives installed RPMs instead of loading them from RPM DB.
+    Hosts 'a' and 'b' have different releases of bash installed.
+    """
+    def list_installed_impl(self, **kwargs):
+        rel = "15.el6" if os.path.basename(self.root) == "a" else "16.el6"
+        self._packages["installed"] = [
+            dict(name="bash", arch="x86_64", epoch=0, version="4.1.2",
+                 release=rel, summary="", vendor="Red Hat, Inc.",
+                 buildhost="x86-001.build.bos.redhat.com")]
+        return self._packages["installed"]
+
+
+class Test_10_run_workers(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.analyze_host = TT.analyze_host
+        TT.analyze_host = _fake_analyze_host
+
+    def tearDown(self):
+        TT.analyze_host = self.analyze_host
+        C.cleanup_workdir(self.workdir)
+
+    def _mk_hosts(self, *hs):
+        hosts = [(h, self.workdir, os.path.join(self.workdir, h)) for h
+                 in hs]
+        for _h, _r, hworkdir in hosts:
+            os.makedirs(hworkdir)
+
+        return hosts
+
+    def test_10_run_workers(self):
+        hosts = self._mk_hosts("ok", "fail", "hang", "unavailable")
+        res = TT.run_workers(hosts, {}, jobs=2, timeout=1, interval=0.1)
+
+        self.assertEquals(res["ok"]["status"], "ok")
+        self.assertEquals(res["fail"]["status"], "failed")
+        self.assertEquals(res["hang"]["status"], "timeout")
+        self.assertEquals(res["unavailable"]["status"], "unavailable")
+        self.assertTrue(os.path.exists(os.path.join(self.workdir, "fail",
+                                                    TT._FAILED_FILE)))
+
+    def test_20_run_sequentially(self):
+        hosts = self._mk_hosts("fail", "ok", "unavailable")
+        res = TT.run_sequentially(hosts, {})
+
+        self.assertEquals(res["fail"]["status"], "failed")
+        self.assertEquals(res["ok"]["status"], "ok")
+        self.assertEquals(res["unavailable"]["status"], "unavailable")
+        self.assertTrue(os.path.exists(os.path.join(self.workdir, "fail",
+                                                    TT._FAILED_FILE)))
+
+
+class Test_20_manifest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_claim_results_dir(self):
+        self.assertTrue(TT.claim_results_dir(self.workdir, "abc", "1"))
+        self.assertFalse(TT.claim_results_dir(self.workdir, "abc", "1"))
+        self.assertTrue(TT.claim_results_dir(self.workdir, "abc", "2"))
+
+    def test_20_mk_manifest(self):
+        hosts = [(h, self.workdir, os.path.join(self.workdir, h)) for h
+                 in ("a", "b", "c")]
+        entries = dict(a=dict(id="a", digest="d1", claimed=True, runid="1"),
+                       b=dict(id="b", digest="d1", claimed=False, runid="1"),
+                       c=dict(id="c", digest="d2", claimed=True, runid="1"))
+        for h, _r, hworkdir in hosts:
+            os.makedirs(hworkdir)
+            U.json_dump(entries[h], os.path.join(hworkdir, TT._MANIFEST_FILE))
+
+        mdir = os.path.join(self.workdir, TT.results_dir("d1"))
+        os.makedirs(mdir)
+        U.json_dump(dict(hosts=["a"]), os.path.join(mdir, "metadata.json"))
+
+        results = dict(a=dict(status="ok"), b=dict(status="ok"),
+                       c=dict(status="timeout"))
+        manifest = TT.mk_manifest(self.workdir, hosts, results, "1")
+
+        self.assertEquals(manifest["results"], dict(d1=["a", "b"], d2=["c"]))
+        self.assertEquals(manifest["hosts"]["b"]["status"], "ok")
+        self.assertEquals(manifest["hosts"]["c"]["status"], "timeout")
+        self.assertEquals(U.json_load(os.path.join(mdir,
+                                                   "metadata.json"))["hosts"],
+                          ["a", "b"])
+
+    def test_30_mk_manifest__stale_entries(self):
+        hosts = [(h, self.workdir, os.path.join(self.workdir, h)) for h
+                 in ("a", "b")]
+        entries = dict(a=dict(id="a", digest="d1", claimed=True, runid="1"),
+                       b=dict(id="b", digest="d1", claimed=True, runid="0"))
+        for h, _r, hworkdir in hosts:
+            os.makedirs(hworkdir)
+            U.json_dump(entries[h], os.path.join(hworkdir, TT._MANIFEST_FILE))
+
+        results = dict(a=dict(status="ok"), b=dict(status="failed"))
+        manifest = TT.mk_manifest(self.workdir, hosts, results, "1")
+
+        self.assertEquals(manifest["results"], dict(d1=["a"]))
+        self.assertEquals(manifest["hosts"]["a"]["status"], "ok")
+        self.assertEquals(manifest["hosts"]["b"], dict(status="failed"))
+
+
+class Test_30_analyze_host(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.prepare = TT.RUM.prepare
+        TT.RUM.prepare = lambda *args, **kwargs: _FakeHost()
+
+    def tearDown(self):
+        TT.RUM.prepare = self.prepare
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_analyze_host__unavailable(self):
+        hworkdir = os.path.join(self.workdir, "a")
+        os.makedirs(hworkdir)
+        U.json_dump(dict(id="a", digest="d1", claimed=True, runid="0"),
+                    os.path.join(hworkdir, TT._MANIFEST_FILE))
+
+        self.assertEquals(TT.analyze_host(self.workdir, hworkdir, "a",
+                                          self.workdir, "1"), dict())
+        self.assertEquals(TT.load_manifest_entry(hworkdir),
+                          dict(id="a", runid="1", status="unavailable"))
+
+
+class Test_40_main(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.hosts_datadir = os.path.join(self.workdir, "hosts")
+        self.outdir = os.path.join(self.workdir, "out")
+        for h in ("a", "b"):
+            os.makedirs(os.path.join(self.hosts_datadir, h))
+
+        # Repos' metadata should be downloaded in the shared cachedir.
+        repodir = os.path.join(self.outdir, TT._CACHE_DIR, NT._REPO)
+        os.makedirs(repodir)
+        open(os.path.join(repodir, "repomd.xml"), 'w').write(NT._REPOMD_XML)
+        for fn, content in (("aaa-primary.xml.gz", NT._PRIMARY_XML),
+                            ("bbb-updateinfo.xml.gz", NT._UPDATEINFO_XML)):
+            f = gzip.open(os.path.join(repodir, fn), 'w')
+            f.write(content)
+            f.close()
+
+        self.parsed = []
+        self.errata = {}
+        self.saved = (rpmkit.updateinfo.utils.check_rpmdb_root,
+                      NB.parse_updateinfo_g, TT.RUM.analyze)
+
+        def parse_updateinfo_g(*args, **kwargs):
+            self.parsed.append(args)
+            return self.saved[1](*args, **kwargs)
+
+        def analyze(host, *args, **kwargs):
+            self.errata[host.id] = host.base.list_errata()
+
+        rpmkit.updateinfo.utils.check_rpmdb_root = lambda root: True
+        NB.parse_updateinfo_g = parse_updateinfo_g
+        TT.RUM.analyze = analyze
+        TT.RUM.BACKENDS["test"] = _NativeBase
+
+    def tearDown(self):
+        (rpmkit.updateinfo.utils.check_rpmdb_root, NB.parse_updateinfo_g,
+         TT.RUM.analyze) = self.saved
+        del TT.RUM.BACKENDS["test"]
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_main__shared_cachedir(self):
+        TT.main(self.hosts_datadir, self.outdir, repos=[NT._REPO],
+                backend="test", multiproc=False)
+
+        self.assertEquals(sorted(self.errata.keys()), ["a", "b"])
+        self.assertTrue(all(self.errata.values()))
+        self.assertEquals(len(self.parsed), 1)  # updateinfo parsed once.
+
+# vim:sw=4:ts=4:et:
@@ -0,0 +1,148 @@
+#
+# Copyright (C) 2015 Red Hat, Inc.
+# Red Hat Author(s): Satoru SATOH <ssato at redhat.com>
+# License: GPLv3+
+#
+import rpmkit.updateinfo.nativebase as TT
+import rpmkit.tests.common as C
+
+import gzip
+import os.path
+import os
+import unittest
+
+
+_REPO = "rhel-x86_64-server-6"
+
+_REPOMD_XML = """\
+<?xml version="1.0" encoding="UTF-8"?>
+<repomd xmlns="http://linux.duke.edu/metadata/repo">
+  <revision>1420070400</revision>
+  <data type="primary">
+    <location href="repodata/aaa-primary.xml.gz"/>
+  </data>
+  <data type="updateinfo">
+    <location href="repodata/bbb-updateinfo.xml.gz"/>
+  </data>
+</repomd>
+"""
+
+_PRIMARY_XML = """\
+<?xml version="1.0" encoding="UTF-8"?>
+<metadata xmlns="http://linux.duke.edu/metadata/common"
+          xmlns:rpm="http://linux.duke.edu/metadata/rpm" packages="3">
+<package type="rpm">
+  <name>bash</name>
+  <arch>x86_64</arch>
+  <version epoch="0" ver="4.1.2" rel="15.el6"/>
+  <summary>The GNU Bourne Again shell</summary>
+  <format>
+    <rpm:vendor>Red Hat, Inc.</rpm:vendor>
+    <rpm:buildhost>x86-001.build.bos.redhat.com</rpm:buildhost>
+  </format>
+</package>
+<package type="rpm">
+  <name>bash</name>
+  <arch>x86_64</arch>
+  <version epoch="0" ver="4.1.2" rel="29.el6"/>
+  <summary>The GNU Bourne Again shell</summary>
+  <format>
+    <rpm:vendor>Red Hat, Inc.</rpm:vendor>
+    <rpm:buildhost>x86-002.build.bos.redhat.com</rpm:buildhost>
+  </format>
+</package>
+<package type="rpm">
+  <name>bash</name>
+  <arch>src</arch>
+  <version epoch="0" ver="4.1.2" rel="29.el6"/>
+  <summary>The GNU Bourne Again shell</summary>
+  <format/>
+</package>
+</metadata>
+"""
+
+_UPDATEINFO_XML = """\
+<?xml version="1.0" encoding="UTF-8"?>
+<updates>
+  <update from="security@redhat.com" status="final" type="bugfix"
+          version="1">
+    <id>RHBA-2015:0001</id>
+    <title>bash bug fix update</title>
+    <issued date="2015-01-05 00:00:00"/>
+    <updated date="2015-01-05 00:00:00"/>
+    <description>bash bug fix update</description>
+    <references>
+      <reference href="https://bugzilla.redhat.com/show_bug.cgi?id=1"
+                 id="1" title="bash crashes" type="bugzilla"/>
+    </references>
+    <pkglist>
+      <collection short="">
+        <name>rhel-x86_64-server-6</name>
+        <package arch="x86_64" epoch="0" name="bash" release="29.el6"
+                 src="bash-4.1.2-29.el6.src.rpm" version="4.1.2">
+          <filename>bash-4.1.2-29.el6.x86_64.rpm</filename>
+        </package>
+      </collection>
+    </pkglist>
+  </update>
+</updates>
+"""
+
+
+class Test_10_Base(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+
+        repodir = os.path.join(self.workdir, _REPO)
+        os.makedirs(repodir)
+        open(os.path.join(repodir, "repomd.xml"), 'w').write(_REPOMD_XML)
+
+        for fn, content in (("aaa-primary.xml.gz", _PRIMARY_XML),
+                            ("bbb-updateinfo.xml.gz", _UPDATEINFO_XML)):
+            f = gzip.open(os.path.join(repodir, fn), 'w')
+            f.write(content)
+            f.close()
+
+        self.base = TT.Base(self.workdir, [_REPO], cachedir=self.workdir)
+
+        # Installed RPMs are given instead of loading them from RPM DB.
+        ipkg = dict(name="bash", arch="x86_64", epoch=0, version="4.1.2",
+                    release="15.el6", summary="", vendor="Red Hat, Inc.",
+                    buildhost="x86-001.build.bos.redhat.com")
+        self.base._packages["installed"] = [ipkg]
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_list_available(self):
+        pkgs = self.base.list_available()
+
+        self.assertEquals(len(pkgs), 2)  # src.rpm is not included.
+        self.assertEquals(pkgs[0]["vendor"], "Red Hat, Inc.")
+
+    def test_20_list_updates(self):
+        pkgs = self.base.list_updates()
+
+        self.assertEquals(len(pkgs), 1)
+        self.assertEquals(pkgs[0]["release"], "29.el6")
+
+    def test_30_list_errata(self):
+        es = self.base.list_errata()
+
+        self.assertEquals([e["advisory"] for e in es], ["RHBA-2015:0001"])
+        self.assertEquals(es[0]["bzs"][0]["summary"], "bash crashes")
+        self.assertEquals(es[0]["issue_date"], "2015-01-05 00:00:00")
+
+    def test_40_list_errata__cached(self):
+        self.base.list_errata()
+        name = self.base.repos_data_name("errata_index")
+        path = TT.rpmkit.updateinfo.base.repos_data_path([_REPO],
+                                                         self.workdir, name)
+        self.assertTrue(os.path.exists(path))
+
+        base = TT.Base(self.workdir, [_REPO], cachedir=self.workdir)
+        base._packages["installed"] = self.base.list_installed()
+        self.assertEquals(len(base.list_errata()), 1)
+
+# vim:sw=4:ts=4:et:
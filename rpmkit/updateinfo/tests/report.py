@@ -0,0 +1,59 @@
+#
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015 Red Hat, Inc.
+# Red Hat Author(s): Satoru SATOH <ssato at redhat.com>
+# License: GPLv3+
+#
+import rpmkit.updateinfo.report as TT
+import rpmkit.tests.common as C
+
+import csv
+import os.path
+import unittest
+
+
+def _sheets_g(nrows=10):
+    yield ("Sheet 1", ["a", "b"], ([i, str(i)] for i in range(nrows)))
+    yield ("Sheet: 2", [u"c"], iter([[u"あ"]]))
+
+
+class Test_10_dump(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+        self.filepath = os.path.join(self.workdir, "report")
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_dump_csv(self):
+        paths = TT.dump(_sheets_g(), self.filepath, "csv")
+
+        self.assertEquals(paths, [self.filepath + "_01.csv",
+                                  self.filepath + "_02.csv"])
+        rows = list(csv.reader(open(paths[0])))
+        self.assertEquals(rows[0], ["a", "b"])
+        self.assertEquals(rows[-1], ["9", "9"])
+        self.assertEquals(len(rows), 11)
+        self.assertEquals(list(csv.reader(open(paths[1])))[1],
+                          [u"あ".encode("utf-8")])
+
+    def test_20_dump_xlsx(self):
+        paths = TT.dump(_sheets_g(), self.filepath, "xlsx")
+
+        if TT.xlsxwriter is None:  # Fallback to CSV.
+            self.assertEquals(len(paths), 2)
+        else:
+            self.assertEquals(paths, [self.filepath + ".xlsx"])
+        self.assertTrue(all(os.path.exists(p) for p in paths))
+
+    def test_30_dump_xlsx__truncated(self):
+        if TT.xlsxwriter is None:
+            self.skipTest("xlsxwriter is not available")
+
+        path = self.filepath + ".xlsx"
+        TT.dump_xlsx(_sheets_g(100), path, max_rows=10)
+        self.assertTrue(os.path.exists(path))
+
+# vim:sw=4:ts=4:et:
@@ -46,4 +46,63 @@ class Test_20_check_rpmdb_root(unittest.TestCase):
     def test_20_check_rpmdb_root(self):
         self.assertTrue(TT.check_rpmdb_root(self.workdir))
 
+
+_REPOMD_XML = """\
+<?xml version="1.0" encoding="UTF-8"?>
+<repomd xmlns="http://linux.duke.edu/metadata/repo">
+  <revision>1420070400</revision>
+</repomd>
+"""
+
+
+class Test_30_fingerprints(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = C.setup_workdir()
+
+    def tearDown(self):
+        C.cleanup_workdir(self.workdir)
+
+    def test_10_rpmdb_digest(self):
+        rpmdbdir = os.path.join(self.workdir, TT.RPMDB_SUBDIR)
+        os.makedirs(rpmdbdir)
+        pkgdb = os.path.join(rpmdbdir, "Packages")
+
+        open(pkgdb, 'w').write("aaa")
+        digest = TT.rpmdb_digest(self.workdir)
+        self.assertEquals(digest, TT.rpmdb_digest(self.workdir))
+
+        open(pkgdb, 'w').write("bbb")
+        self.assertNotEquals(digest, TT.rpmdb_digest(self.workdir))
+
+    def test_20_repos_revisions(self):
+        repodir = os.path.join(self.workdir, "rhel-x86_64-server-6")
+        os.makedirs(repodir)
+        open(os.path.join(repodir, "repomd.xml"), 'w').write(_REPOMD_XML)
+
+        revs = TT.repos_revisions(["rhel-x86_64-server-6",
+                                   "rhel-x86_64-server-optional-6"],
+                                  self.workdir)
+        self.assertEquals(revs, {"rhel-x86_64-server-6": "1420070400",
+                                 "rhel-x86_64-server-optional-6": None})
+
+    def test_30_repos_metadata_expire(self):
+        conf = os.path.join(self.workdir, "yum.conf")
+        reposdir = os.path.join(self.workdir, "yum.repos.d")
+        os.makedirs(reposdir)
+
+        self.assertEquals(TT.repos_metadata_expire(["a"], conf, reposdir),
+                          TT.METADATA_EXPIRE)
+
+        open(conf, 'w').write("[main]\nmetadata_expire=90m\n")
+        open(os.path.join(reposdir, "a.repo"), 'w').write(
+            "[a]\nmetadata_expire=1h\n[b]\nmetadata_expire=never\n")
+
+        self.assertEquals(TT.repos_metadata_expire(["a", "c"], conf,
+                                                   reposdir), 3600)
+        self.assertEquals(TT.repos_metadata_expire(["c"], conf, reposdir),
+                          5400)
+        self.assertEquals(TT.repos_metadata_expire(["b"], conf, reposdir),
+                          -1)
+
 # vim:sw=4:ts=4:et:
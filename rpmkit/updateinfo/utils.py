@@ -12,12 +12,19 @@ import rpmkit.rpmutils
 
 import codecs
 import datetime
+import glob
+import hashlib
 import logging
 import os.path
 import os
 import re
 import tempfile
 
+try:
+    import ConfigParser as configparser
+except ImportError:
+    import configparser
+
 try:
     import bsddb
 except ImportError:
@@ -142,6 +149,129 @@ def check_rpmdb_root(root, readonly=True, dbnames=_RPM_DB_FILENAMES):
     return True
 
 
+def rpmdb_digest(root, bufsize=1048576):
+    """
+    Compute the digest of the RPM DB to detect changes of installed RPMs
+    without loading the RPM DB w/ rpm, yum or dnf.
+
+    :param root: The pivot root directry where target's RPM DB files exist.
+    :return: The SHA1 hex digest of the RPM DB (Packages) file or None if it
+        does not exist
+    """
+    pkgdb = os.path.join(root, RPMDB_SUBDIR, "Packages")
+    if not os.path.exists(pkgdb):
+        return None
+
+    digest = hashlib.sha1()
+
+    with open(pkgdb, 'rb') as f:
+        for chunk in iter(lambda: f.read(bufsize), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+_REPOMD_REVISION_RE = re.compile(r"<revision>([^<]+)</revision>")
+
+
+def repomd_revision(repomd):
+    """
+    :param repomd: Path to repomd.xml of a yum repo
+    :return: The revision of repo metadata or the SHA1 hex digest of repomd.xml
+        if it does not have revision
+    """
+    content = open(repomd, 'rb').read()
+    m = _REPOMD_REVISION_RE.search(content.decode("utf-8", "ignore"))
+    if m:
+        return m.groups()[0].strip()
+
+    return hashlib.sha1(content).hexdigest()
+
+
+def repos_revisions(repos, cachedir):
+    """
+    Get the revisions of yum repos' metadata cached in `cachedir`.
+
+    :param repos: List of yum repos
+    :param cachedir: A dir to save metadata cache of yum repos
+    :return: A dict of {repo: revision or None if it's not cached}
+    """
+    revs = dict()
+    for repo in repos:
+        # yum: <cachedir>/<repo>/, dnf: <cachedir>/<repo>-<hash>/repodata/
+        # and mirrors: <cachedir>/<repo>/repodata/
+        paths = sorted(glob.glob(os.path.join(cachedir, repo,
+                                              "repomd.xml")) +
+                       glob.glob(os.path.join(cachedir, repo, "repodata",
+                                              "repomd.xml")) +
+                       glob.glob(os.path.join(cachedir, repo + "-*",
+                                              "repodata", "repomd.xml")))
+        revs[repo] = ','.join(repomd_revision(p) for p in paths) or None
+
+    return revs
+
+
+YUM_CONF = "/etc/yum.conf"
+YUM_REPOS_DIR = "/etc/yum.repos.d"
+METADATA_EXPIRE = 6 * 60 * 60  # The default of yum in seconds.
+
+_METADATA_EXPIRE_UNITS = dict(s=1, m=60, h=60 * 60, d=24 * 60 * 60)
+
+
+def parse_metadata_expire(value):
+    """
+    :param value: metadata_expire value in yum's configuration files
+    :return: Expiration period in seconds or -1 (never expire)
+
+    >>> [parse_metadata_expire(v) for v in ("300", "90m", "6h", "1d")]
+    [300, 5400, 21600, 86400]
+    >>> parse_metadata_expire("never"), parse_metadata_expire("-1")
+    (-1, -1)
+    """
+    value = value.strip().lower()
+    if value == "never":
+        return -1
+
+    if value and value[-1] in _METADATA_EXPIRE_UNITS:
+        return int(value[:-1]) * _METADATA_EXPIRE_UNITS[value[-1]]
+
+    return max(int(value), -1)
+
+
+def repos_metadata_expire(repos, conf=YUM_CONF, reposdir=YUM_REPOS_DIR):
+    """
+    Get the shortest expiration period of yum repos' metadata. Repos' own
+    metadata_expire take precedence over the one in [main] of yum.conf.
+
+    :param repos: List of yum repos
+    :param conf: Path to yum.conf
+    :param reposdir: Dir in which yum repo files exist
+
+    :return: Expiration period in seconds or -1 (never expire)
+    """
+    cp = configparser.RawConfigParser()
+    try:
+        cp.read([conf] + sorted(glob.glob(os.path.join(reposdir,
+                                                       "*.repo"))))
+    except configparser.Error as exc:
+        logging.warn("Failed to load yum's configuration: %s", exc)
+
+    def get(section, default):
+        if cp.has_option(section, "metadata_expire"):
+            try:
+                return parse_metadata_expire(cp.get(section,
+                                                    "metadata_expire"))
+            except ValueError:
+                pass
+
+        return default
+
+    default = get("main", METADATA_EXPIRE)
+    expires = [e for e in (get(r, default) for r in repos) if e >= 0]
+
+    return min(expires) if expires else (-1 if repos else default)
+
+
 RHERRATA_RE = re.compile(r"^RH[SBE]A-\d{4}[:-]\d{4,5}(?:-\d+)?$")
 
 
@@ -8,8 +8,8 @@ import rpmkit.updateinfo.utils
 import rpmkit.utils as RU
 
 import collections
-import itertools
 import logging
+import os.path
 import yum
 
 
@@ -276,12 +276,34 @@ class Base(rpmkit.updateinfo.base.Base):
         :return: A dict contains lists of dicts of errata
         """
         self._load_repos()
+        eidx = self.errata_index()
         oldpkgtups = [t[1] for t in self.base.up.getUpdatesTuples()]
-        npss_g = itertools.ifilter(None,
-                                   (self.base.upinfo.get_applicable_notices(o)
-                                    for o in oldpkgtups))
-        es = itertools.chain(*((_notice_to_errata(t[1]) for t in ts) for ts
-                               in npss_g))
-        return list(es)
+
+        return RU.concat(rpmkit.updateinfo.base.applicable_errata_g(
+                         eidx, o, yum.compareEVR) for o in oldpkgtups)
+
+    def errata_index(self):
+        """
+        Load the index of all errata in enabled repos. It's shared among
+        hosts having same repos as parsing updateinfo.xml of repos is very
+        expensive, and saved in the cachedir to reuse it in other processes.
+
+        :return: A dict of {(package_name, package_arch): [errata]}
+        """
+        repos = [r.id for r in self.base.repos.listEnabled()]
+        name = self.repos_data_name("errata_index")
+        path = rpmkit.updateinfo.base.repos_data_path(repos, self.cachedir(),
+                                                      name)
+        if path and os.path.exists(path):
+            return rpmkit.updateinfo.base.load_errata_index(path)
+
+        LOG.info("Parsing updateinfo of repos: %s", ','.join(repos))
+        es = [_notice_to_errata(n) for n in self.base.upinfo.get_notices()]
+
+        if path:
+            LOG.debug("Saving the errata index: %s", path)
+            rpmkit.updateinfo.base.save_repos_data(es, path)
+
+        return rpmkit.updateinfo.base.mk_errata_index(es)
 
 # vim:sw=4:ts=4:et:
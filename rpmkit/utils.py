@@ -22,6 +22,7 @@ from itertools import izip, takewhile
 
 import codecs
 import datetime
+import gzip
 import itertools
 import logging
 import multiprocessing
@@ -403,6 +404,99 @@ def json_dump(data, filepath):
     json.dump(data, copen(filepath, 'w'))
 
 
+_JSONL_REG = re.compile(r".+\.jsonl(?:\.gz)?$")
+
+
+def is_jsonl_file(filepath, reg=_JSONL_REG):
+    """
+    :param filepath: File path
+
+    >>> is_jsonl_file("/tmp/a.jsonl")
+    True
+    >>> is_jsonl_file("/tmp/a.jsonl.gz")
+    True
+    >>> is_jsonl_file("/tmp/a.json")
+    False
+    """
+    return reg.match(filepath) is not None
+
+
+def _open(filepath, flag='r'):
+    """
+    Open given file and return a file object. It's gzip compressed if the file
+    path ends with '.gz'.
+    """
+    if filepath.endswith(".gz"):
+        return gzip.open(filepath, flag + 'b')
+
+    return open(filepath, flag)
+
+
+def json_dump_g(items, filepath, key="data"):
+    """
+    Dump given items into ``filepath`` one by one. Items are dumped in JSON
+    Lines format if the file path ends with '.jsonl' or '.jsonl.gz' or in JSON
+    format of {key: [item]} and each item in a line otherwise, and it will be
+    gzip compressed if the file path ends with '.gz'.
+
+    :param items: An iterable object yields items to dump
+    :param filepath: Output file path
+    :param key: Key of the items list in JSON format
+
+    :return: Number of items dumped
+    """
+    jsonl = is_jsonl_file(filepath)
+    nitems = 0
+
+    with _open(filepath, 'w') as out:
+        if not jsonl:
+            out.write('{"%s": [\n' % key)
+
+        for item in items:
+            if jsonl:
+                out.write(json.dumps(item) + '\n')
+            else:
+                out.write((",\n" if nitems else '') + json.dumps(item))
+
+            nitems += 1
+
+        if not jsonl:
+            out.write("\n]}\n")
+
+    return nitems
+
+
+def json_load_g(filepath, key="data"):
+    """
+    Load items dumped by :function:`json_dump_g` or :function:`json_dump` (a
+    dict has ``key`` and a list of items as its value) from ``filepath`` and
+    yield each item. Items are loaded one by one except for the latter case.
+
+    :param filepath: Input file path
+    :param key: Key of the items list in JSON format
+    """
+    if is_jsonl_file(filepath):
+        with _open(filepath) as inp:
+            for line in inp:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    with _open(filepath) as inp:
+        if inp.readline().rstrip() == '{"%s": [' % key:
+            for line in inp:
+                line = line.rstrip()
+                if line == "]}":
+                    break
+
+                if line:
+                    yield json.loads(line.rstrip(','))
+            return
+
+    for item in json.load(_open(filepath)).get(key, []):
+        yield item
+
+
 def select_from_list_g(xs, ref_xs=[]):
     """
     Filter out xs not in ref_xs and select only xs found in ref_xs one by one.